@@ -0,0 +1,65 @@
+"""
+Compare two benchmark result files, e.g. from two commits:
+
+    python -m benchmarks.compare base.json new.json [--threshold 10]
+
+Prints req/s and p95 changes per scenario and concurrency, and exits
+with status 1 if throughput dropped or p95 rose by more than
+``threshold`` percent anywhere.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+
+def _load(path: Path) -> dict:
+    report = json.loads(path.read_text())
+    return {
+        (row["scenario"], row["concurrency"]): row for row in report["results"]
+    }
+
+
+def _change(old, new) -> float:
+    if not old or new is None:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    """
+    Regressions beyond ``threshold`` percent, one line each.
+    """
+    regressions = []
+    for key in sorted(base.keys() & new.keys()):
+        old_row, new_row = base[key], new[key]
+        rps = _change(old_row["rps"], new_row["rps"])
+        p95 = _change(old_row["p95_ms"], new_row["p95_ms"])
+        line = (
+            f"{key[0]:>8} c={key[1]:<4} "
+            f"req/s {old_row['rps']} -> {new_row['rps']} ({rps:+.1f}%)  "
+            f"p95 {old_row['p95_ms']} -> {new_row['p95_ms']} ms ({p95:+.1f}%)"
+        )
+        print(line)
+        if rps < -threshold or p95 > threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark result files."
+    )
+    parser.add_argument("base", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    regressions = compare(_load(args.base), _load(args.new), args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold}%")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Closed-loop load driver: ``concurrency`` virtual users each send their
+next request as soon as the previous one is answered, until the
+scenario's request budget is spent.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+# (client, user index, request index) -> response
+Send = Callable[[httpx.AsyncClient, int, int], Awaitable[httpx.Response]]
+
+
+def percentile(ordered: list[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    latencies: list[float]
+
+    def as_dict(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "scenario": self.scenario,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "rps": round(self.requests / self.seconds, 2),
+            "p50_ms": ms(percentile(ordered, 0.50)),
+            "p95_ms": ms(percentile(ordered, 0.95)),
+            "p99_ms": ms(percentile(ordered, 0.99)),
+            "max_ms": ms(ordered[-1] if ordered else None),
+        }
+
+
+def login(usernames: list[str]) -> Send:
+    async def send(client, user, index):
+        return await client.post(
+            "/login", json={"username": usernames[user % len(usernames)]}
+        )
+
+    return send
+
+
+def query(usernames: list[str], pairs: int, use_cache: bool) -> Send:
+    """
+    POST /query cycling through ``pairs`` distinct gene/disease pairs;
+    fewer pairs means more cache hits.
+    """
+
+    async def send(client, user, index):
+        pair = (user * 7919 + index) % pairs
+        return await client.post(
+            "/query",
+            json={
+                "username": usernames[user % len(usernames)],
+                "gene": f"GENE{pair}",
+                "disease": f"disease {pair}",
+                "use_cache": use_cache,
+            },
+        )
+
+    return send
+
+
+def history(usernames: list[str], limit: int) -> Send:
+    async def send(client, user, index):
+        return await client.get(
+            f"/queries/{usernames[user % len(usernames)]}",
+            params={"limit": limit},
+        )
+
+    return send
+
+
+async def run_scenario(
+    base_url: str,
+    name: str,
+    send: Send,
+    concurrency: int,
+    requests: int,
+    timeout: float = 120.0,
+) -> ScenarioResult:
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+
+    async def user(client: httpx.AsyncClient, index: int) -> None:
+        nonlocal errors, remaining
+        sent = 0
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await send(client, index, sent)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+            sent += 1
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout
+    ) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(client, i) for i in range(concurrency)))
+        seconds = time.perf_counter() - started
+    return ScenarioResult(
+        name, concurrency, len(latencies), errors, seconds, latencies
+    )
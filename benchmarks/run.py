@@ -0,0 +1,251 @@
+"""
+Run the benchmark suite against a local GenEvA with stand-in upstreams:
+
+    python -m benchmarks.run [--concurrency 1 8 32] [--requests 500] \
+        [--output bench_results.json]
+
+Starts both stand-ins (see benchmarks.standins) and the API under
+uvicorn on free local ports with a throwaway database, then drives
+/login, /query and /queries/{username} at each concurrency level.
+Results (req/s, p50/p95/p99 latency, errors and the API's resident
+memory) are written as JSON, with the git commit they were measured on;
+compare two runs with ``python -m benchmarks.compare``.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks import driver
+
+ROOT = Path(__file__).resolve().parents[1]
+SCENARIOS = ("login", "query", "history")
+# The API's per-key OpenRouter limits would otherwise cap throughput at
+# a few requests per second per virtual user.
+APP_ENV = {
+    "GENEVA_OPENROUTER_RATE": "100000",
+    "GENEVA_OPENROUTER_BURST": "100000",
+    "GENEVA_OPENROUTER_CONCURRENCY": "1000",
+    "GENEVA_OPENROUTER_MAX_CONCURRENCY": "1000",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_kib(pid: int) -> dict:
+    """
+    Current and peak resident set size from /proc (Linux only).
+    """
+    values = {"rss_kib": None, "peak_rss_kib": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    values["rss_kib"] = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    values["peak_rss_kib"] = int(line.split()[1])
+    except OSError:
+        pass
+    return values
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout=30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited early")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def spawn(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=ROOT,
+        env={**os.environ, **env},
+    )
+
+
+async def seed_users(base_url: str, usernames: list[str]) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for username in usernames:
+            await client.post(
+                "/login",
+                json={"username": username, "api_key": f"key-{username}"},
+            )
+
+
+async def drive(base_url: str, args, pid: int) -> list[dict]:
+    usernames = [f"bench{i}" for i in range(max(args.concurrency))]
+    await seed_users(base_url, usernames)
+    sends = {
+        "login": driver.login(usernames),
+        "query": driver.query(usernames, args.pairs, not args.no_cache),
+        "history": driver.history(usernames, args.history_limit),
+    }
+    results = []
+    for concurrency in args.concurrency:
+        for scenario in args.scenarios:
+            result = await driver.run_scenario(
+                base_url,
+                scenario,
+                sends[scenario],
+                concurrency,
+                args.requests,
+            )
+            row = {**result.as_dict(), **memory_kib(pid)}
+            results.append(row)
+            print(
+                f"{scenario:>8} c={concurrency:<4} {row['rps']:>9} req/s  "
+                f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  "
+                f"p99 {row['p99_ms']} ms  errors {row['errors']}"
+            )
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark GenEvA against stand-in upstreams."
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--pairs", type=int, default=1_000)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--history-limit", type=int, default=50)
+    parser.add_argument("--opentargets-latency", default="lognormal:80:0.5")
+    parser.add_argument("--openrouter-latency", default="lognormal:800:0.3")
+    parser.add_argument("--evidence-rows", type=int, default=100)
+    parser.add_argument("--completion-chars", type=int, default=800)
+    parser.add_argument(
+        "--app-env",
+        nargs="*",
+        default=[],
+        metavar="KEY=VALUE",
+        help="extra GENEVA_* settings for the API under test",
+    )
+    parser.add_argument("--output", type=Path, default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    ports = {name: free_port() for name in ("opentargets", "openrouter")}
+    app_port = free_port()
+    processes = []
+    with tempfile.TemporaryDirectory() as tmp:
+        app_env = {
+            **APP_ENV,
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [str(ROOT / "src"), os.environ.get("PYTHONPATH")])
+            ),
+            "GENEVA_DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+            "GENEVA_SUGGEST_INDEX_PATH": f"{tmp}/suggest.tsv",
+            "GENEVA_OPENTARGET_URL": (
+                f"http://127.0.0.1:{ports['opentargets']}/graphql"
+            ),
+            "GENEVA_OPENROUTER_URL": (
+                f"http://127.0.0.1:{ports['openrouter']}/chat/completions"
+            ),
+            "GENEVA_HTTP2": "false",
+            **dict(item.split("=", 1) for item in args.app_env),
+        }
+        try:
+            processes.append(
+                spawn(
+                    [
+                        "-m",
+                        "benchmarks.standins",
+                        "opentargets",
+                        f"--port={ports['opentargets']}",
+                        f"--latency={args.opentargets_latency}",
+                        f"--evidence-rows={args.evidence_rows}",
+                    ],
+                    {},
+                )
+            )
+            processes.append(
+                spawn(
+                    [
+                        "-m",
+                        "benchmarks.standins",
+                        "openrouter",
+                        f"--port={ports['openrouter']}",
+                        f"--latency={args.openrouter_latency}",
+                        f"--completion-chars={args.completion_chars}",
+                    ],
+                    {},
+                )
+            )
+            app = spawn(
+                [
+                    "-m",
+                    "uvicorn",
+                    "geneva.main:app",
+                    f"--port={app_port}",
+                    "--log-level=warning",
+                ],
+                app_env,
+            )
+            processes.append(app)
+            base_url = f"http://127.0.0.1:{app_port}"
+            for port, process in zip(ports.values(), processes):
+                wait_ready(f"http://127.0.0.1:{port}/docs", process)
+            wait_ready(base_url, app)
+
+            results = asyncio.run(drive(base_url, args, app.pid))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
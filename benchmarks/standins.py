@@ -0,0 +1,191 @@
+"""
+Local stand-ins for the upstream APIs, so benchmarks measure GenEvA and
+not the network or someone else's rate limits:
+
+    python -m benchmarks.standins opentargets --port 9001 \
+        --latency lognormal:80:0.5 --evidence-rows 200
+    python -m benchmarks.standins openrouter --port 9002 \
+        --latency lognormal:1500:0.3 --completion-chars 1200
+
+Latencies are ``fixed:MS``, ``uniform:LOW_MS:HIGH_MS`` or
+``lognormal:MEDIAN_MS:SIGMA``. Answers are deterministic for a given
+name, so repeated queries hit GenEvA's caches the way real ones would.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+
+@dataclass(frozen=True)
+class Latency:
+    distribution: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        name, *params = spec.split(":")
+        if name not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {name}")
+        values = [float(p) for p in params] + [0.0, 0.0]
+        return cls(name, values[0], values[1])
+
+    def sample(self) -> float:
+        """
+        One latency in seconds.
+        """
+        if self.distribution == "uniform":
+            ms = random.uniform(self.a, self.b)
+        elif self.distribution == "lognormal":
+            ms = self.a * math.exp(random.gauss(0, self.b))
+        else:
+            ms = self.a
+        return ms / 1000
+
+
+def _number(name: str, digits: int) -> int:
+    digest = hashlib.sha256(name.strip().casefold().encode()).hexdigest()
+    return int(digest, 16) % 10**digits
+
+
+def _evidence_row(gene_id: str, disease_id: str, index: int) -> dict:
+    return {
+        "disease": {"id": disease_id, "name": f"disease {disease_id}"},
+        "diseaseFromSource": f"source disease {index}",
+        "target": {"id": gene_id, "approvedSymbol": f"SYM{gene_id[-4:]}"},
+        "mutatedSamples": [
+            {
+                "functionalConsequence": {
+                    "id": "SO_0001583",
+                    "label": "missense_variant",
+                },
+                "numberSamplesTested": 500 + index,
+                "numberMutatedSamples": index % 50,
+            }
+        ],
+        "resourceScore": round(1 / (1 + index), 6),
+        "significantDriverMethods": ["MutSig", "OncodriveFM"],
+        "cohortId": f"COHORT{index % 20}",
+        "cohortShortName": f"Cohort {index % 20}",
+        "cohortDescription": "Synthetic cohort used for benchmarking",
+    }
+
+
+def opentargets_app(latency: Latency, evidence_rows: int) -> FastAPI:
+    """
+    GraphQL stand-in answering the queries in opentarget_config.QUERIES
+    by looking at their variables. Every pair has ``evidence_rows`` rows,
+    served in pages when the query asks for them.
+    """
+    app = FastAPI()
+
+    def hits(entity: str, name: str) -> dict:
+        if entity == "target":
+            return {"hits": [{"id": f"ENSG{_number(name, 11):011d}"}]}
+        return {"hits": [{"id": f"EFO_{_number(name, 7):07d}"}]}
+
+    def evidence(variables: dict) -> dict:
+        gene_id, disease_id = variables["geneId"], variables["diseaseId"]
+        start = int(variables.get("cursor") or 0)
+        size = variables.get("size") or evidence_rows
+        end = min(evidence_rows, start + size)
+        page = {
+            "count": evidence_rows,
+            "rows": [
+                _evidence_row(gene_id, disease_id, i)
+                for i in range(start, end)
+            ],
+        }
+        if "size" in variables:
+            page["cursor"] = str(end) if end < evidence_rows else None
+        return {
+            "disease": {
+                "id": disease_id,
+                "name": f"disease {disease_id}",
+                "evidences": page,
+            }
+        }
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        body = await request.json()
+        variables = body.get("variables") or {}
+        await asyncio.sleep(latency.sample())
+        if "geneQuery" in variables:
+            data = {
+                "gene": hits("target", variables["geneQuery"]),
+                "disease": hits("disease", variables["diseaseQuery"]),
+            }
+        elif "queryString" in variables:
+            entity = "target" if "findTarget" in body["query"] else "disease"
+            data = {"search": hits(entity, variables["queryString"])}
+        else:
+            data = evidence(variables)
+        return {"data": data}
+
+    return app
+
+
+def openrouter_app(latency: Latency, completion_chars: int) -> FastAPI:
+    """
+    Chat completions stand-in returning a JSON summary of about
+    ``completion_chars`` characters, with a token ``usage`` block.
+    """
+    app = FastAPI()
+    summary = json.dumps(
+        {
+            "summary_text": ("Synthetic summary. " * completion_chars)[
+                :completion_chars
+            ],
+            "key_findings": ["Synthetic finding"],
+            "confidence": 0.5,
+        }
+    )
+
+    @app.post("/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency.sample())
+        prompt = body["messages"][0]["content"]
+        return {
+            "choices": [
+                {"message": {"role": "assistant", "content": summary}}
+            ],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(summary) // 4,
+            },
+        }
+
+    return app
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve a stand-in for an upstream API."
+    )
+    parser.add_argument("upstream", choices=["opentargets", "openrouter"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency", type=Latency.parse, default=Latency())
+    parser.add_argument("--evidence-rows", type=int, default=100)
+    parser.add_argument("--completion-chars", type=int, default=800)
+    args = parser.parse_args(argv)
+
+    if args.upstream == "opentargets":
+        app = opentargets_app(args.latency, args.evidence_rows)
+    else:
+        app = openrouter_app(args.latency, args.completion_chars)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
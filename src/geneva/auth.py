@@ -0,0 +1,111 @@
+import hashlib
+import secrets
+import time
+from typing import Optional
+
+from .cache import MISSING, LRUCache
+from .model import (
+    User,
+    acreate_user,
+    adelete_session,
+    aget_session,
+    aget_user_by_name,
+    asave_session,
+)
+
+
+def parse_bearer(authorization: Optional[str]) -> Optional[str]:
+    """
+    Extract the token from an ``Authorization: Bearer <token>`` header.
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class UserDirectory:
+    """
+    Bounded in-process cache of user records (including their OpenRouter
+    key) in front of the ``user`` table. Unknown usernames are not
+    cached, so a freshly registered user is visible immediately; any
+    code that changes a user must go through ``create`` or call
+    ``invalidate``.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.users = LRUCache(maxsize, ttl)
+        self.stats = self.users.stats
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    async def get(self, username: str) -> Optional[User]:
+        user = self.users.get(username)
+        if user is MISSING:
+            user = await aget_user_by_name(username)
+            if user is not None:
+                self.users.set(username, user)
+        return user
+
+    async def create(self, username: str, api_key: str) -> User:
+        user = await acreate_user(username, api_key)
+        self.invalidate(username)
+        return user
+
+    def invalidate(self, username: str) -> None:
+        self.users.pop(username)
+
+
+class SessionStore:
+    """
+    Opaque session tokens mapped to usernames. Tokens are random,
+    persisted in the ``usersession`` table by hash so they survive
+    restarts and work on every worker, and kept in a per-process LRU so
+    authenticated requests normally skip the database. Memory entries
+    live at most ``memory_ttl`` seconds, which bounds how long a token
+    revoked through another worker keeps working here.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, memory_ttl: float):
+        self.ttl = ttl
+        self.memory_ttl = memory_ttl
+        self.memory = LRUCache(maxsize)
+        self.stats = self.memory.stats
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    async def issue(self, username: str) -> str:
+        token = secrets.token_urlsafe(32)
+        token_hash = _token_hash(token)
+        await asave_session(token_hash, username, self.ttl)
+        self.memory.set(
+            token_hash, username, ttl=min(self.ttl, self.memory_ttl)
+        )
+        return token
+
+    async def lookup(self, token: str) -> Optional[str]:
+        token_hash = _token_hash(token)
+        username = self.memory.get(token_hash)
+        if username is not MISSING:
+            return username
+        row = await aget_session(token_hash)
+        if row is None:
+            return None
+        remaining = row.expires_at - time.time()
+        self.memory.set(
+            token_hash, row.username, ttl=min(remaining, self.memory_ttl)
+        )
+        return row.username
+
+    async def revoke(self, token: str) -> None:
+        token_hash = _token_hash(token)
+        self.memory.pop(token_hash)
+        await adelete_session(token_hash)
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class LRUCache:
+    """
+    Size-bounded in-memory cache with optional per-entry expiry.
+
+    ``get`` returns ``MISSING`` (not ``None``) on a miss so that ``None``
+    can be cached as a legitimate value.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._data: OrderedDict[Hashable, tuple[Optional[float], Any]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+                del self._data[key]
+            self.stats.misses += 1
+            return MISSING
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+@dataclass
+class SWRStats(CacheStats):
+    stale_hits: int = 0
+    refreshes: int = 0
+    refresh_errors: int = 0
+
+
+class StaleWhileRevalidateCache:
+    """
+    Async cache where entries are fresh for ``ttl`` seconds and may then
+    be served stale for another ``stale_ttl`` seconds. A stale hit
+    returns immediately and schedules a single background refresh for
+    that key; only a true miss waits for the upstream.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float):
+        self.ttl = ttl
+        self.stats = SWRStats()
+        self._entries = LRUCache(maxsize, ttl=ttl + stale_ttl)
+        self._refreshing: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        entry = self._entries.get(key)
+        self.stats.evictions = self._entries.stats.evictions
+        if entry is MISSING:
+            self.stats.misses += 1
+            value = await fetch()
+            self._store(key, value)
+            return value
+
+        fetched_at, value = entry
+        if time.monotonic() - fetched_at < self.ttl:
+            self.stats.hits += 1
+        else:
+            self.stats.stale_hits += 1
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(
+                    self._refresh(key, fetch)
+                )
+        return value
+
+    async def _refresh(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> None:
+        try:
+            self._store(key, await fetch())
+            self.stats.refreshes += 1
+        except Exception:
+            self.stats.refresh_errors += 1
+        finally:
+            self._refreshing.pop(key, None)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries.set(key, (time.monotonic(), value))
+
+    async def aclose(self) -> None:
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@dataclass
+class FlightStats:
+    calls: int = 0
+    coalesced: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls: the first caller for a key runs
+    ``fetch`` and everyone asking for the same key while it is in flight
+    awaits that same result (or exception). Nothing is kept once the
+    call finishes; pair it with a cache for that.
+
+    The shared call is shielded, so a caller that gives up does not
+    cancel it for the others.
+    """
+
+    def __init__(self):
+        self.stats = FlightStats()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats.coalesced += 1
+        else:
+            self.stats.calls += 1
+            future = asyncio.ensure_future(fetch())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # Mark the exception as retrieved even if every caller left.
+            future.exception()
@@ -0,0 +1,101 @@
+import os
+from dataclasses import dataclass, fields
+
+from .services.openrouter_config import BASE_URL as OPENROUTER_URL
+from .services.opentarget_config import BASE_URL as OPENTARGET_URL
+
+ENV_PREFIX = "GENEVA_"
+
+
+def _coerce(raw: str, default):
+    if isinstance(default, bool):
+        return raw.strip().lower() in {"1", "true", "yes", "on"}
+    if isinstance(default, int):
+        return int(raw)
+    if isinstance(default, float):
+        return float(raw)
+    return raw
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: str = "sqlite:///data/geneva.db"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_busy_timeout_ms: int = 5_000
+    db_mmap_size: int = 256 * 1024 * 1024
+    db_cache_size_kib: int = 64 * 1024
+    user_cache_size: int = 10_000
+    user_cache_ttl: float = 300.0
+    session_cache_size: int = 10_000
+    session_ttl: float = 7 * 24 * 3600.0
+    require_session: bool = False
+    http2: bool = True
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    opentarget_timeout: float = 30.0
+    openrouter_timeout: float = 60.0
+    openrouter_rate: float = 2.0
+    openrouter_burst: int = 5
+    openrouter_concurrency: int = 4
+    openrouter_max_concurrency: int = 16
+    openrouter_latency_target: float = 30.0
+    openrouter_max_retries: int = 3
+    opentarget_url: str = OPENTARGET_URL
+    openrouter_url: str = OPENROUTER_URL
+    opentarget_backend: str = "graphql"
+    opentarget_local_path: str = "data/opentargets.db"
+    suggest_index_path: str = "data/suggest.tsv"
+    opentarget_combined_resolve: bool = True
+    opentarget_retries: int = 2
+    opentarget_hedge_quantile: float = 0.95
+    opentarget_hedge_budget: float = 0.05
+    opentarget_breaker_threshold: int = 5
+    opentarget_breaker_reset: float = 30.0
+    resolution_cache_size: int = 10_000
+    resolution_ttl: float = 7 * 24 * 3600.0
+    resolution_negative_ttl: float = 3600.0
+    evidence_cache_size: int = 2_000
+    evidence_ttl: float = 24 * 3600.0
+    evidence_stale_ttl: float = 7 * 24 * 3600.0
+    summary_cache_size: int = 2_000
+    summary_ttl: float = 7 * 24 * 3600.0
+    evidence_page_size: int = 1_000
+    evidence_max_rows: int = 500
+    evidence_mode: str = "first"
+    evidence_scan_limit: int = 5_000
+    prompt_token_budget: int = 3_000
+    coalesce_requests: bool = True
+    history_page_size: int = 50
+    history_max_page_size: int = 500
+    history_write_behind: bool = False
+    history_queue_size: int = 10_000
+    history_flush_batch: int = 500
+    job_workers: int = 4
+    job_queue_size: int = 1_000
+    job_max_wait: float = 30.0
+    job_stale_after: float = 900.0
+    batch_concurrency: int = 8
+    batch_max_concurrency: int = 32
+    batch_max_pairs: int = 1_000
+    profiling_token: str = ""
+    profile_interval: float = 0.001
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Build settings from ``GENEVA_<FIELD>`` environment variables,
+        falling back to the dataclass defaults.
+        """
+        overrides = {}
+        for field in fields(cls):
+            raw = os.environ.get(ENV_PREFIX + field.name.upper())
+            if raw is not None:
+                overrides[field.name] = _coerce(raw, field.default)
+        return cls(**overrides)
+
+
+settings = Settings.from_env()
@@ -0,0 +1,57 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import create_engine
+
+from .config import settings
+
+SQLITE_PRAGMAS = {
+    # Readers no longer block the writer (and vice versa).
+    "journal_mode": "WAL",
+    # WAL makes NORMAL durable across application crashes; only an OS
+    # crash or power loss can drop the last transactions.
+    "synchronous": "NORMAL",
+    "busy_timeout": settings.db_busy_timeout_ms,
+    "temp_store": "MEMORY",
+    "mmap_size": settings.db_mmap_size,
+    # Negative values are KiB rather than pages.
+    "cache_size": -settings.db_cache_size_kib,
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Map a sync SQLite URL to its aiosqlite equivalent; URLs that already
+    name an async driver are returned unchanged.
+    """
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url.removeprefix("sqlite:")
+    return url
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+
+
+engine = create_engine(settings.database_url, echo=False, **_pool_options())
+
+# Pooled aiosqlite connections belong to the event loop that opened them;
+# the app lifespan disposes this engine on shutdown so a new loop (e.g. a
+# restarted TestClient) starts with a fresh pool.
+async_engine = create_async_engine(
+    async_database_url(settings.database_url), echo=False, **_pool_options()
+)
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
@@ -0,0 +1,178 @@
+"""
+Query history export. Parquet output has one row per evidence row, with
+the query it came from repeated alongside; writing it needs ``pyarrow``.
+"""
+
+import importlib.util
+import io
+from datetime import timezone
+from typing import AsyncIterator, Optional
+
+import orjson
+
+PARQUET_BATCH_ROWS = 5_000
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _parquet_schema(pa):
+    return pa.schema(
+        [
+            ("query_id", pa.int64()),
+            ("gene", pa.string()),
+            ("disease", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+            ("disease_id", pa.string()),
+            ("disease_name", pa.string()),
+            ("evidence_count", pa.int64()),
+            ("summary_text", pa.string()),
+            ("target_id", pa.string()),
+            ("target_symbol", pa.string()),
+            ("evidence_disease_id", pa.string()),
+            ("evidence_disease_name", pa.string()),
+            ("disease_from_source", pa.string()),
+            ("resource_score", pa.float64()),
+            ("significant_driver_methods", pa.list_(pa.string())),
+            ("cohort_id", pa.string()),
+            ("cohort_short_name", pa.string()),
+            ("cohort_description", pa.string()),
+            (
+                "mutated_samples",
+                pa.list_(
+                    pa.struct(
+                        [
+                            ("functional_consequence_id", pa.string()),
+                            ("functional_consequence_label", pa.string()),
+                            ("number_samples_tested", pa.int64()),
+                            ("number_mutated_samples", pa.int64()),
+                        ]
+                    )
+                ),
+            ),
+        ]
+    )
+
+
+def _loads(text: Optional[str]) -> dict:
+    value = orjson.loads(text) if text else None
+    return value if isinstance(value, dict) else {}
+
+
+def _mutated_sample(sample: dict) -> dict:
+    consequence = sample.get("functionalConsequence") or {}
+    return {
+        "functional_consequence_id": consequence.get("id"),
+        "functional_consequence_label": consequence.get("label"),
+        "number_samples_tested": sample.get("numberSamplesTested"),
+        "number_mutated_samples": sample.get("numberMutatedSamples"),
+    }
+
+
+def evidence_rows(query) -> list[dict]:
+    """
+    Flat rows for one stored query: one per evidence row, or a single row
+    with empty evidence columns when there was none.
+    """
+    association = _loads(query.service_response)
+    evidences = association.get("evidences") or {}
+    base = {
+        "query_id": query.id,
+        "gene": query.gene,
+        "disease": query.disease,
+        "created_at": query.created_at.replace(tzinfo=timezone.utc),
+        "disease_id": association.get("id"),
+        "disease_name": association.get("name"),
+        "evidence_count": evidences.get("count"),
+        "summary_text": _loads(query.llm_response).get("summary_text"),
+    }
+    rows = []
+    for row in evidences.get("rows") or []:
+        target = row.get("target") or {}
+        disease = row.get("disease") or {}
+        rows.append(
+            {
+                **base,
+                "target_id": target.get("id"),
+                "target_symbol": target.get("approvedSymbol"),
+                "evidence_disease_id": disease.get("id"),
+                "evidence_disease_name": disease.get("name"),
+                "disease_from_source": row.get("diseaseFromSource"),
+                "resource_score": row.get("resourceScore"),
+                "significant_driver_methods": row.get(
+                    "significantDriverMethods"
+                ),
+                "cohort_id": row.get("cohortId"),
+                "cohort_short_name": row.get("cohortShortName"),
+                "cohort_description": row.get("cohortDescription"),
+                "mutated_samples": [
+                    _mutated_sample(sample)
+                    for sample in row.get("mutatedSamples") or []
+                ],
+            }
+        )
+    return rows or [base]
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file handing the Parquet writer's output back in chunks.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        return chunk
+
+
+async def parquet_chunks(
+    queries: AsyncIterator, batch_rows: int = PARQUET_BATCH_ROWS
+) -> AsyncIterator[bytes]:
+    """
+    Parquet file bytes for ``queries``, written one row group per
+    ``batch_rows`` evidence rows so only one group is held in memory.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError(
+            "Parquet export needs pyarrow: install geneva[parquet]"
+        ) from e
+
+    schema = _parquet_schema(pa)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    rows: list[dict] = []
+
+    def flush() -> bytes:
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        rows.clear()
+        return sink.drain()
+
+    try:
+        async for query in queries:
+            rows.extend(evidence_rows(query))
+            if len(rows) >= batch_rows:
+                yield flush()
+        if rows:
+            yield flush()
+    finally:
+        writer.close()
+    yield sink.drain()
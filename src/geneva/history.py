@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .model import asave_user_queries, new_query_id
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WriterStats:
+    written: int = 0
+    batches: int = 0
+    failed: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class HistoryWriter:
+    """
+    Write-behind queue for query history. ``submit`` assigns the id and
+    timestamp up front and returns immediately; a background task drains
+    the queue and writes whatever has accumulated in a single transaction
+    (group commit), so bursts of queries cost one commit per batch.
+
+    The queue is bounded: when it is full, ``submit`` waits for the
+    flusher instead of dropping records. ``aclose`` writes everything
+    still queued before stopping.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        batch_size: int,
+        save_batch: Callable[[list], Awaitable[Any]] = asave_user_queries,
+        next_id: Optional[Callable[[], Awaitable[int]]] = None,
+    ):
+        self.batch_size = batch_size
+        self.stats = WriterStats()
+        self._save_batch = save_batch
+        self._next_id = next_id or new_query_id.anext
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(
+        self,
+        user_id: int,
+        gene: str,
+        disease: str,
+        service_response: Dict[str, Any],
+        llm_response: Optional[Dict[str, Any]] = None,
+    ) -> tuple[int, datetime]:
+        record = {
+            "id": await self._next_id(),
+            "created_at": datetime.now(timezone.utc),
+            "user_id": user_id,
+            "gene": gene,
+            "disease": disease,
+            "service_response": service_response,
+            "llm_response": llm_response,
+        }
+        await self._queue.put(record)
+        return record["id"], record["created_at"]
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: list) -> None:
+        try:
+            await self._save_batch(batch)
+        except Exception:
+            if len(batch) == 1:
+                self.stats.failed += 1
+                logger.exception("Failed to write history record")
+                return
+            # One bad record must not take the rest of the group with
+            # it: their ids have already been handed out.
+            logger.warning(
+                "Failed to write %d history records, retrying one by one",
+                len(batch),
+                exc_info=True,
+            )
+            for record in batch:
+                await self._write([record])
+        else:
+            self.stats.written += len(batch)
+            self.stats.batches += 1
+
+    async def flush(self) -> None:
+        await self._queue.join()
+
+    async def aclose(self) -> None:
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,98 @@
+"""
+Build the local Open Targets store from release dumps:
+
+    python -m geneva.ingest --targets DIR --diseases DIR --evidence DIR \
+        [--output data/opentargets.db] [--suggest-output data/suggest.tsv]
+
+Each input is a file or a directory searched recursively for JSON lines
+(``.json``, ``.jsonl``, optionally gzipped) and Parquet files, as found in
+the Open Targets platform releases. Reading Parquet needs ``pyarrow``.
+The name index for ``/suggest`` is written alongside the store.
+"""
+
+import argparse
+import gzip
+import json
+from pathlib import Path
+from typing import Iterator
+
+from .config import settings
+from .services.opentarget_local import build_store, store_names
+from .services.suggest import write_suggest_index
+
+JSON_SUFFIXES = (".json", ".jsonl", ".json.gz", ".jsonl.gz")
+
+
+def _dump_files(path: Path) -> list[Path]:
+    if path.is_file():
+        return [path]
+    return sorted(
+        p
+        for p in path.rglob("*")
+        if p.is_file()
+        and (p.name.endswith(JSON_SUFFIXES) or p.suffix == ".parquet")
+    )
+
+
+def _read_json_lines(path: Path) -> Iterator[dict]:
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_parquet(path: Path) -> Iterator[dict]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit(
+            f"Reading {path} needs pyarrow: install geneva[parquet]"
+        ) from e
+    for batch in pq.ParquetFile(path).iter_batches():
+        yield from batch.to_pylist()
+
+
+def read_dump(path: Path) -> Iterator[dict]:
+    for file in _dump_files(path):
+        if file.suffix == ".parquet":
+            yield from _read_parquet(file)
+        else:
+            yield from _read_json_lines(file)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the local Open Targets store from release dumps."
+    )
+    parser.add_argument("--targets", type=Path, required=True)
+    parser.add_argument("--diseases", type=Path, required=True)
+    parser.add_argument("--evidence", type=Path, required=True)
+    parser.add_argument(
+        "--output", default=settings.opentarget_local_path, type=Path
+    )
+    parser.add_argument(
+        "--suggest-output", default=settings.suggest_index_path, type=Path
+    )
+    args = parser.parse_args(argv)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    counts = build_store(
+        str(args.output),
+        read_dump(args.targets),
+        read_dump(args.diseases),
+        read_dump(args.evidence),
+    )
+    print(
+        ", ".join(f"{count} {name}" for name, count in counts.items()),
+        f"written to {args.output}",
+    )
+    args.suggest_output.parent.mkdir(parents=True, exist_ok=True)
+    count = write_suggest_index(
+        str(args.suggest_output), store_names(str(args.output))
+    )
+    print(f"{count} suggestion names written to {args.suggest_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from .model import (
+    QueryJob,
+    aclaim_job,
+    acreate_job,
+    aget_job,
+    arelease_jobs,
+    arequeue_jobs,
+    aupdate_job,
+)
+
+FINISHED = {"done", "failed"}
+# How often long-polls re-read jobs that another process is running.
+JOB_POLL_INTERVAL = 0.5
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class JobStats:
+    completed: int = 0
+    failed: int = 0
+
+
+class JobQueue:
+    """
+    In-process worker pool for /query jobs. Job state lives in the
+    ``queryjob`` table: ``submit`` stores the job before queueing it, and
+    ``start`` queues every job still waiting in the database, plus jobs
+    that have been running for over ``stale_after`` seconds (their
+    process is presumed dead), so accepted jobs survive restarts. Jobs
+    beyond ``maxsize`` are fed in as workers free up, so a long backlog
+    does not hold up startup; ``aclose`` puts the jobs it interrupts
+    back in the queue.
+
+    Workers claim a job by moving it from queued to running in a single
+    UPDATE, so when several processes share the database each job still
+    runs once.
+
+    ``run`` performs the actual query for a job and returns the id of
+    the saved history row; an exception marks the job failed.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[QueryJob], Awaitable[int]],
+        workers: int,
+        maxsize: int,
+        stale_after: float = 900.0,
+    ):
+        self.workers = workers
+        self.stale_after = stale_after
+        self.stats = JobStats()
+        self._run = run
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._events: dict[str, asyncio.Event] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._busy = 0
+        # Jobs this process has claimed and not yet finished.
+        self._claimed: set[str] = set()
+        # Slots promised to submits still writing their job row.
+        self._reserved = 0
+
+    async def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+        job_ids = await arequeue_jobs(self.stale_after)
+        for job_id in job_ids:
+            self._events[job_id] = asyncio.Event()
+        self._tasks.append(asyncio.create_task(self._feed(job_ids)))
+
+    async def _feed(self, job_ids: list[str]) -> None:
+        for job_id in job_ids:
+            await self._queue.put(job_id)
+
+    def _full(self) -> bool:
+        maxsize = self._queue.maxsize
+        return 0 < maxsize <= self._queue.qsize() + self._reserved
+
+    async def submit(
+        self, username: str, gene: str, disease: str, use_cache: bool
+    ) -> QueryJob:
+        if self._full():
+            raise JobQueueFull("Job queue is full, try again later")
+        self._reserved += 1
+        try:
+            job = await acreate_job(
+                QueryJob(
+                    id=uuid.uuid4().hex,
+                    username=username,
+                    gene=gene,
+                    disease=disease,
+                    use_cache=use_cache,
+                )
+            )
+            self._events[job.id] = asyncio.Event()
+            self._queue.put_nowait(job.id)
+        finally:
+            self._reserved -= 1
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[QueryJob]:
+        """
+        Return the job once it has finished or ``timeout`` seconds have
+        passed, whichever comes first.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await aget_job(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in FINISHED or remaining <= 0:
+                return job
+            event = self._events.get(job_id)
+            waiter = (
+                event.wait() if event else asyncio.sleep(JOB_POLL_INTERVAL)
+            )
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._busy += 1
+            try:
+                await self._process(job_id)
+            finally:
+                self._busy -= 1
+                self._queue.task_done()
+                event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+
+    async def _process(self, job_id: str) -> None:
+        job = await aclaim_job(job_id)
+        if job is None:
+            return
+        self._claimed.add(job_id)
+        try:
+            query_id = await self._run(job)
+        except Exception as e:
+            self.stats.failed += 1
+            await aupdate_job(
+                job_id,
+                status="failed",
+                error=str(e),
+                finished_at=datetime.now(timezone.utc),
+            )
+        else:
+            self.stats.completed += 1
+            await aupdate_job(
+                job_id,
+                status="done",
+                query_id=query_id,
+                finished_at=datetime.now(timezone.utc),
+            )
+        self._claimed.discard(job_id)
+
+    def as_dict(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "running": self._busy,
+            "workers": self.workers,
+            "utilization": self._busy / self.workers,
+            "completed": self.stats.completed,
+            "failed": self.stats.failed,
+        }
+
+    async def aclose(self) -> None:
+        """
+        Stop the workers. Jobs they were running go back to queued, so
+        they and the jobs still waiting are picked up again by the next
+        ``start``.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await arelease_jobs(sorted(self._claimed))
+        self._claimed.clear()
@@ -1,22 +1,69 @@
+import asyncio
 from contextlib import asynccontextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+import orjson
+from fastapi import FastAPI, Header, Query
+from fastapi.responses import (
+    FileResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from .auth import SessionStore, UserDirectory, parse_bearer
+from .cache import MISSING, LRUCache, SingleFlight, StaleWhileRevalidateCache
+from .config import settings
+from .db import async_engine
+from .export import parquet_available, parquet_chunks
+from .history import HistoryWriter
+from .jobs import JobQueue, JobQueueFull
+from .metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    register_cache_metrics,
+    registry,
+    stage,
+)
 from .model import (
+    aget_user_queries_page,
+    aget_user_query,
+    asave_user_query,
+    astream_user_queries,
     create_tables,
-    create_user,
-    get_user_by_name,
-    get_user_queries,
-    save_user_query,
 )
-from .services.openrouter import OpenRouterService
-from .services.opentarget import OpenTargetService
-from .utils import error, success
+from .pipeline import llm_error, run_batch, summarize
+from .profiling import (
+    PROFILE_HEADER,
+    PROFILE_STORE_SIZE,
+    ServerTimingMiddleware,
+    profiling_allowed,
+)
+from .services.base import AsyncGeneDiseaseService
+from .services.clients import create_async_client
+from .services.openrouter import AsyncOpenRouterService
+from .services.openrouter_config import RateLimits
+from .services.opentarget import AsyncOpenTargetService
+from .services.opentarget_config import EvidencePaging, Resilience
+from .services.opentarget_local import (
+    AsyncLocalOpenTargetService,
+    LocalOpenTargetService,
+)
+from .services.ratelimit import RateLimiterRegistry
+from .services.resolution import ResolutionCache
+from .services.suggest import SuggestIndex
+from .utils import (
+    decode_cursor,
+    encode_cursor,
+    error,
+    raw_json,
+    sse_event,
+    success,
+)
 
 
 class LoginRequest(BaseModel):
@@ -25,18 +72,274 @@ class LoginRequest(BaseModel):
 
 
 class GeneDiseaseRequest(BaseModel):
-    username: str
+    username: Optional[str] = None
+    gene: str
+    disease: str
+    use_cache: bool = True
+
+
+class GeneDiseasePair(BaseModel):
     gene: str
     disease: str
 
 
+class BatchQueryRequest(BaseModel):
+    username: Optional[str] = None
+    pairs: list[GeneDiseasePair] = Field(max_length=settings.batch_max_pairs)
+    concurrency: Optional[int] = Field(
+        default=None, ge=1, le=settings.batch_max_concurrency
+    )
+    use_cache: bool = True
+
+
+def load_suggest_index() -> Optional[SuggestIndex]:
+    """
+    The name index written by ``python -m geneva.ingest``, if present.
+    """
+    if not Path(settings.suggest_index_path).is_file():
+        return None
+    return SuggestIndex.load(settings.suggest_index_path)
+
+
+def build_target_service(
+    client,
+    resolution_cache: ResolutionCache,
+    evidence_cache,
+    name_index: Optional[SuggestIndex] = None,
+) -> AsyncGeneDiseaseService:
+    """
+    The Open Targets backend selected by GENEVA_OPENTARGET_BACKEND:
+    ``graphql`` (the public API) or ``local`` (a store built by
+    ``python -m geneva.ingest``).
+    """
+    paging = EvidencePaging(
+        page_size=settings.evidence_page_size,
+        max_rows=settings.evidence_max_rows,
+        mode=settings.evidence_mode,
+        scan_limit=settings.evidence_scan_limit,
+    )
+    if settings.opentarget_backend == "local":
+        return AsyncLocalOpenTargetService(
+            LocalOpenTargetService(
+                settings.opentarget_local_path, paging=paging
+            )
+        )
+    if settings.opentarget_backend != "graphql":
+        raise ValueError(
+            f"Unknown Open Targets backend: {settings.opentarget_backend}"
+        )
+    return AsyncOpenTargetService(
+        client,
+        combined=settings.opentarget_combined_resolve,
+        resolution_cache=resolution_cache,
+        evidence_cache=evidence_cache,
+        paging=paging,
+        coalesce=settings.coalesce_requests,
+        resilience=Resilience(
+            retries=settings.opentarget_retries,
+            hedge_quantile=settings.opentarget_hedge_quantile or None,
+            hedge_budget=settings.opentarget_hedge_budget,
+            breaker_threshold=settings.opentarget_breaker_threshold,
+            breaker_reset=settings.opentarget_breaker_reset,
+        ),
+        name_index=name_index,
+        base_url=settings.opentarget_url,
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_tables()
-    yield
+    resolution_cache = ResolutionCache(
+        maxsize=settings.resolution_cache_size,
+        ttl=settings.resolution_ttl,
+        negative_ttl=settings.resolution_negative_ttl,
+    )
+    evidence_cache = StaleWhileRevalidateCache(
+        maxsize=settings.evidence_cache_size,
+        ttl=settings.evidence_ttl,
+        stale_ttl=settings.evidence_stale_ttl,
+    )
+    summary_cache = LRUCache(
+        maxsize=settings.summary_cache_size, ttl=settings.summary_ttl
+    )
+    app.state.users = UserDirectory(
+        maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl
+    )
+    app.state.sessions = SessionStore(
+        maxsize=settings.session_cache_size,
+        ttl=settings.session_ttl,
+        memory_ttl=settings.user_cache_ttl,
+    )
+    app.state.caches = {
+        "resolution": resolution_cache,
+        "evidence": evidence_cache,
+        "summary": summary_cache,
+        "users": app.state.users,
+        "sessions": app.state.sessions,
+    }
+    register_cache_metrics(app.state.caches)
+    # Building the trigram index takes seconds for a full release.
+    app.state.suggest_index = await asyncio.get_running_loop().run_in_executor(
+        None, load_suggest_index
+    )
+    async with (
+        create_async_client(
+            settings.opentarget_timeout, upstream="opentargets"
+        ) as opentarget_client,
+        create_async_client(
+            settings.openrouter_timeout, upstream="openrouter"
+        ) as openrouter_client,
+    ):
+        app.state.target_service = build_target_service(
+            opentarget_client,
+            resolution_cache,
+            evidence_cache,
+            app.state.suggest_index,
+        )
+        app.state.openrouter_client = openrouter_client
+        app.state.openrouter_limiters = RateLimiterRegistry(
+            RateLimits(
+                rate=settings.openrouter_rate,
+                burst=settings.openrouter_burst,
+                concurrency=settings.openrouter_concurrency,
+                max_concurrency=settings.openrouter_max_concurrency,
+                latency_target=settings.openrouter_latency_target,
+                max_retries=settings.openrouter_max_retries,
+            ),
+            maxsize=settings.user_cache_size,
+        )
+        app.state.summary_flight = (
+            SingleFlight() if settings.coalesce_requests else None
+        )
+        app.state.history_writer = None
+        if settings.history_write_behind:
+            app.state.history_writer = HistoryWriter(
+                maxsize=settings.history_queue_size,
+                batch_size=settings.history_flush_batch,
+            )
+            app.state.history_writer.start()
+        app.state.jobs = JobQueue(
+            run_query_job,
+            workers=settings.job_workers,
+            maxsize=settings.job_queue_size,
+            stale_after=settings.job_stale_after,
+        )
+        await app.state.jobs.start()
+        yield
+        await app.state.jobs.aclose()
+        if app.state.history_writer is not None:
+            await app.state.history_writer.aclose()
+        await evidence_cache.aclose()
+    await async_engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
+profiles = LRUCache(maxsize=PROFILE_STORE_SIZE)
+app.add_middleware(
+    ServerTimingMiddleware, config=lambda: settings, profiles=profiles
+)
+app.add_middleware(MetricsMiddleware)
+
+
+def llm_service_for(user) -> AsyncOpenRouterService:
+    return AsyncOpenRouterService(
+        api_key=user.api_key,
+        client=app.state.openrouter_client,
+        summary_cache=app.state.caches["summary"],
+        prompt_token_budget=settings.prompt_token_budget,
+        single_flight=app.state.summary_flight,
+        rate_limiter=app.state.openrouter_limiters.for_key(user.api_key),
+        base_url=settings.openrouter_url,
+    )
+
+
+async def authenticate(authorization: Optional[str], username: Optional[str]):
+    """
+    Resolve the calling user. A ``Bearer`` session token from /login
+    wins; without one the request falls back to the ``username`` it
+    names, unless GENEVA_REQUIRE_SESSION is set. Returns
+    ``(user, None)`` or ``(None, error_response)``.
+    """
+    token = parse_bearer(authorization)
+    if token:
+        with stage("auth"):
+            session_user = await app.state.sessions.lookup(token)
+        if session_user is None:
+            return None, error(
+                "Invalid or expired session token", status_code=401
+            )
+        if username and username != session_user:
+            return None, error(
+                "Session does not belong to this user", status_code=403
+            )
+        username = session_user
+    elif settings.require_session:
+        return None, error("Session token required", status_code=401)
+
+    with stage("auth"):
+        user = await app.state.users.get(username) if username else None
+    if not user:
+        return None, error("User not found", status_code=404)
+    return user, None
+
+
+async def store_query(
+    user_id: int,
+    gene: str,
+    disease: str,
+    service_response: dict,
+    llm_response: Optional[dict],
+    llm_failed: bool = False,
+) -> tuple[int, datetime]:
+    """
+    Record a query in the user's history and return its id and
+    timestamp. In write-behind mode the row is only queued here and
+    written by the history writer shortly after. Failed LLM calls are
+    stored without a summary.
+    """
+    record = {
+        "user_id": user_id,
+        "gene": gene,
+        "disease": disease,
+        "service_response": service_response,
+        "llm_response": None if llm_failed else llm_response,
+    }
+    writer = app.state.history_writer
+    with stage("store"):
+        if writer is not None:
+            return await writer.submit(**record)
+        saved = await asave_user_query(**record)
+    return saved.id, saved.created_at
+
+
+async def run_query_job(job) -> int:
+    """
+    Worker side of POST /jobs/query: the /query pipeline for one job.
+    The history row is written directly, even in write-behind mode, so
+    a finished job always points at a readable row.
+    """
+    user = await app.state.users.get(job.username)
+    if not user:
+        raise LookupError("User not found")
+    try:
+        service_response = await app.state.target_service.fetch_association(
+            job.gene, job.disease
+        )
+    except Exception as e:
+        raise RuntimeError(f"OpenTargetService error: {str(e)}") from e
+    llm_response, llm_failed = await summarize(
+        llm_service_for(user), service_response, job.use_cache
+    )
+    with stage("store"):
+        saved = await asave_user_query(
+            user_id=user.id,
+            gene=job.gene,
+            disease=job.disease,
+            service_response=service_response,
+            llm_response=None if llm_failed else llm_response,
+        )
+    return saved.id
 
 
 static_path = Path(__file__).parent / "static"
@@ -48,6 +351,51 @@ async def root():
     return success("GenEvA is running!")
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return success(
+        "Cache statistics",
+        {
+            name: {"size": len(cache), **cache.stats.as_dict()}
+            for name, cache in app.state.caches.items()
+        },
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    profile_token: Optional[str] = Header(default=None, alias=PROFILE_HEADER),
+):
+    """
+    Sampling profile of a request sent with ``X-Geneva-Profile``, in the
+    folded-stacks format of flame graph tools.
+    """
+    if not profiling_allowed(settings, profile_token):
+        return error("Profiling not allowed", status_code=403)
+    profile = profiles.get(profile_id)
+    if profile is MISSING:
+        return error("Profile not found", status_code=404)
+    return PlainTextResponse(profile)
+
+
+@app.get("/suggest")
+async def suggest(
+    kind: Literal["gene", "disease"] = Query(alias="type"),
+    q: str = Query(min_length=1),
+    limit: int = Query(default=10, ge=1, le=50),
+):
+    index = app.state.suggest_index
+    if index is None:
+        return error("Suggestion index not available", status_code=503)
+    return success("Suggestions", index.suggest(kind, q, limit))
+
+
 @app.get("/app")
 def serve_frontend():
     index_file = static_path / "index.html"
@@ -57,27 +405,47 @@ def serve_frontend():
 
 
 @app.post("/login")
-def login(request: LoginRequest):
-    user = get_user_by_name(request.username)
+async def login(request: LoginRequest):
+    users = app.state.users
+    user = await users.get(request.username)
 
     if request.api_key:
         if user:
             return error("Username already taken", status_code=409)
-        create_user(request.username, request.api_key)
-        return success(
-            "User registered and logged in", {"username": request.username}
-        )
-
-    if not user:
+        user = await users.create(request.username, request.api_key)
+        message = "User registered and logged in"
+    elif not user:
         return error("User not found, registration required", status_code=404)
-    return success("User logged in successfully", {"username": user.username})
+    else:
+        message = "User logged in successfully"
+
+    token = await app.state.sessions.issue(user.username)
+    return success(
+        message,
+        {
+            "username": user.username,
+            "token": token,
+            "expires_in": settings.session_ttl,
+        },
+    )
+
+
+@app.post("/logout")
+async def logout(authorization: Optional[str] = Header(default=None)):
+    token = parse_bearer(authorization)
+    if not token:
+        return error("Session token required", status_code=401)
+    await app.state.sessions.revoke(token)
+    return success("Logged out")
 
 
 @app.get("/user/{username}")
-def get_user_info(username: str):
-    user = get_user_by_name(username)
-    if not user:
-        return error("User not found", status_code=404)
+async def get_user_info(
+    username: str, authorization: Optional[str] = Header(default=None)
+):
+    user, failure = await authenticate(authorization, username)
+    if failure:
+        return failure
     return success(
         "User info retrieved",
         {"username": user.username, "has_api_key": bool(user.api_key)},
@@ -85,68 +453,332 @@ def get_user_info(username: str):
 
 
 @app.post("/query")
-def run_gene_disease_query(request: GeneDiseaseRequest):
-    user = get_user_by_name(request.username)
-    if not user:
-        return error("User not found", status_code=404)
+async def run_gene_disease_query(
+    request: GeneDiseaseRequest,
+    authorization: Optional[str] = Header(default=None),
+):
+    user, failure = await authenticate(authorization, request.username)
+    if failure:
+        return failure
 
-    target_service = OpenTargetService()
+    target_service = app.state.target_service
     try:
-        service_response = target_service.fetch_association(
+        service_response = await target_service.fetch_association(
             request.gene, request.disease
         )
     except Exception as e:
         return error(f"OpenTargetService error: {str(e)}", status_code=500)
 
-    llm_service = OpenRouterService(api_key=user.api_key)
-    try:
-        llm_response = llm_service.summarize_gene_disease(service_response)
-    except Exception as e:
-        llm_response = {
-            "summary_text": f"LLM error: {str(e)}",
-            "key_findings": [],
-            "confidence": None,
-        }
+    llm_response, llm_failed = await summarize(
+        llm_service_for(user), service_response, request.use_cache
+    )
 
-    saved = save_user_query(
-        user_id=user.id,
-        gene=request.gene,
-        disease=request.disease,
-        service_response=service_response,
-        llm_response=llm_response,
+    query_id, created_at = await store_query(
+        user.id,
+        request.gene,
+        request.disease,
+        service_response,
+        llm_response,
+        llm_failed,
     )
 
     return success(
         "Query executed successfully",
         {
-            "id": saved.id,
-            "gene": saved.gene,
-            "disease": saved.disease,
+            "id": query_id,
+            "gene": request.gene,
+            "disease": request.disease,
             "service_response": service_response,
             "llm_response": llm_response,
-            "created_at": saved.created_at.isoformat(),
+            "created_at": created_at.isoformat(),
         },
     )
 
 
+@app.post("/query/stream")
+async def stream_gene_disease_query(
+    request: GeneDiseaseRequest,
+    authorization: Optional[str] = Header(default=None),
+):
+    """
+    Server-sent events variant of /query: an ``evidence`` event as soon
+    as Open Targets answers, ``delta`` events while the LLM writes, and
+    a final ``summary`` event once the result has been recorded.
+    """
+    user, failure = await authenticate(authorization, request.username)
+    if failure:
+        return failure
+
+    target_service = app.state.target_service
+    llm_service = llm_service_for(user)
+
+    async def events():
+        try:
+            service_response = await target_service.fetch_association(
+                request.gene, request.disease
+            )
+        except Exception as e:
+            yield sse_event(
+                "error", {"message": f"OpenTargetService error: {str(e)}"}
+            )
+            return
+        yield sse_event("evidence", service_response)
+
+        llm_response, llm_failed = None, False
+        try:
+            with stage("llm"):
+                async for kind, value in llm_service.stream_summary(
+                    service_response, use_cache=request.use_cache
+                ):
+                    if kind == "delta":
+                        yield sse_event("delta", {"text": value})
+                    else:
+                        llm_response = value
+        except Exception as e:
+            llm_response, llm_failed = llm_error(e), True
+
+        query_id, created_at = await store_query(
+            user.id,
+            request.gene,
+            request.disease,
+            service_response,
+            llm_response,
+            llm_failed,
+        )
+        yield sse_event(
+            "summary",
+            {
+                "id": query_id,
+                "gene": request.gene,
+                "disease": request.disease,
+                "llm_response": llm_response,
+                "created_at": created_at.isoformat(),
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/batch")
+async def run_batch_query(
+    request: BatchQueryRequest,
+    authorization: Optional[str] = Header(default=None),
+):
+    user, failure = await authenticate(authorization, request.username)
+    if failure:
+        return failure
+
+    results = run_batch(
+        app.state.target_service,
+        llm_service_for(user),
+        [(pair.gene, pair.disease) for pair in request.pairs],
+        concurrency=request.concurrency or settings.batch_concurrency,
+        use_cache=request.use_cache,
+    )
+
+    async def ndjson():
+        async for result in results:
+            if result["status"] == "success":
+                query_id, created_at = await store_query(
+                    user.id,
+                    result["gene"],
+                    result["disease"],
+                    result["service_response"],
+                    result["llm_response"],
+                    result.pop("llm_failed"),
+                )
+                result["id"] = query_id
+                result["created_at"] = created_at.isoformat()
+            yield orjson.dumps(result) + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@app.post("/jobs/query")
+async def submit_query_job(
+    request: GeneDiseaseRequest,
+    authorization: Optional[str] = Header(default=None),
+):
+    """
+    Queue a /query run and return its job id straight away; poll
+    GET /jobs/{job_id} for the result.
+    """
+    user, failure = await authenticate(authorization, request.username)
+    if failure:
+        return failure
+    try:
+        job = await app.state.jobs.submit(
+            user.username, request.gene, request.disease, request.use_cache
+        )
+    except JobQueueFull as e:
+        return error(str(e), status_code=503)
+    return success("Query job queued", await job_record(job))
+
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return success("Job queue statistics", app.state.jobs.as_dict())
+
+
+@app.get("/jobs/{job_id}")
+async def get_query_job(
+    job_id: str,
+    username: Optional[str] = None,
+    wait: float = Query(default=0, ge=0, le=settings.job_max_wait),
+    authorization: Optional[str] = Header(default=None),
+):
+    """
+    Job status. With ``wait`` > 0 the request is held open for up to
+    that many seconds until the job finishes (long polling).
+    """
+    user, failure = await authenticate(authorization, username)
+    if failure:
+        return failure
+    job = await app.state.jobs.wait(job_id, wait)
+    if not job or job.username != user.username:
+        return error("Job not found", status_code=404)
+    return success("Query job retrieved", await job_record(job, user.id))
+
+
+async def job_record(job, user_id: Optional[int] = None) -> dict:
+    record = {
+        "id": job.id,
+        "status": job.status,
+        "gene": job.gene,
+        "disease": job.disease,
+        "created_at": job.created_at.isoformat(),
+    }
+    if job.finished_at:
+        record["finished_at"] = job.finished_at.isoformat()
+    if job.error:
+        record["error"] = job.error
+    if job.query_id and user_id is not None:
+        query = await aget_user_query(user_id, job.query_id)
+        if query:
+            record["result"] = query_record(query)
+    return record
+
+
+def query_record(q, full: bool = True) -> dict:
+    record = {
+        "id": q.id,
+        "gene": q.gene,
+        "disease": q.disease,
+        "created_at": q.created_at.isoformat(),
+    }
+    if full:
+        record["service_response"] = raw_json(q.service_response)
+        record["llm_response"] = raw_json(q.llm_response)
+    return record
+
+
 @app.get("/queries/{username}")
-def list_user_queries(username: str):
-    user = get_user_by_name(username)
-    if not user:
-        return error("User not found", status_code=404)
+async def list_user_queries(
+    username: str,
+    limit: int = Query(
+        default=settings.history_page_size,
+        ge=1,
+        le=settings.history_max_page_size,
+    ),
+    cursor: Optional[str] = None,
+    fields: Literal["full", "summary"] = "full",
+    authorization: Optional[str] = Header(default=None),
+):
+    """
+    Newest-first history page. Pass ``meta.next_cursor`` back as
+    ``cursor`` to get the next page; ``fields=summary`` leaves out the
+    stored service and LLM responses.
+    """
+    user, failure = await authenticate(authorization, username)
+    if failure:
+        return failure
+
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return error(str(e), status_code=400)
+
+    full = fields == "full"
+    with stage("history"):
+        queries = await aget_user_queries_page(
+            user.id, limit, before=before, full=full
+        )
+    next_cursor = None
+    if len(queries) == limit:
+        last = queries[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
 
-    queries = get_user_queries(user.id)
     return success(
         "User queries retrieved",
-        [
-            {
-                "id": q.id,
-                "gene": q.gene,
-                "disease": q.disease,
-                "service_response": q.service_response,
-                "llm_response": q.llm_response,
-                "created_at": q.created_at.isoformat(),
-            }
-            for q in queries
-        ],
+        [query_record(q, full) for q in queries],
+        meta={"next_cursor": next_cursor},
     )
+
+
+# Registered before /queries/{username}/{query_id}, which would otherwise
+# take "export" as a query id.
+@app.get("/queries/{username}/export")
+async def export_user_queries(
+    username: str,
+    format: Literal["ndjson", "parquet"] = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gene: Optional[str] = None,
+    disease: Optional[str] = None,
+    authorization: Optional[str] = Header(default=None),
+):
+    """
+    Full oldest-first history, streamed from the database rather than
+    loaded at once. ``since`` (inclusive) and ``until`` (exclusive)
+    bound ``created_at``; ``gene`` and ``disease`` match
+    case-insensitively. ``format=parquet`` flattens the evidence rows
+    into columns and needs pyarrow on the server.
+    """
+    user, failure = await authenticate(authorization, username)
+    if failure:
+        return failure
+    if format == "parquet" and not parquet_available():
+        return error(
+            "Parquet export needs pyarrow on the server", status_code=501
+        )
+
+    queries = astream_user_queries(
+        user.id, since=since, until=until, gene=gene, disease=disease
+    )
+    if format == "parquet":
+        return StreamingResponse(
+            parquet_chunks(queries),
+            media_type="application/vnd.apache.parquet",
+            headers={
+                "Content-Disposition": (
+                    'attachment; filename="queries.parquet"'
+                )
+            },
+        )
+
+    async def ndjson():
+        async for q in queries:
+            yield orjson.dumps(query_record(q)) + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@app.get("/queries/{username}/{query_id}")
+async def get_user_query_record(
+    username: str,
+    query_id: int,
+    authorization: Optional[str] = Header(default=None),
+):
+    user, failure = await authenticate(authorization, username)
+    if failure:
+        return failure
+
+    with stage("history"):
+        query = await aget_user_query(user.id, query_id)
+    if not query:
+        return error("Query not found", status_code=404)
+    return success("User query retrieved", query_record(query))
@@ -0,0 +1,341 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Mapping, Optional
+
+# Upper bounds (seconds) of the latency histogram buckets; a +Inf bucket
+# is always added.
+LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter per label combination.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self._values.items()):
+            yield (
+                f"{self.name}{_labels(self.labelnames, labels)} "
+                f"{_number(value)}"
+            )
+
+
+class Histogram:
+    """
+    Cumulative histogram per label combination, rendered with the
+    ``_bucket``/``_sum``/``_count`` series Prometheus expects.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> Iterator[str]:
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            plain = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{plain} {_number(total)}"
+            yield f"{self.name}_count{plain} {cumulative}"
+
+
+class CallbackMetric:
+    """
+    Values read from elsewhere (e.g. cache stats) when scraped, as a
+    mapping of label values to numbers.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames: tuple,
+        collect: Callable[[], Mapping[tuple, float]],
+    ):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self.collect().items()):
+            yield (
+                f"{self.name}{_labels(self.labelnames, labels)} "
+                f"{_number(value)}"
+            )
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format. Updates
+    are plain dict operations on the event loop thread, cheap enough to
+    leave on for every request.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._add(Counter(name, help, tuple(labelnames)))
+
+    def histogram(self, name: str, help: str, labelnames=()) -> Histogram:
+        return self._add(Histogram(name, help, tuple(labelnames)))
+
+    def register_callback(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames,
+        collect: Callable[[], Mapping[tuple, float]],
+    ) -> None:
+        """
+        Add (or replace, e.g. on app restart) a metric read at scrape
+        time.
+        """
+        self._metrics[name] = CallbackMetric(
+            name, help, kind, tuple(labelnames), collect
+        )
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "geneva_stage_seconds", "Query pipeline stage latency.", ["stage"]
+)
+STAGES = registry.counter(
+    "geneva_stages_total",
+    "Query pipeline stages run, by outcome.",
+    ["stage", "status"],
+)
+UPSTREAM_SECONDS = registry.histogram(
+    "geneva_upstream_seconds",
+    "Upstream request latency until response headers.",
+    ["upstream"],
+)
+UPSTREAM_REQUESTS = registry.counter(
+    "geneva_upstream_requests_total",
+    "Upstream requests by HTTP status (or error).",
+    ["upstream", "status"],
+)
+HTTP_SECONDS = registry.histogram(
+    "geneva_http_request_seconds", "API request latency.", ["route"]
+)
+HTTP_REQUESTS = registry.counter(
+    "geneva_http_requests_total",
+    "API requests by route, method and status.",
+    ["route", "method", "status"],
+)
+LLM_TOKENS = registry.counter(
+    "geneva_llm_tokens_total",
+    "LLM tokens reported by OpenRouter.",
+    ["model", "type"],
+)
+
+
+# Stage durations of the current request, when something collects them
+# (see collect_timings).
+_request_timings: ContextVar[Optional[list]] = ContextVar(
+    "geneva_request_timings", default=None
+)
+
+
+@contextmanager
+def collect_timings() -> Iterator[list[tuple[str, float]]]:
+    """
+    Collect ``(stage, seconds)`` for every stage run within the block,
+    including in tasks started from it.
+    """
+    timings: list[tuple[str, float]] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time one pipeline stage (resolution, evidence, LLM, storage).
+    """
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        STAGES.inc(name, status)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def observe_upstream(
+    upstream: str, status: Optional[int], seconds: float
+) -> None:
+    UPSTREAM_SECONDS.observe(seconds, upstream)
+    UPSTREAM_REQUESTS.inc(upstream, "error" if status is None else str(status))
+
+
+def record_llm_usage(model: str, usage: Optional[dict]) -> None:
+    """
+    Count the ``usage`` block of an OpenRouter (OpenAI-style) response.
+    """
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.inc(
+                model, kind.removesuffix("_tokens"), amount=usage[kind]
+            )
+
+
+def register_cache_metrics(caches: Mapping[str, object]) -> None:
+    """
+    Export hits, misses and size of caches with ``stats`` (CacheStats)
+    and ``len()``, read when scraped.
+    """
+    for field in ("hits", "misses", "evictions"):
+        registry.register_callback(
+            f"geneva_cache_{field}_total",
+            f"Cache {field}.",
+            "counter",
+            ["cache"],
+            lambda field=field: {
+                (name,): getattr(cache.stats, field)
+                for name, cache in caches.items()
+            },
+        )
+    registry.register_callback(
+        "geneva_cache_entries",
+        "Entries held per cache.",
+        "gauge",
+        ["cache"],
+        lambda: {(name,): len(cache) for name, cache in caches.items()},
+    )
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting API requests per route template (so
+    ``/queries/{username}`` is one series, not one per user) and status.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_SECONDS.observe(time.perf_counter() - started, path)
+            HTTP_REQUESTS.inc(path, scope["method"], str(status))
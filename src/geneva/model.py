@@ -1,10 +1,35 @@
+import hashlib
 import json
-from datetime import datetime, timezone
-from typing import Optional
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterable, Optional
 
-from sqlmodel import Field, Session, SQLModel, create_engine, select
+from sqlalchemy import (
+    Index,
+    MetaData,
+    delete,
+    inspect,
+    or_,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import aliased
+from sqlmodel import Field, Session, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-engine = create_engine("sqlite:///data/geneva.db", echo=False)
+from .db import async_engine, engine
+
+PAYLOAD_CODEC = "zlib"
+PAYLOAD_BATCH_SIZE = 500
+EXPORT_BATCH_SIZE = 200
+
+
+# History ids reserved per round trip to the idblock table.
+QUERY_ID_BLOCK = 100
 
 
 class User(SQLModel, table=True):
@@ -14,19 +39,266 @@ class User(SQLModel, table=True):
 
 
 class UserQuery(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_userquery_user_id_created_at", "user_id", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     gene: str
     disease: str
-    service_response: str
+    # Responses live in the payload table; these columns only hold rows
+    # written before it existed and are filled in transparently on read.
+    service_response: Optional[str] = None
     llm_response: Optional[str] = None
+    service_payload: Optional[str] = Field(
+        default=None, foreign_key="payload.hash"
+    )
+    llm_payload: Optional[str] = Field(
+        default=None, foreign_key="payload.hash"
+    )
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc)
     )
 
 
+class IdBlock(SQLModel, table=True):
+    """
+    Next unreserved id of a table whose ids are handed out before the
+    row is written (see QueryIdAllocator).
+    """
+
+    name: str = Field(primary_key=True)
+    next_id: int
+
+
+class Payload(SQLModel, table=True):
+    """
+    Content-addressed, compressed JSON blob. ``hash`` is the SHA-256 of
+    the uncompressed JSON text, so identical responses are stored once.
+    """
+
+    hash: str = Field(primary_key=True)
+    codec: str = PAYLOAD_CODEC
+    size: int
+    data: bytes
+
+
+class UserSession(SQLModel, table=True):
+    """
+    Login session. Only the SHA-256 of the opaque token is stored.
+    """
+
+    token_hash: str = Field(primary_key=True)
+    username: str = Field(foreign_key="user.username", index=True)
+    expires_at: float
+
+
+class QueryJob(SQLModel, table=True):
+    """
+    Background /query run. ``status`` moves from queued to running to
+    done (``query_id`` points at the saved history row) or failed
+    (``error`` says why).
+    """
+
+    id: str = Field(primary_key=True)
+    username: str = Field(foreign_key="user.username", index=True)
+    gene: str
+    disease: str
+    use_cache: bool = True
+    status: str = "queued"
+    query_id: Optional[int] = Field(default=None, foreign_key="userquery.id")
+    error: Optional[str] = None
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc)
+    )
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class ResolvedName(SQLModel, table=True):
+    kind: str = Field(primary_key=True)
+    query: str = Field(primary_key=True)
+    entity_id: Optional[str] = None
+    expires_at: float
+
+
 def create_tables():
     SQLModel.metadata.create_all(engine)
+    migrate()
+
+
+def migrate():
+    """
+    Bring databases created by older versions up to date. create_all
+    only creates missing tables, so changes to existing tables are
+    applied here. Safe to run repeatedly.
+    """
+    columns = {c["name"] for c in inspect(engine).get_columns("userquery")}
+    if "service_payload" not in columns:
+        _rebuild_userquery_table()
+    job_columns = {c["name"] for c in inspect(engine).get_columns("queryjob")}
+    if "started_at" not in job_columns:
+        with engine.begin() as conn:
+            conn.execute(
+                text("ALTER TABLE queryjob ADD COLUMN started_at DATETIME")
+            )
+    for index in UserQuery.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    migrate_inline_payloads()
+
+
+def _rebuild_userquery_table():
+    # SQLite cannot relax NOT NULL or add foreign keys in place, so the
+    # table is recreated and the rows copied over. The new table is built
+    # under another name and renamed last, as the SQLite docs prescribe:
+    # renaming the old table instead would repoint other tables' foreign
+    # keys (queryjob.query_id) at it.
+    legacy_columns = (
+        "id, user_id, gene, disease, service_response, llm_response, "
+        "created_at"
+    )
+    metadata = MetaData()
+    # The referenced tables only let the foreign keys resolve.
+    for table in (User.__table__, Payload.__table__):
+        table.to_metadata(metadata)
+    rebuilt = UserQuery.__table__.to_metadata(metadata, name="userquery_new")
+    with engine.begin() as conn:
+        for index in UserQuery.__table__.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text("DROP TABLE IF EXISTS userquery_new"))
+        rebuilt.create(conn)
+        conn.execute(
+            text(
+                f"INSERT INTO userquery_new ({legacy_columns}) "
+                f"SELECT {legacy_columns} FROM userquery"
+            )
+        )
+        conn.execute(text("DROP TABLE userquery"))
+        conn.execute(text("ALTER TABLE userquery_new RENAME TO userquery"))
+
+
+def migrate_inline_payloads(batch_size: int = PAYLOAD_BATCH_SIZE) -> int:
+    """
+    Move responses stored inline on userquery rows into the payload
+    table, one batch per transaction. Returns the number of rows moved.
+    """
+    moved = 0
+    while True:
+        with Session(engine) as session:
+            statement = (
+                select(UserQuery)
+                .where(
+                    (UserQuery.service_response.is_not(None))
+                    | (UserQuery.llm_response.is_not(None))
+                )
+                .limit(batch_size)
+            )
+            rows = session.exec(statement).all()
+            if not rows:
+                return moved
+            for row in rows:
+                if row.service_response is not None:
+                    row.service_payload = _store_payload(
+                        session, row.service_response.encode()
+                    )
+                    row.service_response = None
+                if row.llm_response is not None:
+                    row.llm_payload = _store_payload(
+                        session, row.llm_response.encode()
+                    )
+                    row.llm_response = None
+            session.commit()
+            moved += len(rows)
+
+
+def _payload_insert(raw: bytes):
+    digest = hashlib.sha256(raw).hexdigest()
+    statement = (
+        insert(Payload)
+        .values(
+            hash=digest,
+            codec=PAYLOAD_CODEC,
+            size=len(raw),
+            data=zlib.compress(raw),
+        )
+        .on_conflict_do_nothing(index_elements=["hash"])
+    )
+    return digest, statement
+
+
+def _store_payload(session: Session, raw: bytes) -> str:
+    digest, statement = _payload_insert(raw)
+    session.execute(statement)
+    return digest
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec != PAYLOAD_CODEC:
+        raise ValueError(f"Unsupported payload codec: {codec}")
+    return zlib.decompress(data)
+
+
+def decode_payload(payload: Payload) -> bytes:
+    return _decompress(payload.codec, payload.data)
+
+
+def _payload_statements(hashes: Iterable[str]):
+    hashes = list(set(hashes))
+    for start in range(0, len(hashes), PAYLOAD_BATCH_SIZE):
+        end = start + PAYLOAD_BATCH_SIZE
+        yield select(Payload).where(Payload.hash.in_(hashes[start:end]))
+
+
+def load_payloads(session: Session, hashes: Iterable[str]) -> dict:
+    """
+    Map payload hashes to their decompressed JSON bytes.
+    """
+    blobs = {}
+    for statement in _payload_statements(hashes):
+        for payload in session.exec(statement):
+            blobs[payload.hash] = decode_payload(payload)
+    return blobs
+
+
+async def aload_payloads(session: AsyncSession, hashes: Iterable[str]) -> dict:
+    blobs = {}
+    for statement in _payload_statements(hashes):
+        for payload in await session.exec(statement):
+            blobs[payload.hash] = decode_payload(payload)
+    return blobs
+
+
+def _payload_refs(queries: list[UserQuery]) -> list[str]:
+    return [
+        ref
+        for q in queries
+        for ref in (q.service_payload, q.llm_payload)
+        if ref
+    ]
+
+
+def _attach_payloads(session: Session, queries: list[UserQuery]) -> None:
+    blobs = load_payloads(session, _payload_refs(queries))
+    # Detach first so filling in the text columns is never flushed back.
+    session.expunge_all()
+    _fill_payloads(queries, blobs)
+
+
+async def _aattach_payloads(
+    session: AsyncSession, queries: list[UserQuery]
+) -> None:
+    blobs = await aload_payloads(session, _payload_refs(queries))
+    session.expunge_all()
+    _fill_payloads(queries, blobs)
+
+
+def _fill_payloads(queries: list[UserQuery], blobs: dict) -> None:
+    for q in queries:
+        if q.service_payload:
+            q.service_response = blobs[q.service_payload].decode()
+        if q.llm_payload:
+            q.llm_response = blobs[q.llm_payload].decode()
 
 
 def create_user(username: str, api_key: str) -> User:
@@ -48,6 +320,79 @@ def user_exists(username: str) -> bool:
     return get_user_by_name(username) is not None
 
 
+_SEED_QUERY_IDS = text(
+    "INSERT OR IGNORE INTO idblock (name, next_id) "
+    "SELECT 'userquery', COALESCE(MAX(id), 0) + 1 FROM userquery"
+)
+_RESERVE_QUERY_IDS = text(
+    "UPDATE idblock SET next_id = next_id + :count "
+    "WHERE name = 'userquery' RETURNING next_id"
+)
+
+
+def reserve_query_ids(count: int) -> int:
+    """
+    Reserve ``count`` history ids; returns the end of the reserved range.
+    """
+    with engine.begin() as conn:
+        conn.execute(_SEED_QUERY_IDS)
+        return conn.execute(_RESERVE_QUERY_IDS, {"count": count}).scalar_one()
+
+
+async def areserve_query_ids(count: int) -> int:
+    async with async_engine.begin() as conn:
+        await conn.execute(_SEED_QUERY_IDS)
+        result = await conn.execute(_RESERVE_QUERY_IDS, {"count": count})
+        return result.scalar_one()
+
+
+class QueryIdAllocator:
+    """
+    History ids assigned before the row is written, so the write-behind
+    queue can answer with the id straight away. Ids come from blocks of
+    ``block_size`` reserved atomically in the idblock table, so they are
+    unique across every process sharing the database, stay small
+    integers, and each database round trip covers a whole block.
+
+    Call the allocator for an id from sync code, or await ``anext``.
+    Neither may run inside an open write transaction on SQLite, as the
+    reservation needs the write lock itself.
+    """
+
+    def __init__(self, block_size: int = QUERY_ID_BLOCK):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _take(self, end: Optional[int] = None) -> Optional[int]:
+        with self._lock:
+            if self._next >= self._end and end is not None:
+                self._next, self._end = end - self.block_size, end
+            if self._next >= self._end:
+                return None
+            self._next += 1
+            return self._next - 1
+
+    def __call__(self) -> int:
+        query_id = self._take()
+        while query_id is None:
+            query_id = self._take(reserve_query_ids(self.block_size))
+        return query_id
+
+    async def anext(self) -> int:
+        query_id = self._take()
+        while query_id is None:
+            end = await areserve_query_ids(self.block_size)
+            query_id = self._take(end)
+        return query_id
+
+
+# Every history row takes its id from here, whether it is written
+# directly or through the write-behind queue, so the two cannot clash.
+new_query_id = QueryIdAllocator()
+
+
 def save_user_query(
     user_id: int,
     gene: str,
@@ -55,21 +400,457 @@ def save_user_query(
     service_response: dict,
     llm_response: Optional[dict] = None,
 ) -> UserQuery:
+    service_text = json.dumps(service_response)
+    llm_text = json.dumps(llm_response) if llm_response else None
+    query_id = new_query_id()
     with Session(engine) as session:
         query = UserQuery(
+            id=query_id,
             user_id=user_id,
             gene=gene,
             disease=disease,
-            service_response=json.dumps(service_response),
-            llm_response=json.dumps(llm_response) if llm_response else None,
+            service_payload=_store_payload(session, service_text.encode()),
         )
+        if llm_text:
+            query.llm_payload = _store_payload(session, llm_text.encode())
         session.add(query)
         session.commit()
         session.refresh(query)
-        return query
+        session.expunge(query)
+    query.service_response = service_text
+    query.llm_response = llm_text
+    return query
 
 
 def get_user_queries(user_id: int) -> list[UserQuery]:
     with Session(engine) as session:
         statement = select(UserQuery).where(UserQuery.user_id == user_id)
-        return session.exec(statement).all()
+        queries = session.exec(statement).all()
+        _attach_payloads(session, queries)
+        return queries
+
+
+def _user_queries_page_statement(
+    user_id: int,
+    limit: int,
+    before: Optional[tuple[datetime, int]],
+    full: bool,
+):
+    columns = (
+        (UserQuery,)
+        if full
+        else (
+            UserQuery.id,
+            UserQuery.gene,
+            UserQuery.disease,
+            UserQuery.created_at,
+        )
+    )
+    statement = select(*columns).where(UserQuery.user_id == user_id)
+    if before is not None:
+        statement = statement.where(
+            tuple_(UserQuery.created_at, UserQuery.id) < tuple_(*before)
+        )
+    return statement.order_by(
+        UserQuery.created_at.desc(), UserQuery.id.desc()
+    ).limit(limit)
+
+
+def get_user_queries_page(
+    user_id: int,
+    limit: int,
+    before: Optional[tuple[datetime, int]] = None,
+    full: bool = True,
+) -> list:
+    """
+    Newest-first page of a user's queries using keyset pagination on
+    (created_at, id): ``before`` is the (created_at, id) of the last row
+    of the previous page. With ``full=False`` only id, gene, disease and
+    created_at are loaded, leaving the large response blobs on disk.
+    """
+    statement = _user_queries_page_statement(user_id, limit, before, full)
+    with Session(engine) as session:
+        queries = session.exec(statement).all()
+        if full:
+            _attach_payloads(session, queries)
+        return queries
+
+
+def get_user_query(user_id: int, query_id: int) -> Optional[UserQuery]:
+    with Session(engine) as session:
+        statement = select(UserQuery).where(
+            UserQuery.user_id == user_id, UserQuery.id == query_id
+        )
+        query = session.exec(statement).first()
+        if query:
+            _attach_payloads(session, [query])
+        return query
+
+
+# Async counterparts of the helpers above, for use from the event loop.
+
+
+def _async_session() -> AsyncSession:
+    return AsyncSession(async_engine, expire_on_commit=False)
+
+
+async def acreate_user(username: str, api_key: str) -> User:
+    async with _async_session() as session:
+        user = User(username=username, api_key=api_key)
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+        return user
+
+
+async def aget_user_by_name(username: str) -> Optional[User]:
+    async with _async_session() as session:
+        statement = select(User).where(User.username == username)
+        return (await session.exec(statement)).first()
+
+
+async def _astore_responses(
+    session: AsyncSession,
+    query: UserQuery,
+    service_text: str,
+    llm_text: Optional[str],
+) -> None:
+    digest, statement = _payload_insert(service_text.encode())
+    await session.exec(statement)
+    query.service_payload = digest
+    if llm_text:
+        digest, statement = _payload_insert(llm_text.encode())
+        await session.exec(statement)
+        query.llm_payload = digest
+
+
+async def asave_user_query(
+    user_id: int,
+    gene: str,
+    disease: str,
+    service_response: dict,
+    llm_response: Optional[dict] = None,
+) -> UserQuery:
+    service_text = json.dumps(service_response)
+    llm_text = json.dumps(llm_response) if llm_response else None
+    query_id = await new_query_id.anext()
+    async with _async_session() as session:
+        query = UserQuery(
+            id=query_id, user_id=user_id, gene=gene, disease=disease
+        )
+        await _astore_responses(session, query, service_text, llm_text)
+        session.add(query)
+        await session.commit()
+        await session.refresh(query)
+        session.expunge(query)
+    query.service_response = service_text
+    query.llm_response = llm_text
+    return query
+
+
+async def asave_user_queries(records: Iterable[dict]) -> int:
+    """
+    Insert many history records in one transaction. Each record holds
+    the asave_user_query arguments plus a pre-assigned ``id`` and
+    ``created_at``. Returns the number of rows written.
+    """
+    count = 0
+    async with _async_session() as session:
+        for record in records:
+            llm_response = record.get("llm_response")
+            query = UserQuery(
+                id=record["id"],
+                user_id=record["user_id"],
+                gene=record["gene"],
+                disease=record["disease"],
+                created_at=record["created_at"],
+            )
+            await _astore_responses(
+                session,
+                query,
+                json.dumps(record["service_response"]),
+                json.dumps(llm_response) if llm_response else None,
+            )
+            session.add(query)
+            count += 1
+        await session.commit()
+    return count
+
+
+async def aget_user_queries(user_id: int) -> list[UserQuery]:
+    async with _async_session() as session:
+        statement = select(UserQuery).where(UserQuery.user_id == user_id)
+        queries = (await session.exec(statement)).all()
+        await _aattach_payloads(session, queries)
+        return queries
+
+
+async def aget_user_queries_page(
+    user_id: int,
+    limit: int,
+    before: Optional[tuple[datetime, int]] = None,
+    full: bool = True,
+) -> list:
+    statement = _user_queries_page_statement(user_id, limit, before, full)
+    async with _async_session() as session:
+        queries = (await session.exec(statement)).all()
+        if full:
+            await _aattach_payloads(session, queries)
+        return queries
+
+
+async def aget_user_query(user_id: int, query_id: int) -> Optional[UserQuery]:
+    async with _async_session() as session:
+        statement = select(UserQuery).where(
+            UserQuery.user_id == user_id, UserQuery.id == query_id
+        )
+        query = (await session.exec(statement)).first()
+        if query:
+            await _aattach_payloads(session, [query])
+        return query
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # created_at is stored as naive UTC.
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _user_queries_export_statement(
+    user_id: int,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    gene: Optional[str],
+    disease: Optional[str],
+):
+    service = aliased(Payload)
+    llm = aliased(Payload)
+    statement = (
+        select(
+            UserQuery.id,
+            UserQuery.user_id,
+            UserQuery.gene,
+            UserQuery.disease,
+            UserQuery.created_at,
+            UserQuery.service_response,
+            UserQuery.llm_response,
+            service.codec.label("service_codec"),
+            service.data.label("service_data"),
+            llm.codec.label("llm_codec"),
+            llm.data.label("llm_data"),
+        )
+        .outerjoin(service, UserQuery.service_payload == service.hash)
+        .outerjoin(llm, UserQuery.llm_payload == llm.hash)
+        .where(UserQuery.user_id == user_id)
+    )
+    if since is not None:
+        statement = statement.where(UserQuery.created_at >= _naive_utc(since))
+    if until is not None:
+        statement = statement.where(UserQuery.created_at < _naive_utc(until))
+    if gene is not None:
+        statement = statement.where(UserQuery.gene.collate("NOCASE") == gene)
+    if disease is not None:
+        statement = statement.where(
+            UserQuery.disease.collate("NOCASE") == disease
+        )
+    return statement.order_by(UserQuery.created_at, UserQuery.id)
+
+
+async def astream_user_queries(
+    user_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gene: Optional[str] = None,
+    disease: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[UserQuery]:
+    """
+    Oldest-first stream of a user's queries with their responses filled
+    in, read from a server-side cursor ``batch_size`` rows at a time so
+    memory use does not grow with the history. ``since`` is inclusive,
+    ``until`` exclusive; gene and disease match case-insensitively.
+    """
+    statement = _user_queries_export_statement(
+        user_id, since, until, gene, disease
+    ).execution_options(yield_per=batch_size)
+    async with _async_session() as session:
+        result = await session.stream(statement)
+        # Plain rows rather than entities, so nothing accumulates in the
+        # session's identity map.
+        async for row in result:
+            query = UserQuery(
+                id=row.id,
+                user_id=row.user_id,
+                gene=row.gene,
+                disease=row.disease,
+                created_at=row.created_at,
+                service_response=row.service_response,
+                llm_response=row.llm_response,
+            )
+            if row.service_data is not None:
+                query.service_response = _decompress(
+                    row.service_codec, row.service_data
+                ).decode()
+            if row.llm_data is not None:
+                query.llm_response = _decompress(
+                    row.llm_codec, row.llm_data
+                ).decode()
+            yield query
+
+
+def _resolved_name_statement(kind: str, query: str):
+    return select(ResolvedName).where(
+        ResolvedName.kind == kind,
+        ResolvedName.query == query,
+        ResolvedName.expires_at > time.time(),
+    )
+
+
+def get_resolved_name(kind: str, query: str) -> Optional[ResolvedName]:
+    with Session(engine) as session:
+        return session.exec(_resolved_name_statement(kind, query)).first()
+
+
+async def aget_resolved_name(kind: str, query: str) -> Optional[ResolvedName]:
+    async with _async_session() as session:
+        statement = _resolved_name_statement(kind, query)
+        return (await session.exec(statement)).first()
+
+
+def save_resolved_name(
+    kind: str, query: str, entity_id: Optional[str], ttl: float
+) -> None:
+    values = {
+        "kind": kind,
+        "query": query,
+        "entity_id": entity_id,
+        "expires_at": time.time() + ttl,
+    }
+    statement = (
+        insert(ResolvedName)
+        .values(**values)
+        .on_conflict_do_update(
+            index_elements=["kind", "query"],
+            set_={
+                "entity_id": values["entity_id"],
+                "expires_at": values["expires_at"],
+            },
+        )
+    )
+    with Session(engine) as session:
+        session.execute(statement)
+        session.commit()
+
+
+async def asave_session(token_hash: str, username: str, ttl: float) -> None:
+    async with _async_session() as session:
+        session.add(
+            UserSession(
+                token_hash=token_hash,
+                username=username,
+                expires_at=time.time() + ttl,
+            )
+        )
+        await session.commit()
+
+
+async def aget_session(token_hash: str) -> Optional[UserSession]:
+    async with _async_session() as session:
+        statement = select(UserSession).where(
+            UserSession.token_hash == token_hash,
+            UserSession.expires_at > time.time(),
+        )
+        return (await session.exec(statement)).first()
+
+
+async def adelete_session(token_hash: str) -> None:
+    async with _async_session() as session:
+        await session.exec(
+            delete(UserSession).where(UserSession.token_hash == token_hash)
+        )
+        await session.commit()
+
+
+async def acreate_job(job: QueryJob) -> QueryJob:
+    async with _async_session() as session:
+        session.add(job)
+        await session.commit()
+        await session.refresh(job)
+        return job
+
+
+async def aget_job(job_id: str) -> Optional[QueryJob]:
+    async with _async_session() as session:
+        return await session.get(QueryJob, job_id)
+
+
+async def aupdate_job(job_id: str, **values) -> None:
+    async with _async_session() as session:
+        await session.exec(
+            update(QueryJob).where(QueryJob.id == job_id).values(**values)
+        )
+        await session.commit()
+
+
+async def aclaim_job(job_id: str) -> Optional[QueryJob]:
+    """
+    Move a queued job to running and return it, or None if it is no
+    longer queued: another worker, possibly in another process, claimed
+    it first or it already finished.
+    """
+    async with _async_session() as session:
+        result = await session.exec(
+            update(QueryJob)
+            .where(QueryJob.id == job_id, QueryJob.status == "queued")
+            .values(status="running", started_at=datetime.now(timezone.utc))
+        )
+        await session.commit()
+        if result.rowcount != 1:
+            return None
+        return await session.get(QueryJob, job_id)
+
+
+async def arelease_jobs(job_ids: list[str]) -> None:
+    """
+    Put jobs this process was running back in the queue, e.g. when it
+    shuts down before they finish.
+    """
+    if not job_ids:
+        return
+    async with _async_session() as session:
+        await session.exec(
+            update(QueryJob)
+            .where(QueryJob.id.in_(job_ids), QueryJob.status == "running")
+            .values(status="queued", started_at=None)
+        )
+        await session.commit()
+
+
+async def arequeue_jobs(stale_after: float) -> list[str]:
+    """
+    Mark jobs that have been running for more than ``stale_after``
+    seconds as queued again, as their process is presumed gone, and
+    return the ids of all queued jobs, oldest first. Jobs running
+    elsewhere are left alone.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+    async with _async_session() as session:
+        await session.exec(
+            update(QueryJob)
+            .where(
+                QueryJob.status == "running",
+                or_(
+                    QueryJob.started_at.is_(None),
+                    QueryJob.started_at < cutoff,
+                ),
+            )
+            .values(status="queued")
+        )
+        await session.commit()
+        statement = (
+            select(QueryJob.id)
+            .where(QueryJob.status == "queued")
+            .order_by(QueryJob.created_at)
+        )
+        return list((await session.exec(statement)).all())
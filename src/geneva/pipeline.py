@@ -0,0 +1,120 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable
+
+from .metrics import stage
+from .services.base import AsyncGeneDiseaseService, AsyncLLMService
+from .services.resolution import normalize_name
+
+
+def llm_error(exc: Exception) -> Dict[str, Any]:
+    return {
+        "summary_text": f"LLM error: {str(exc)}",
+        "key_findings": [],
+        "confidence": None,
+        "error": str(exc),
+    }
+
+
+async def summarize(
+    llm_service: AsyncLLMService,
+    service_response: Dict[str, Any],
+    use_cache: bool = True,
+) -> tuple[Dict[str, Any], bool]:
+    """
+    Run the LLM stage and return the summary and whether it failed.
+    Failures become an error summary (see llm_error) instead of failing
+    the whole query, since the evidence is still worth returning and
+    storing; callers must not store that summary.
+    """
+    try:
+        with stage("llm"):
+            summary = await llm_service.summarize_gene_disease(
+                service_response, use_cache=use_cache
+            )
+    except Exception as e:
+        return llm_error(e), True
+    return summary, False
+
+
+def dedupe_pairs(pairs: Iterable[tuple[str, str]]) -> list[tuple[str, str]]:
+    unique = {}
+    for gene, disease in pairs:
+        key = (
+            normalize_name("gene", gene),
+            normalize_name("disease", disease),
+        )
+        unique.setdefault(key, (gene, disease))
+    return list(unique.values())
+
+
+async def run_batch(
+    target_service: AsyncGeneDiseaseService,
+    llm_service: AsyncLLMService,
+    pairs: Iterable[tuple[str, str]],
+    concurrency: int,
+    use_cache: bool = True,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the query pipeline for many gene/disease pairs and yield one
+    result per unique pair as soon as it finishes. Successful results
+    say in ``llm_failed`` whether ``llm_response`` is an error summary.
+
+    Every distinct gene and disease name is resolved exactly once and
+    shared between the pairs that use it. At most ``concurrency``
+    upstream calls (resolution, evidence or LLM) are in flight at a time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    resolved: dict[tuple[str, str], asyncio.Future] = {}
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    def resolve(kind: str, name: str) -> asyncio.Future:
+        key = (kind, normalize_name(kind, name))
+        if key not in resolved:
+            resolved[key] = asyncio.ensure_future(
+                bounded(target_service.resolve_id(kind, name))
+            )
+        return resolved[key]
+
+    async def process(gene: str, disease: str) -> Dict[str, Any]:
+        try:
+            gene_id, disease_id = await asyncio.gather(
+                resolve("gene", gene), resolve("disease", disease)
+            )
+            service_response = await bounded(
+                target_service.fetch_association_by_ids(gene_id, disease_id)
+            )
+        except Exception as e:
+            return {
+                "status": "error",
+                "gene": gene,
+                "disease": disease,
+                "message": f"OpenTargetService error: {str(e)}",
+            }
+        llm_response, llm_failed = await bounded(
+            summarize(llm_service, service_response, use_cache)
+        )
+        return {
+            "status": "success",
+            "gene": gene,
+            "disease": disease,
+            "service_response": service_response,
+            "llm_response": llm_response,
+            "llm_failed": llm_failed,
+        }
+
+    tasks = [
+        asyncio.ensure_future(process(gene, disease))
+        for gene, disease in dedupe_pairs(pairs)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in [*tasks, *resolved.values()]:
+            task.cancel()
+        await asyncio.gather(
+            *tasks, *resolved.values(), return_exceptions=True
+        )
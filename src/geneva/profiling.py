@@ -0,0 +1,158 @@
+import hmac
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+from .cache import LRUCache
+from .config import Settings
+from .metrics import collect_timings
+
+TIMED_PREFIXES = ("/query", "/queries")
+PROFILE_HEADER = "x-geneva-profile"
+PROFILE_ID_HEADER = "x-geneva-profile-id"
+PROFILE_STORE_SIZE = 50
+
+
+def server_timing(timings: list[tuple[str, float]], total: float) -> str:
+    """
+    ``Server-Timing`` header value, durations in milliseconds.
+    """
+    entries = [*timings, ("total", total)]
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in entries
+    )
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+        f"{code.co_firstlineno})"
+    )
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for one thread: a helper thread reads
+    the thread's stack every ``interval`` seconds and counts identical
+    stacks. ``collapsed()`` returns them in the folded format flame graph
+    tools (flamegraph.pl, speedscope) read.
+
+    Profiling the event loop thread also samples whatever else the loop
+    runs meanwhile; time spent waiting on the network shows up as the
+    selector poll.
+    """
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common()
+        )
+
+
+def profiling_allowed(config: Settings, token: Optional[str]) -> bool:
+    return bool(config.profiling_token and token) and hmac.compare_digest(
+        token.encode(), config.profiling_token.encode()
+    )
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a ``Server-Timing`` header with the pipeline
+    stage durations (see metrics.stage) to /query and /queries responses.
+    Streaming responses only carry the stages finished before their
+    headers went out.
+
+    A request with an ``X-Geneva-Profile`` header matching
+    GENEVA_PROFILING_TOKEN is also run under a SamplingProfiler; its
+    profile is kept in ``profiles`` under the id returned in
+    ``X-Geneva-Profile-Id``. ``config`` is read per request so the
+    token can be changed without rebuilding the app.
+    """
+
+    def __init__(
+        self,
+        app,
+        config: Callable[[], Settings],
+        profiles: LRUCache,
+        prefixes: tuple[str, ...] = TIMED_PREFIXES,
+    ):
+        self.app = app
+        self.config = config
+        self.profiles = profiles
+        self.prefixes = prefixes
+
+    def _profile_token(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return value.decode("latin-1")
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(
+            self.prefixes
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        config = self.config()
+        profiler, profile_id = None, None
+        if profiling_allowed(config, self._profile_token(scope)):
+            profile_id = secrets.token_hex(8)
+            profiler = SamplingProfiler(config.profile_interval)
+            profiler.start()
+        started = time.perf_counter()
+
+        with collect_timings() as timings:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append(
+                        (
+                            b"server-timing",
+                            server_timing(
+                                timings, time.perf_counter() - started
+                            ).encode(),
+                        )
+                    )
+                    if profile_id is not None:
+                        headers.append(
+                            (PROFILE_ID_HEADER.encode(), profile_id.encode())
+                        )
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if profiler is not None:
+                    profiler.stop()
+                    self.profiles.set(profile_id, profiler.collapsed())
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
 class GeneDiseaseService(ABC):
@@ -18,10 +18,13 @@ class GeneDiseaseService(ABC):
 class LLMService(ABC):
 
     @abstractmethod
-    def summarize_gene_disease(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def summarize_gene_disease(
+        self, data: Dict[str, Any], additional_context: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Take a gene-disease association dictionary (from GeneDiseaseService)
         and return a JSON-serializable summary with cleaned information.
+        ``additional_context`` is extra text for the model to consider.
 
         Expected output fields (example):
             - summary_text: str
@@ -29,3 +32,50 @@ class LLMService(ABC):
             - confidence: Optional[float]
         """
         pass
+
+
+class AsyncGeneDiseaseService(ABC):
+
+    @abstractmethod
+    async def fetch_association(
+        self, gene_name: str, disease_name: str
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of GeneDiseaseService.fetch_association.
+        Must return the same JSON-serializable shape.
+        """
+        pass
+
+    @abstractmethod
+    async def resolve_id(self, kind: str, name: str) -> str:
+        """
+        Resolve a gene (kind="gene") or disease (kind="disease") name to
+        its identifier. Raises ValueError if nothing matches.
+        """
+        pass
+
+    @abstractmethod
+    async def fetch_association_by_ids(
+        self, gene_id: str, disease_id: str
+    ) -> Dict[str, Any]:
+        """
+        Same as fetch_association, for already resolved identifiers.
+        """
+        pass
+
+
+class AsyncLLMService(ABC):
+
+    @abstractmethod
+    async def summarize_gene_disease(
+        self,
+        data: Dict[str, Any],
+        additional_context: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of LLMService.summarize_gene_disease.
+        Must return the same summary fields. With ``use_cache=False`` a
+        cached summary must not be returned.
+        """
+        pass
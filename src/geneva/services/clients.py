@@ -0,0 +1,66 @@
+import time
+from typing import Optional
+
+import httpx
+
+from geneva.config import Settings, settings
+from geneva.metrics import observe_upstream
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Records latency (until response headers) and status of every
+    request sent to ``upstream`` in the metrics registry.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, upstream: str):
+        self.transport = transport
+        self.upstream = upstream
+
+    async def handle_async_request(
+        self, request: httpx.Request
+    ) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            observe_upstream(
+                self.upstream, None, time.perf_counter() - started
+            )
+            raise
+        observe_upstream(
+            self.upstream, response.status_code, time.perf_counter() - started
+        )
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def create_async_client(
+    timeout: float,
+    config: Settings = settings,
+    upstream: Optional[str] = None,
+) -> httpx.AsyncClient:
+    """
+    Create a long-lived pooled client for one upstream.
+
+    Connections are kept alive between requests and multiplexed over
+    HTTP/2 when the server supports it, so the TCP+TLS handshake is paid
+    once per connection rather than once per call. Requests are counted
+    under ``upstream`` in the metrics when it is given.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=config.http2,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+    )
+    if upstream is not None:
+        transport = InstrumentedTransport(transport, upstream)
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(timeout, connect=config.connect_timeout),
+    )
@@ -0,0 +1,95 @@
+import json
+from typing import Any, Dict
+
+# Rough chars-per-token ratio for English text and compact JSON; good
+# enough to keep prompts inside a budget without shipping a tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _aggregate_mutations(rows: list[dict]) -> list[dict]:
+    totals: Dict[str, list[int]] = {}
+    for row in rows:
+        for sample in row.get("mutatedSamples") or []:
+            consequence = sample.get("functionalConsequence") or {}
+            label = consequence.get("label") or consequence.get("id") or "?"
+            counts = totals.setdefault(label, [0, 0])
+            counts[0] += sample.get("numberMutatedSamples") or 0
+            counts[1] += sample.get("numberSamplesTested") or 0
+    return [
+        {"consequence": label, "mutated": mutated, "tested": tested}
+        for label, (mutated, tested) in sorted(
+            totals.items(), key=lambda item: -item[1][0]
+        )
+    ]
+
+
+def _compact_row(row: dict) -> dict:
+    compact = {
+        "score": row.get("resourceScore"),
+        "cohort": row.get("cohortId"),
+        "source_disease": row.get("diseaseFromSource"),
+        "driver_methods": row.get("significantDriverMethods"),
+    }
+    return {key: value for key, value in compact.items() if value}
+
+
+def build_evidence_digest(data: Dict[str, Any], token_budget: int) -> dict:
+    """
+    Turn a fetch_association payload into a compact digest whose JSON
+    encoding stays within roughly ``token_budget`` tokens.
+
+    The repeated disease/target sub-objects are hoisted out once, cohort
+    descriptions are listed once per cohort, mutatedSamples counts are
+    summed per functional consequence over all rows, and individual rows
+    are kept highest resourceScore first until the budget is used up.
+    Payloads without an ``evidences`` block are returned unchanged.
+    """
+    evidences = (data or {}).get("evidences")
+    if not isinstance(evidences, dict):
+        return data
+
+    rows = evidences.get("rows") or []
+    target = next((row["target"] for row in rows if row.get("target")), {})
+    digest = {
+        "disease": {"id": data.get("id"), "name": data.get("name")},
+        "target": {
+            "id": target.get("id"),
+            "symbol": target.get("approvedSymbol"),
+        },
+        "evidence_count": evidences.get("count", len(rows)),
+        "mutations": _aggregate_mutations(rows),
+        "cohorts": {},
+        "rows": [],
+    }
+
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    used = len(compact_json(digest)) + len(',"rows_omitted":0')
+    ranked = sorted(rows, key=lambda row: -(row.get("resourceScore") or 0))
+    for row in ranked:
+        compact = _compact_row(row)
+        cost = len(compact_json(compact)) + 1
+        cohort_id = row.get("cohortId")
+        cohort = None
+        if cohort_id and cohort_id not in digest["cohorts"]:
+            cohort = {
+                "name": row.get("cohortShortName"),
+                "description": row.get("cohortDescription"),
+            }
+            cost += len(compact_json({cohort_id: cohort})) + 1
+        if used + cost > budget_chars:
+            break
+        used += cost
+        digest["rows"].append(compact)
+        if cohort is not None:
+            digest["cohorts"][cohort_id] = cohort
+
+    digest["rows_omitted"] = len(rows) - len(digest["rows"])
+    return digest
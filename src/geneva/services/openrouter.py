@@ -1,71 +1,330 @@
+import contextlib
+import copy
+import hashlib
 import json
-from typing import Any, Dict, Optional
+import time
+from typing import Any, AsyncIterator, Dict, Optional
 
 import httpx
 
-from .base import LLMService
+from ..cache import MISSING, LRUCache, SingleFlight
+from ..metrics import record_llm_usage
+from .base import AsyncLLMService, LLMService
+from .digest import build_evidence_digest, compact_json, estimate_tokens
 from .openrouter_config import BASE_URL, MODEL_WITH_FORMAT, OpenRouterHeaders
+from .ratelimit import KeyLimiter, parse_retry_after
 
+# Answers that depend on the API key rather than the request: invalid
+# key, no credits, forbidden, throttled.
+KEY_ERRORS = {401, 402, 403, 429}
 
-class OpenRouterService(LLMService):
-    def __init__(self, api_key: str, model_config=MODEL_WITH_FORMAT):
+
+class _OpenRouterBase:
+    def __init__(
+        self,
+        api_key: str,
+        model_config=MODEL_WITH_FORMAT,
+        prompt_token_budget: Optional[int] = None,
+    ):
         self.headers = OpenRouterHeaders(api_key=api_key).as_dict
+        self.key_id = hashlib.sha256(api_key.encode()).hexdigest()
         self.model_config = model_config
         self.base_url = BASE_URL
         self.model_name = model_config.model_name
+        self.prompt_token_budget = prompt_token_budget
 
-    def _ask_model(self, prompt: str) -> str:
-        payload = {
+    def _build_payload(self, prompt: str) -> Dict[str, Any]:
+        return {
             "model": self.model_name,
             "messages": [{"role": "user", "content": prompt}],
             "max_tokens": self.model_config.max_tokens,
             "temperature": self.model_config.temperature,
         }
 
-        try:
-            with httpx.Client(timeout=30) as client:
-                response = client.post(
-                    self.base_url, headers=self.headers, json=payload
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data["choices"][0]["message"]["content"].strip()
-        except Exception as e:
-            return f"Error: {str(e)}"
-
-    def summarize_gene_disease(
+    def _build_prompt(
         self, data: Dict[str, Any], additional_context: Optional[str] = None
-    ) -> Dict[str, Any]:
+    ) -> str:
         gene = data.get("gene", "Unknown")
         disease = data.get("disease", "Unknown")
+        if self.prompt_token_budget:
+            digest = build_evidence_digest(data, self.prompt_token_budget)
+            serialized = compact_json(digest)
+        else:
+            serialized = json.dumps(data, indent=2)
 
         prompt = (
             f"{self.model_config.system_prompt}\n\n"
             f"Gene: {gene}\n"
             f"Disease: {disease}\n"
-            f"Data: {json.dumps(data, indent=2)}"
+            f"Data: {serialized}"
         )
 
         if additional_context:
             prompt += f"\n\nContext: {additional_context}"
+        return prompt
 
-        response_text = self._ask_model(prompt)
+    def _cache_key(
+        self, data: Dict[str, Any], additional_context: Optional[str] = None
+    ) -> str:
+        material = json.dumps(
+            [
+                self.model_name,
+                self.model_config.temperature,
+                self.model_config.system_prompt,
+                self.prompt_token_budget,
+                data,
+                additional_context,
+            ],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(material.encode()).hexdigest()
 
+    @staticmethod
+    def _load_summary(response_text: str) -> Optional[Dict[str, Any]]:
+        if response_text.startswith("```"):
+            response_text = "\n".join(response_text.splitlines()[1:-1])
         try:
-            if response_text.startswith("```"):
-                response_text = "\n".join(response_text.splitlines()[1:-1])
-
             summary_json = json.loads(response_text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(summary_json, dict):
+            return None
 
-            summary_json.setdefault("summary_text", "")
-            summary_json.setdefault("key_findings", [])
-            summary_json.setdefault("confidence", None)
+        summary_json.setdefault("summary_text", "")
+        summary_json.setdefault("key_findings", [])
+        summary_json.setdefault("confidence", None)
+        return summary_json
 
-        except json.JSONDecodeError:
+    @classmethod
+    def _parse_summary(cls, response_text: str) -> Dict[str, Any]:
+        summary_json = cls._load_summary(response_text)
+        if summary_json is None:
             summary_json = {
                 "summary_text": response_text,
                 "key_findings": [],
                 "confidence": None,
             }
+        return summary_json
+
+
+class OpenRouterService(_OpenRouterBase, LLMService):
+
+    def _ask_model(self, prompt: str) -> str:
+        payload = self._build_payload(prompt)
+
+        with httpx.Client(timeout=30) as client:
+            response = client.post(
+                self.base_url, headers=self.headers, json=payload
+            )
+            response.raise_for_status()
+            data = response.json()
+            return data["choices"][0]["message"]["content"].strip()
+
+    def summarize_gene_disease(
+        self, data: Dict[str, Any], additional_context: Optional[str] = None
+    ) -> Dict[str, Any]:
+        prompt = self._build_prompt(data, additional_context)
+        return self._parse_summary(self._ask_model(prompt))
 
+
+class AsyncOpenRouterService(_OpenRouterBase, AsyncLLMService):
+    """
+    Non-blocking OpenRouter client. The per-user API key travels in the
+    request headers, so a single pooled httpx.AsyncClient can be shared
+    across all users.
+
+    Summaries can be served from a shared ``summary_cache`` keyed by a
+    hash of the model settings and the evidence payload, so identical
+    evidence is only sent to the model once regardless of who asks.
+    Only well-formed JSON answers are cached.
+
+    With ``prompt_token_budget`` the evidence is condensed into a digest
+    (see digest.build_evidence_digest) before prompting. Summaries carry
+    the estimated ``prompt_tokens`` of the prompt that produced them.
+
+    A ``single_flight`` shared between instances makes concurrent
+    summarize_gene_disease calls with the same model settings and
+    evidence share one model request, whoever's key makes it, even with
+    ``use_cache=False``. If that request fails because of its key (see
+    KEY_ERRORS), callers with other keys retry once with their own, so
+    one user's invalid or throttled key never fails another's query.
+    Streaming is not coalesced.
+
+    ``rate_limiter`` is the KeyLimiter of this instance's API key: calls
+    over its rate or concurrency limit wait for a slot, and 429s are
+    retried after Retry-After. Failed calls raise instead of returning
+    an answer, so errors are never parsed or cached as summaries.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        client: httpx.AsyncClient,
+        model_config=MODEL_WITH_FORMAT,
+        summary_cache: Optional[LRUCache] = None,
+        prompt_token_budget: Optional[int] = None,
+        single_flight: Optional[SingleFlight] = None,
+        rate_limiter: Optional[KeyLimiter] = None,
+        base_url: str = BASE_URL,
+    ):
+        super().__init__(api_key, model_config, prompt_token_budget)
+        self.base_url = base_url
+        self.client = client
+        self.summary_cache = summary_cache
+        self.single_flight = single_flight
+        self.rate_limiter = rate_limiter
+
+    def _slot(self):
+        if self.rate_limiter is None:
+            return contextlib.nullcontext()
+        return self.rate_limiter.slot()
+
+    @contextlib.asynccontextmanager
+    async def _request(self, payload: dict) -> AsyncIterator[httpx.Response]:
+        """
+        Open a request within this key's rate and concurrency limits.
+        429 answers are retried after their Retry-After; other HTTP
+        errors, and 429s once retries run out, raise HTTPStatusError.
+        """
+        attempt = 0
+        while True:
+            async with self._slot():
+                started = time.monotonic()
+                async with self.client.stream(
+                    "POST", self.base_url, headers=self.headers, json=payload
+                ) as response:
+                    if response.status_code != 429 or not self.rate_limiter:
+                        response.raise_for_status()
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.record_success(
+                                time.monotonic() - started
+                            )
+                        yield response
+                        return
+                    attempt += 1
+                    self.rate_limiter.throttled(
+                        parse_retry_after(response.headers.get("Retry-After")),
+                        attempt,
+                    )
+                    if attempt > self.rate_limiter.limits.max_retries:
+                        response.raise_for_status()
+
+    async def _ask_model(self, prompt: str) -> str:
+        async with self._request(self._build_payload(prompt)) as response:
+            await response.aread()
+            data = response.json()
+        record_llm_usage(self.model_name, data.get("usage"))
+        return data["choices"][0]["message"]["content"].strip()
+
+    async def _stream_model(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yield completion text deltas as OpenRouter streams them back
+        (server-sent events, terminated by ``data: [DONE]``).
+        """
+        payload = {**self._build_payload(prompt), "stream": True}
+        async with self._request(payload) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                chunk = line.removeprefix("data:").strip()
+                if chunk == "[DONE]":
+                    break
+                event = json.loads(chunk)
+                # OpenRouter sends token usage with the last chunk.
+                record_llm_usage(self.model_name, event.get("usage"))
+                choices = event.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    def _cached_summary(
+        self, key: Optional[str], use_cache: bool
+    ) -> Optional[Dict[str, Any]]:
+        if key is None or not use_cache:
+            return None
+        cached = self.summary_cache.get(key)
+        return None if cached is MISSING else copy.deepcopy(cached)
+
+    def _finish_summary(
+        self, key: Optional[str], prompt: str, response_text: str
+    ) -> Dict[str, Any]:
+        summary_json = self._load_summary(response_text)
+        cacheable = summary_json is not None
+        if not cacheable:
+            summary_json = self._parse_summary(response_text)
+        summary_json["prompt_tokens"] = estimate_tokens(prompt)
+        if cacheable and key is not None:
+            self.summary_cache.set(key, copy.deepcopy(summary_json))
         return summary_json
+
+    def _summary_key(
+        self, data: Dict[str, Any], additional_context: Optional[str]
+    ) -> Optional[str]:
+        if self.summary_cache is None:
+            return None
+        return self._cache_key(data, additional_context)
+
+    async def summarize_gene_disease(
+        self,
+        data: Dict[str, Any],
+        additional_context: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        With ``use_cache=False`` the cached summary is ignored and the
+        model is asked again; the fresh answer still replaces the entry.
+        """
+        key = self._summary_key(data, additional_context)
+        cached = self._cached_summary(key, use_cache)
+        if cached is not None:
+            return cached
+
+        async def ask():
+            prompt = self._build_prompt(data, additional_context)
+            response_text = await self._ask_model(prompt)
+            return self._finish_summary(key, prompt, response_text)
+
+        if self.single_flight is None:
+            return await ask()
+        flight_key = key or self._cache_key(data, additional_context)
+        try:
+            summary = await self.single_flight.do(flight_key, ask)
+        except httpx.HTTPStatusError as e:
+            if (
+                e.response.status_code not in KEY_ERRORS
+                or e.request.headers.get("Authorization")
+                == self.headers["Authorization"]
+            ):
+                raise
+            summary = await self.single_flight.do(
+                (self.key_id, flight_key), ask
+            )
+        return copy.deepcopy(summary)
+
+    async def stream_summary(
+        self,
+        data: Dict[str, Any],
+        additional_context: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Streaming variant of summarize_gene_disease. Yields
+        ``("delta", text)`` for each completion chunk and finally
+        ``("summary", dict)`` with the parsed result. A cache hit yields
+        only the final summary.
+        """
+        key = self._summary_key(data, additional_context)
+        cached = self._cached_summary(key, use_cache)
+        if cached is not None:
+            yield "summary", cached
+            return
+
+        prompt = self._build_prompt(data, additional_context)
+        parts = []
+        async for delta in self._stream_model(prompt):
+            parts.append(delta)
+            yield "delta", delta
+        response_text = "".join(parts).strip()
+        yield "summary", self._finish_summary(key, prompt, response_text)
@@ -18,6 +18,28 @@ class OpenRouterHeaders:
         }
 
 
+@dataclass(frozen=True)
+class RateLimits:
+    """
+    Per-API-key request limits: ``rate`` requests per second with bursts
+    of ``burst``, and an adaptive (AIMD) concurrency limit starting at
+    ``concurrency``. Answers slower than ``latency_target`` seconds count
+    as overload. A 429 is retried up to ``max_retries`` times after its
+    Retry-After (capped at ``max_retry_after``) or exponential backoff
+    from ``backoff_base``.
+    """
+
+    rate: float = 2.0
+    burst: int = 5
+    concurrency: int = 4
+    min_concurrency: int = 1
+    max_concurrency: int = 16
+    latency_target: float = 30.0
+    max_retries: int = 3
+    backoff_base: float = 1.0
+    max_retry_after: float = 60.0
+
+
 @dataclass
 class ModelConfig:
     model_name: str
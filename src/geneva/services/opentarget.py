@@ -1,10 +1,101 @@
+import heapq
+from typing import AsyncIterator, Optional
+
 import httpx
 
-from geneva.services.base import GeneDiseaseService
-from geneva.services.opentarget_config import BASE_URL, QUERIES
+from geneva.cache import MISSING, SingleFlight, StaleWhileRevalidateCache
+from geneva.metrics import stage
+from geneva.services.base import AsyncGeneDiseaseService, GeneDiseaseService
+from geneva.services.opentarget_config import (
+    BASE_URL,
+    DISEASE_ID_PATTERN,
+    GENE_ID_PATTERN,
+    QUERIES,
+    EvidencePaging,
+    Resilience,
+)
+from geneva.services.resilience import ResilientCaller
+from geneva.services.resolution import (
+    ResolutionCache,
+    normalize_name,
+    search_name,
+)
+from geneva.services.suggest import SuggestIndex
+
+ID_PATTERNS = {"gene": GENE_ID_PATTERN, "disease": DISEASE_ID_PATTERN}
+SEARCH_QUERIES = {"gene": QUERIES.gene, "disease": QUERIES.disease}
+
+
+def _hit_id(search: dict) -> Optional[str]:
+    hits = search["hits"]
+    return hits[0]["id"] if hits else None
+
+
+def _require_id(entity_id: Optional[str], kind: str, name: str) -> str:
+    if entity_id is None:
+        raise ValueError(f"No {kind} found for {name}")
+    return entity_id
+
+
+class _ResolutionMixin:
+    """
+    Local resolution shared by the sync and async clients: literal
+    identifiers pass through, exact matches in the optional SuggestIndex
+    skip the search query, and everything else goes via the optional
+    ResolutionCache before any network call. A known synonym is searched
+    under the name it maps to, the same name it is cached under.
+    """
 
+    resolution_cache: Optional[ResolutionCache] = None
+    name_index: Optional[SuggestIndex] = None
 
-class OpenTargetService(GeneDiseaseService):
+    def _lookup_static(self, kind: str, name: str):
+        stripped = name.strip()
+        if ID_PATTERNS[kind].match(stripped):
+            return stripped
+        if self.name_index is not None:
+            entity_id = self.name_index.exact(kind, name)
+            if entity_id is not None:
+                return entity_id
+        return MISSING
+
+    def _lookup_local(self, kind: str, name: str):
+        entity_id = self._lookup_static(kind, name)
+        if entity_id is not MISSING or self.resolution_cache is None:
+            return entity_id
+        return self.resolution_cache.get(kind, name)
+
+    async def _alookup_local(self, kind: str, name: str):
+        entity_id = self._lookup_static(kind, name)
+        if entity_id is not MISSING or self.resolution_cache is None:
+            return entity_id
+        return await self.resolution_cache.aget(kind, name)
+
+    def _remember(
+        self, kind: str, name: str, entity_id: Optional[str]
+    ) -> Optional[str]:
+        if self.resolution_cache is not None:
+            self.resolution_cache.put(kind, name, entity_id)
+        return entity_id
+
+
+class OpenTargetService(_ResolutionMixin, GeneDiseaseService):
+    """
+    With ``combined=True`` both name lookups are sent as one aliased
+    GraphQL document, so a cold query costs two round trips instead of
+    three. Inputs that already are Ensembl/EFO identifiers skip the
+    lookup altogether.
+    """
+
+    def __init__(
+        self,
+        combined: bool = False,
+        resolution_cache: Optional[ResolutionCache] = None,
+        name_index: Optional[SuggestIndex] = None,
+    ):
+        self.combined = combined
+        self.resolution_cache = resolution_cache
+        self.name_index = name_index
 
     def _run_query(self, query: str, variables: dict) -> dict:
         with httpx.Client() as client:
@@ -14,26 +105,332 @@ class OpenTargetService(GeneDiseaseService):
             response.raise_for_status()
             return response.json()
 
+    def _search_id(self, kind: str, name: str) -> Optional[str]:
+        response = self._run_query(
+            SEARCH_QUERIES[kind], {"queryString": search_name(kind, name)}
+        )
+        return self._remember(kind, name, _hit_id(response["data"]["search"]))
+
+    def resolve_id(self, kind: str, name: str) -> str:
+        entity_id = self._lookup_local(kind, name)
+        if entity_id is MISSING:
+            entity_id = self._search_id(kind, name)
+        return _require_id(entity_id, kind, name)
+
     def _resolve_gene_id(self, gene_name: str) -> str:
-        hits = self._run_query(QUERIES.gene, {"queryString": gene_name})[
-            "data"
-        ]["search"]["hits"]
-        if not hits:
-            raise ValueError(f"No gene found for {gene_name}")
-        return hits[0]["id"]
+        return self.resolve_id("gene", gene_name)
 
     def _resolve_disease_id(self, disease_name: str) -> str:
-        hits = self._run_query(QUERIES.disease, {"queryString": disease_name})[
-            "data"
-        ]["search"]["hits"]
-        if not hits:
-            raise ValueError(f"No disease found for {disease_name}")
-        return hits[0]["id"]
+        return self.resolve_id("disease", disease_name)
 
-    def fetch_association(self, gene_name: str, disease_name: str) -> dict:
-        gene_id = self._resolve_gene_id(gene_name)
-        disease_id = self._resolve_disease_id(disease_name)
+    def _resolve_ids(
+        self, gene_name: str, disease_name: str
+    ) -> tuple[str, str]:
+        gene_id = self._lookup_local("gene", gene_name)
+        disease_id = self._lookup_local("disease", disease_name)
+
+        if self.combined and gene_id is MISSING and disease_id is MISSING:
+            data = self._run_query(
+                QUERIES.resolve,
+                {
+                    "geneQuery": search_name("gene", gene_name),
+                    "diseaseQuery": search_name("disease", disease_name),
+                },
+            )["data"]
+            gene_id = self._remember("gene", gene_name, _hit_id(data["gene"]))
+            disease_id = self._remember(
+                "disease", disease_name, _hit_id(data["disease"])
+            )
+
+        if gene_id is MISSING:
+            gene_id = self._search_id("gene", gene_name)
+        if disease_id is MISSING:
+            disease_id = self._search_id("disease", disease_name)
+        return (
+            _require_id(gene_id, "gene", gene_name),
+            _require_id(disease_id, "disease", disease_name),
+        )
+
+    def fetch_association_by_ids(self, gene_id: str, disease_id: str) -> dict:
         return self._run_query(
             QUERIES.target_disease,
             {"geneId": gene_id, "diseaseId": disease_id},
         )["data"]["disease"]
+
+    def fetch_association(self, gene_name: str, disease_name: str) -> dict:
+        gene_id, disease_id = self._resolve_ids(gene_name, disease_name)
+        return self.fetch_association_by_ids(gene_id, disease_id)
+
+
+class AsyncOpenTargetService(_ResolutionMixin, AsyncGeneDiseaseService):
+    """
+    Non-blocking Open Targets client. The httpx.AsyncClient is owned by
+    the caller (the app lifespan) so its connection pool is shared by
+    every request instead of being rebuilt per call.
+
+    Evidence only changes between Open Targets data releases, so it can
+    be served from an optional stale-while-revalidate cache keyed by
+    the resolved (Ensembl ID, EFO ID) pair.
+
+    Without ``paging`` the evidence query is unbounded. With it, rows are
+    fetched page by page and capped as described by EvidencePaging; the
+    upstream total is still reported in ``evidences.count`` and
+    ``evidences.truncated`` tells whether rows were dropped.
+
+    With ``coalesce`` concurrent lookups of the same normalized name and
+    concurrent evidence fetches for the same ID pair share a single
+    upstream call.
+
+    With ``resilience`` every GraphQL call goes through a ResilientCaller
+    (retries with jittered backoff, hedging past the tail latency and a
+    circuit breaker).
+
+    With ``name_index`` names found verbatim in the local SuggestIndex
+    resolve without a ``search`` query. ``base_url`` points the client
+    at another GraphQL endpoint (e.g. the benchmark stand-in).
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        combined: bool = False,
+        resolution_cache: Optional[ResolutionCache] = None,
+        evidence_cache: Optional[StaleWhileRevalidateCache] = None,
+        paging: Optional[EvidencePaging] = None,
+        coalesce: bool = False,
+        resilience: Optional[Resilience] = None,
+        name_index: Optional[SuggestIndex] = None,
+        base_url: str = BASE_URL,
+    ):
+        self.client = client
+        self.base_url = base_url
+        self.combined = combined
+        self.resolution_cache = resolution_cache
+        self.name_index = name_index
+        self.evidence_cache = evidence_cache
+        self.paging = paging
+        self.resolution_flight = SingleFlight() if coalesce else None
+        self.evidence_flight = SingleFlight() if coalesce else None
+        self.caller = ResilientCaller(resilience) if resilience else None
+
+    async def _coalesced(self, flight, key, fetch):
+        if flight is None:
+            return await fetch()
+        return await flight.do(key, fetch)
+
+    async def _post_query(self, query: str, variables: dict) -> dict:
+        response = await self.client.post(
+            self.base_url, json={"query": query, "variables": variables}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def _run_query(self, query: str, variables: dict) -> dict:
+        if self.caller is None:
+            return await self._post_query(query, variables)
+        # Every query this service sends is a read, so all are safe to
+        # retry and hedge. The query text names the operation whose
+        # latencies decide when to hedge.
+        return await self.caller.call(
+            lambda: self._post_query(query, variables), operation=query
+        )
+
+    async def _search_id(self, kind: str, name: str) -> Optional[str]:
+        async def search():
+            response = await self._run_query(
+                SEARCH_QUERIES[kind], {"queryString": search_name(kind, name)}
+            )
+            return self._remember(
+                kind, name, _hit_id(response["data"]["search"])
+            )
+
+        with stage(f"resolve_{kind}"):
+            return await self._coalesced(
+                self.resolution_flight,
+                (kind, normalize_name(kind, name)),
+                search,
+            )
+
+    async def resolve_id(self, kind: str, name: str) -> str:
+        entity_id = await self._alookup_local(kind, name)
+        if entity_id is MISSING:
+            entity_id = await self._search_id(kind, name)
+        return _require_id(entity_id, kind, name)
+
+    async def _resolve_gene_id(self, gene_name: str) -> str:
+        return await self.resolve_id("gene", gene_name)
+
+    async def _resolve_disease_id(self, disease_name: str) -> str:
+        return await self.resolve_id("disease", disease_name)
+
+    async def _resolve_ids(
+        self, gene_name: str, disease_name: str
+    ) -> tuple[str, str]:
+        gene_id = await self._alookup_local("gene", gene_name)
+        disease_id = await self._alookup_local("disease", disease_name)
+
+        if self.combined and gene_id is MISSING and disease_id is MISSING:
+
+            async def resolve_both():
+                response = await self._run_query(
+                    QUERIES.resolve,
+                    {
+                        "geneQuery": search_name("gene", gene_name),
+                        "diseaseQuery": search_name("disease", disease_name),
+                    },
+                )
+                data = response["data"]
+                return (
+                    self._remember("gene", gene_name, _hit_id(data["gene"])),
+                    self._remember(
+                        "disease", disease_name, _hit_id(data["disease"])
+                    ),
+                )
+
+            with stage("resolve"):
+                gene_id, disease_id = await self._coalesced(
+                    self.resolution_flight,
+                    (
+                        "gene+disease",
+                        normalize_name("gene", gene_name),
+                        normalize_name("disease", disease_name),
+                    ),
+                    resolve_both,
+                )
+
+        if gene_id is MISSING:
+            gene_id = await self._search_id("gene", gene_name)
+        if disease_id is MISSING:
+            disease_id = await self._search_id("disease", disease_name)
+        return (
+            _require_id(gene_id, "gene", gene_name),
+            _require_id(disease_id, "disease", disease_name),
+        )
+
+    async def _fetch_evidence_page(
+        self,
+        gene_id: str,
+        disease_id: str,
+        size: int,
+        cursor: Optional[str] = None,
+    ) -> dict:
+        response = await self._run_query(
+            QUERIES.target_disease_page,
+            {
+                "geneId": gene_id,
+                "diseaseId": disease_id,
+                "size": size,
+                "cursor": cursor,
+            },
+        )
+        return response["data"]["disease"]
+
+    async def _iter_evidence_pages(
+        self, gene_id: str, disease_id: str, page_size: int
+    ) -> AsyncIterator[dict]:
+        cursor = None
+        while True:
+            page = await self._fetch_evidence_page(
+                gene_id, disease_id, page_size, cursor
+            )
+            yield page
+            if page is None:
+                return
+            evidences = page["evidences"]
+            cursor = evidences.get("cursor")
+            if not cursor or not evidences["rows"]:
+                return
+
+    async def iter_evidence_rows(
+        self, gene_id: str, disease_id: str, page_size: Optional[int] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Yield every evidence row for the pair, one page at a time, so
+        callers that need all rows never hold more than a page.
+        """
+        page_size = page_size or (self.paging or EvidencePaging()).page_size
+        async for page in self._iter_evidence_pages(
+            gene_id, disease_id, page_size
+        ):
+            if page is None:
+                return
+            for row in page["evidences"]["rows"]:
+                yield row
+
+    async def _fetch_evidence_bounded(
+        self, gene_id: str, disease_id: str
+    ) -> dict:
+        paging = self.paging
+        if paging.mode == "top":
+            limit = paging.scan_limit
+            size = min(max(paging.page_size, paging.max_rows), limit)
+        else:
+            limit = size = paging.max_rows
+        header, rows, seen = None, [], 0
+
+        async for page in self._iter_evidence_pages(gene_id, disease_id, size):
+            if page is None:
+                return None
+            header = header or page
+            for row in page["evidences"]["rows"]:
+                if seen >= limit:
+                    break
+                if paging.mode == "top":
+                    item = (row.get("resourceScore") or 0.0, -seen, row)
+                    if len(rows) < paging.max_rows:
+                        heapq.heappush(rows, item)
+                    else:
+                        heapq.heappushpop(rows, item)
+                else:
+                    rows.append(row)
+                seen += 1
+            if seen >= limit:
+                break
+
+        if paging.mode == "top":
+            rows = [row for *_, row in sorted(rows, reverse=True)]
+        count = header["evidences"]["count"]
+        return {
+            "id": header["id"],
+            "name": header["name"],
+            "evidences": {
+                "count": count,
+                "rows": rows,
+                "truncated": len(rows) < count,
+            },
+        }
+
+    async def _fetch_evidence(self, gene_id: str, disease_id: str) -> dict:
+        if self.paging is not None:
+            return await self._fetch_evidence_bounded(gene_id, disease_id)
+        response = await self._run_query(
+            QUERIES.target_disease,
+            {"geneId": gene_id, "diseaseId": disease_id},
+        )
+        return response["data"]["disease"]
+
+    async def _fetch_evidence_once(
+        self, gene_id: str, disease_id: str
+    ) -> dict:
+        return await self._coalesced(
+            self.evidence_flight,
+            (gene_id, disease_id),
+            lambda: self._fetch_evidence(gene_id, disease_id),
+        )
+
+    async def fetch_association_by_ids(
+        self, gene_id: str, disease_id: str
+    ) -> dict:
+        with stage("evidence"):
+            if self.evidence_cache is None:
+                return await self._fetch_evidence_once(gene_id, disease_id)
+            return await self.evidence_cache.get_or_fetch(
+                (gene_id, disease_id),
+                lambda: self._fetch_evidence_once(gene_id, disease_id),
+            )
+
+    async def fetch_association(
+        self, gene_name: str, disease_name: str
+    ) -> dict:
+        gene_id, disease_id = await self._resolve_ids(gene_name, disease_name)
+        return await self.fetch_association_by_ids(gene_id, disease_id)
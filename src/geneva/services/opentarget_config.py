@@ -1,5 +1,7 @@
 # flake8: noqa
+import re
 from dataclasses import dataclass
+from typing import Optional
 
 BASE_URL = "https://api.platform.opentargets.org/api/v4/graphql"
 
@@ -8,7 +10,9 @@ BASE_URL = "https://api.platform.opentargets.org/api/v4/graphql"
 class Queries:
     gene: str
     disease: str
+    resolve: str
     target_disease: str
+    target_disease_page: str
 
 
 QUERIES = Queries(
@@ -26,6 +30,16 @@ QUERIES = Queries(
       }
     }
     """,
+    resolve="""
+    query resolveGeneDisease($geneQuery: String!, $diseaseQuery: String!) {
+      gene: search(queryString: $geneQuery, entityNames: ["target"], page: { index: 0, size: 1 }) {
+        hits { id }
+      }
+      disease: search(queryString: $diseaseQuery, entityNames: ["disease"], page: { index: 0, size: 1 }) {
+        hits { id }
+      }
+    }
+    """,
     target_disease="""
     query targetDiseaseEvidence($diseaseId: String!, $geneId: String!) {
       disease(efoId: $diseaseId) {
@@ -52,4 +66,107 @@ QUERIES = Queries(
       }
     }
     """,
+    target_disease_page="""
+    query targetDiseaseEvidencePage($diseaseId: String!, $geneId: String!, $size: Int!, $cursor: String) {
+      disease(efoId: $diseaseId) {
+        id
+        name
+        evidences(ensemblIds: [$geneId], size: $size, cursor: $cursor) {
+          count
+          cursor
+          rows {
+            disease { id name }
+            diseaseFromSource
+            target { id approvedSymbol }
+            mutatedSamples {
+              functionalConsequence { id label }
+              numberSamplesTested
+              numberMutatedSamples
+            }
+            resourceScore
+            significantDriverMethods
+            cohortId
+            cohortShortName
+            cohortDescription
+          }
+        }
+      }
+    }
+    """,
 )
+
+
+@dataclass(frozen=True)
+class EvidencePaging:
+    """
+    Bounds on evidence retrieval. ``mode="first"`` keeps the first
+    ``max_rows`` rows in upstream order, fetched as a single page;
+    ``mode="top"`` scans up to ``scan_limit`` rows in pages of
+    ``page_size`` (never fewer than ``max_rows``) and keeps the
+    ``max_rows`` with the highest resourceScore.
+    """
+
+    page_size: int = 1_000
+    max_rows: int = 500
+    mode: str = "first"
+    scan_limit: int = 5_000
+
+    def __post_init__(self):
+        if self.mode not in ("first", "top"):
+            raise ValueError(f"Unknown evidence paging mode: {self.mode}")
+
+
+@dataclass(frozen=True)
+class Resilience:
+    """
+    Retry, hedging and circuit-breaker settings for GraphQL calls.
+    Failed attempts are retried ``retries`` times with full-jitter
+    exponential backoff (``backoff_base`` doubling up to
+    ``backoff_max`` seconds). Once ``hedge_min_samples`` latencies have
+    been seen for an operation, an attempt still running after that
+    operation's ``hedge_quantile`` latency gets a duplicate request and
+    the first answer wins (``hedge_quantile=None`` disables hedging).
+    At most ``hedge_budget`` of calls are hedged, so a slowdown across
+    the board does not double the load. ``breaker_threshold``
+    consecutive retryable failures open the circuit for
+    ``breaker_reset`` seconds.
+    """
+
+    retries: int = 2
+    backoff_base: float = 0.2
+    backoff_max: float = 2.0
+    hedge_quantile: Optional[float] = 0.95
+    hedge_min_samples: int = 20
+    hedge_budget: float = 0.05
+    latency_window: int = 500
+    breaker_threshold: int = 5
+    breaker_reset: float = 30.0
+
+
+# Inputs that already are Open Targets identifiers skip the search step.
+GENE_ID_PATTERN = re.compile(r"^ENSG\d{11}$")
+DISEASE_ID_PATTERN = re.compile(r"^(EFO|MONDO|Orphanet|HP|DOID|OTAR)_\d+$")
+
+# Common aliases mapped to the name used as the resolution cache key.
+# Keys and values are already normalized (casefolded, single-spaced).
+SYNONYMS = {
+    "gene": {
+        "p53": "tp53",
+        "her2": "erbb2",
+        "her-2": "erbb2",
+        "neu": "erbb2",
+        "brca-1": "brca1",
+        "brca-2": "brca2",
+        "k-ras": "kras",
+        "c-myc": "myc",
+    },
+    "disease": {
+        "breast carcinoma": "breast cancer",
+        "lung carcinoma": "lung cancer",
+        "nsclc": "non-small cell lung carcinoma",
+        "t2d": "type 2 diabetes mellitus",
+        "type 2 diabetes": "type 2 diabetes mellitus",
+        "alzheimers disease": "alzheimer disease",
+        "alzheimer's disease": "alzheimer disease",
+    },
+}
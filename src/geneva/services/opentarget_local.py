@@ -0,0 +1,336 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Optional
+
+from geneva.metrics import stage
+from geneva.services.base import AsyncGeneDiseaseService, GeneDiseaseService
+from geneva.services.opentarget import ID_PATTERNS, _require_id
+from geneva.services.opentarget_config import EvidencePaging
+from geneva.services.resolution import fold_name, normalize_name
+
+SCHEMA = """
+CREATE TABLE target (id TEXT PRIMARY KEY, symbol TEXT) WITHOUT ROWID;
+CREATE TABLE disease (id TEXT PRIMARY KEY, name TEXT) WITHOUT ROWID;
+CREATE TABLE name_index (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    entity_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (kind, name, rank, entity_id)
+) WITHOUT ROWID;
+CREATE TABLE evidence (
+    target_id TEXT NOT NULL,
+    disease_id TEXT NOT NULL,
+    score REAL,
+    row TEXT NOT NULL
+);
+"""
+# Built after the bulk insert, which is much faster than keeping it
+# up to date row by row.
+EVIDENCE_INDEX = (
+    "CREATE INDEX ix_evidence_pair "
+    "ON evidence (target_id, disease_id, score DESC)"
+)
+BATCH_SIZE = 10_000
+
+# name_index ranks: official names win over synonyms.
+RANK_NAME = 0
+RANK_SYNONYM = 1
+RANK_RELATED = 2
+
+
+def _labels(values) -> list[str]:
+    """
+    Synonym lists come as plain strings or as {"label", "source"} dicts
+    depending on the release.
+    """
+    labels = []
+    for value in values or []:
+        label = value.get("label") if isinstance(value, dict) else value
+        if label:
+            labels.append(label)
+    return labels
+
+
+def _target_names(target: dict) -> Iterable[tuple[str, int]]:
+    if target.get("approvedSymbol"):
+        yield target["approvedSymbol"], RANK_NAME
+    for field in ("symbolSynonyms", "synonyms", "nameSynonyms"):
+        for label in _labels(target.get(field)):
+            yield label, RANK_SYNONYM
+    if target.get("approvedName"):
+        yield target["approvedName"], RANK_SYNONYM
+
+
+def _disease_names(disease: dict) -> Iterable[tuple[str, int]]:
+    if disease.get("name"):
+        yield disease["name"], RANK_NAME
+    synonyms = disease.get("synonyms") or {}
+    if isinstance(synonyms, dict):
+        for field, values in synonyms.items():
+            rank = RANK_SYNONYM if field == "hasExactSynonym" else RANK_RELATED
+            for label in _labels(values):
+                yield label, rank
+    else:
+        for label in _labels(synonyms):
+            yield label, RANK_SYNONYM
+
+
+def _evidence_row(evidence: dict) -> tuple[str, str, Optional[float], str]:
+    """
+    Keep the fields the GraphQL evidence query selects; ``disease`` and
+    ``target`` are filled in from their tables when reading.
+    """
+    score = evidence.get("resourceScore", evidence.get("score"))
+    row = {
+        "diseaseFromSource": evidence.get("diseaseFromSource"),
+        "mutatedSamples": [
+            {
+                "functionalConsequence": {
+                    "id": sample.get("functionalConsequenceId"),
+                    "label": sample.get("functionalConsequenceLabel"),
+                },
+                "numberSamplesTested": sample.get("numberSamplesTested"),
+                "numberMutatedSamples": sample.get("numberMutatedSamples"),
+            }
+            for sample in evidence.get("mutatedSamples") or []
+        ]
+        or None,
+        "resourceScore": score,
+        "significantDriverMethods": evidence.get("significantDriverMethods"),
+        "cohortId": evidence.get("cohortId"),
+        "cohortShortName": evidence.get("cohortShortName"),
+        "cohortDescription": evidence.get("cohortDescription"),
+    }
+    return (
+        evidence["targetId"],
+        evidence["diseaseId"],
+        score,
+        json.dumps(row, separators=(",", ":")),
+    )
+
+
+def _insert_batches(conn, statement: str, rows: Iterable[tuple]) -> int:
+    count, batch = 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany(statement, batch)
+            count += len(batch)
+            batch = []
+    conn.executemany(statement, batch)
+    return count + len(batch)
+
+
+def build_store(
+    path: str,
+    targets: Iterable[dict],
+    diseases: Iterable[dict],
+    evidence: Iterable[dict],
+) -> dict:
+    """
+    Build the local Open Targets store at ``path`` from release records
+    (targets, diseases and evidence as found in the bulk dumps). The
+    store is written next to ``path`` and moved into place at the end,
+    so readers never see a half-built file. Returns row counts.
+    """
+    tmp_path = f"{path}.building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(SCHEMA)
+        names: list[tuple] = []
+
+        def target_rows():
+            for target in targets:
+                for name, rank in _target_names(target):
+                    names.append(
+                        ("gene", fold_name(name), rank, target["id"], name)
+                    )
+                yield target["id"], target.get("approvedSymbol")
+
+        def disease_rows():
+            for disease in diseases:
+                for name, rank in _disease_names(disease):
+                    names.append(
+                        (
+                            "disease",
+                            fold_name(name),
+                            rank,
+                            disease["id"],
+                            name,
+                        )
+                    )
+                yield disease["id"], disease.get("name")
+
+        counts = {
+            "targets": _insert_batches(
+                conn,
+                "INSERT OR REPLACE INTO target VALUES (?, ?)",
+                target_rows(),
+            ),
+            "diseases": _insert_batches(
+                conn,
+                "INSERT OR REPLACE INTO disease VALUES (?, ?)",
+                disease_rows(),
+            ),
+        }
+        counts["names"] = _insert_batches(
+            conn,
+            "INSERT OR IGNORE INTO name_index VALUES (?, ?, ?, ?, ?)",
+            names,
+        )
+        counts["evidence"] = _insert_batches(
+            conn,
+            "INSERT INTO evidence VALUES (?, ?, ?, ?)",
+            (_evidence_row(item) for item in evidence),
+        )
+        conn.execute(EVIDENCE_INDEX)
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return counts
+
+
+def store_names(path: str) -> Iterable[tuple]:
+    """
+    Name index rows of the store at ``path`` as ``(kind, name, rank,
+    entity_id, label, official)``, ready for ``write_suggest_index``.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield from conn.execute(
+            "SELECT n.kind, n.name, n.rank, n.entity_id, n.label, "
+            "COALESCE(t.symbol, d.name, n.label) FROM name_index n "
+            "LEFT JOIN target t ON n.kind = 'gene' AND t.id = n.entity_id "
+            "LEFT JOIN disease d "
+            "ON n.kind = 'disease' AND d.id = n.entity_id"
+        )
+    finally:
+        conn.close()
+
+
+class LocalOpenTargetService(GeneDiseaseService):
+    """
+    Open Targets backend answering from a local store built by
+    ``python -m geneva.ingest`` instead of the GraphQL API. Names are
+    resolved through the symbol/synonym index (official names before
+    synonyms) and evidence comes from an index on (Ensembl ID, EFO ID),
+    so lookups are local index hits with no network involved.
+
+    Results have the same shape as OpenTargetService.fetch_association,
+    including ``evidences.truncated`` when ``paging`` bounds the rows.
+    """
+
+    def __init__(self, path: str, paging: Optional[EvidencePaging] = None):
+        self.path = path
+        self.paging = paging
+        self.conn = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def resolve_id(self, kind: str, name: str) -> str:
+        stripped = name.strip()
+        if ID_PATTERNS[kind].match(stripped):
+            return stripped
+        # The name as given first, then the alias it is mapped to.
+        for candidate in dict.fromkeys(
+            [fold_name(name), normalize_name(kind, name)]
+        ):
+            row = self.conn.execute(
+                "SELECT entity_id FROM name_index WHERE kind = ? AND name = ? "
+                "ORDER BY rank, entity_id LIMIT 1",
+                (kind, candidate),
+            ).fetchone()
+            if row:
+                return row[0]
+        return _require_id(None, kind, name)
+
+    def fetch_association_by_ids(
+        self, gene_id: str, disease_id: str
+    ) -> Optional[Dict[str, Any]]:
+        disease = self.conn.execute(
+            "SELECT name FROM disease WHERE id = ?", (disease_id,)
+        ).fetchone()
+        if disease is None:
+            return None
+        target = self.conn.execute(
+            "SELECT symbol FROM target WHERE id = ?", (gene_id,)
+        ).fetchone()
+        (count,) = self.conn.execute(
+            "SELECT COUNT(*) FROM evidence "
+            "WHERE target_id = ? AND disease_id = ?",
+            (gene_id, disease_id),
+        ).fetchone()
+
+        statement = (
+            "SELECT row FROM evidence WHERE target_id = ? AND disease_id = ?"
+        )
+        params: tuple = (gene_id, disease_id)
+        if self.paging is not None:
+            order = "score DESC" if self.paging.mode == "top" else "rowid"
+            statement += f" ORDER BY {order} LIMIT ?"
+            params += (self.paging.max_rows,)
+
+        shared = {
+            "disease": {"id": disease_id, "name": disease[0]},
+            "target": {
+                "id": gene_id,
+                "approvedSymbol": target[0] if target else None,
+            },
+        }
+        rows = [
+            {**shared, **json.loads(row)}
+            for (row,) in self.conn.execute(statement, params)
+        ]
+        evidences: Dict[str, Any] = {"count": count, "rows": rows}
+        if self.paging is not None:
+            evidences["truncated"] = len(rows) < count
+        return {"id": disease_id, "name": disease[0], "evidences": evidences}
+
+    def fetch_association(
+        self, gene_name: str, disease_name: str
+    ) -> Optional[Dict[str, Any]]:
+        return self.fetch_association_by_ids(
+            self.resolve_id("gene", gene_name),
+            self.resolve_id("disease", disease_name),
+        )
+
+
+class AsyncLocalOpenTargetService(AsyncGeneDiseaseService):
+    """
+    AsyncGeneDiseaseService facade over LocalOpenTargetService so the app
+    and the batch pipeline can use the local store unchanged. Lookups
+    are single index probes, so they run inline rather than in a thread.
+    """
+
+    def __init__(self, service: LocalOpenTargetService):
+        self.service = service
+
+    async def resolve_id(self, kind: str, name: str) -> str:
+        with stage(f"resolve_{kind}"):
+            return self.service.resolve_id(kind, name)
+
+    async def fetch_association_by_ids(
+        self, gene_id: str, disease_id: str
+    ) -> Optional[Dict[str, Any]]:
+        with stage("evidence"):
+            return self.service.fetch_association_by_ids(gene_id, disease_id)
+
+    async def fetch_association(
+        self, gene_name: str, disease_name: str
+    ) -> Optional[Dict[str, Any]]:
+        return await self.fetch_association_by_ids(
+            await self.resolve_id("gene", gene_name),
+            await self.resolve_id("disease", disease_name),
+        )
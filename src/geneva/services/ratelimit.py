@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
+from geneva.cache import MISSING, LRUCache
+from geneva.services.openrouter_config import RateLimits
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait according to a ``Retry-After`` header, which holds
+    either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` acquisitions per second with bursts of up to
+    ``burst``. Callers over the limit wait their turn in FIFO order
+    instead of failing. ``pause`` holds everyone back, e.g. for a
+    ``Retry-After`` from the upstream.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(
+            self._paused_until, time.monotonic() + seconds
+        )
+        self._tokens = 0.0
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: every success below ``latency_target`` adds
+    ``1 / limit`` (about one slot per round trip), while an overload
+    signal (429 or a slow answer) halves the limit. The limit stays
+    within ``[minimum, maximum]``.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        latency_target: float,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.in_flight < int(self.limit)
+            )
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def record_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self.record_overload()
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def record_overload(self) -> None:
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+@dataclass
+class LimiterStats:
+    requests: int = 0
+    throttled: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class KeyLimiter:
+    """
+    Token bucket plus adaptive concurrency limit for one API key.
+    """
+
+    def __init__(self, limits: RateLimits):
+        self.limits = limits
+        self.stats = LimiterStats()
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self.concurrency = AdaptiveConcurrency(
+            limits.concurrency,
+            limits.min_concurrency,
+            limits.max_concurrency,
+            limits.latency_target,
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.bucket.acquire()
+        await self.concurrency.acquire()
+        self.stats.requests += 1
+        try:
+            yield
+        finally:
+            await self.concurrency.release()
+
+    def record_success(self, latency: float) -> None:
+        self.concurrency.record_success(latency)
+
+    def throttled(self, retry_after: Optional[float], attempt: int) -> float:
+        """
+        Register a 429 and return how long to wait before retrying:
+        ``Retry-After`` when given, exponential backoff otherwise.
+        """
+        self.stats.throttled += 1
+        self.concurrency.record_overload()
+        delay = retry_after
+        if delay is None:
+            delay = self.limits.backoff_base * 2 ** (attempt - 1)
+        delay = min(delay, self.limits.max_retry_after)
+        self.bucket.pause(delay)
+        return delay
+
+
+class RateLimiterRegistry:
+    """
+    One KeyLimiter per API key, kept in a bounded LRU keyed by the
+    key's hash so the keys themselves are not held as dict keys.
+    """
+
+    def __init__(self, limits: RateLimits, maxsize: int = 10_000):
+        self.limits = limits
+        self._limiters = LRUCache(maxsize)
+
+    def __len__(self) -> int:
+        return len(self._limiters)
+
+    def for_key(self, api_key: str) -> KeyLimiter:
+        key = hashlib.sha256(api_key.encode()).hexdigest()
+        limiter = self._limiters.get(key)
+        if limiter is MISSING:
+            limiter = KeyLimiter(self.limits)
+            self._limiters.set(key, limiter)
+        return limiter
@@ -0,0 +1,228 @@
+import asyncio
+import math
+import random
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+import httpx
+
+from geneva.services.opentarget_config import Resilience
+
+# Hedges saved up while calls are fast, spendable in a burst.
+HEDGE_BURST = 10.0
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def is_retryable(exc: Exception) -> bool:
+    """
+    Transport errors, timeouts, 429 and 5xx are worth another attempt;
+    other HTTP errors would fail the same way again.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class LatencyHistogram:
+    """
+    Latencies of the last ``window`` successful attempts.
+    """
+
+    def __init__(self, window: int):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures and rejects calls for
+    ``reset_timeout`` seconds. After that a single trial call is let
+    through (half-open): success closes the circuit, failure opens it
+    again.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def release_trial(self) -> None:
+        """
+        Give back the half-open trial slot of a call that ended without
+        an outcome (e.g. was cancelled), so the next call can try.
+        """
+        self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """
+        Count a failure; returns True if this opened the circuit.
+        """
+        self.failures += 1
+        reopening = self._trial_running
+        self._trial_running = False
+        if reopening or (
+            self.opened_at is None and self.failures >= self.threshold
+        ):
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+
+@dataclass
+class ResilienceStats:
+    attempts: int = 0
+    retries: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    circuit_opens: int = 0
+    rejected: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class ResilientCaller:
+    """
+    Runs idempotent upstream calls with retries, hedging and a circuit
+    breaker as configured by ``Resilience``. Latencies are tracked per
+    ``operation`` so a slow kind of call is not hedged against the tail
+    of a fast one. Each call earns ``hedge_budget`` of a hedge, up to
+    HEDGE_BURST saved. Errors that are not retryable mean the upstream
+    answered, so they do not count against the breaker.
+    """
+
+    def __init__(self, config: Resilience = Resilience()):
+        self.config = config
+        self.latency: dict[Hashable, LatencyHistogram] = defaultdict(
+            lambda: LatencyHistogram(config.latency_window)
+        )
+        self.breaker = CircuitBreaker(
+            config.breaker_threshold, config.breaker_reset
+        )
+        self.stats = ResilienceStats()
+        self._hedge_tokens = 0.0
+
+    async def call(
+        self, fetch: Callable[[], Awaitable[Any]], operation: Hashable = None
+    ) -> Any:
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.stats.rejected += 1
+                raise CircuitOpenError("Upstream circuit is open")
+            try:
+                result = await self._hedged(fetch, operation)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+                if self.breaker.record_failure():
+                    self.stats.circuit_opens += 1
+                if attempt >= self.config.retries:
+                    raise
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            attempt += 1
+            self.stats.retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+
+    def _backoff(self, attempt: int) -> float:
+        cap = self.config.backoff_base * 2 ** (attempt - 1)
+        return random.uniform(0, min(self.config.backoff_max, cap))
+
+    def _hedge_delay(self, latency: LatencyHistogram) -> Optional[float]:
+        if (
+            self.config.hedge_quantile is None
+            or len(latency) < self.config.hedge_min_samples
+        ):
+            return None
+        return latency.quantile(self.config.hedge_quantile)
+
+    async def _timed(
+        self, fetch: Callable[[], Awaitable[Any]], latency: LatencyHistogram
+    ) -> Any:
+        self.stats.attempts += 1
+        started = time.monotonic()
+        result = await fetch()
+        latency.observe(time.monotonic() - started)
+        return result
+
+    async def _hedged(
+        self, fetch: Callable[[], Awaitable[Any]], operation: Hashable
+    ) -> Any:
+        latency = self.latency[operation]
+        self._hedge_tokens = min(
+            HEDGE_BURST, self._hedge_tokens + self.config.hedge_budget
+        )
+        delay = self._hedge_delay(latency)
+        if delay is None:
+            return await self._timed(fetch, latency)
+
+        primary = asyncio.ensure_future(self._timed(fetch, latency))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._hedge_tokens >= 1:
+                self._hedge_tokens -= 1
+                self.stats.hedges += 1
+                tasks.add(asyncio.ensure_future(self._timed(fetch, latency)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
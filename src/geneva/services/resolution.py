@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from geneva.cache import MISSING, LRUCache
+from geneva.model import (
+    aget_resolved_name,
+    get_resolved_name,
+    save_resolved_name,
+)
+from geneva.services.opentarget_config import SYNONYMS
+
+logger = logging.getLogger(__name__)
+
+
+def fold_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def normalize_name(kind: str, name: str) -> str:
+    normalized = fold_name(name)
+    return SYNONYMS.get(kind, {}).get(normalized, normalized)
+
+
+def search_name(kind: str, name: str) -> str:
+    """
+    The name to send to the upstream search. A known synonym is sent as
+    the name it maps to, so the ID stored under the normalized key is
+    the one every alias of that key would resolve to.
+    """
+    folded = fold_name(name)
+    canonical = SYNONYMS.get(kind, {}).get(folded)
+    return canonical if canonical is not None else name.strip()
+
+
+class ResolutionCache:
+    """
+    Two-level cache for gene/disease name -> Open Targets ID lookups.
+
+    Lookups go to a per-process LRU first and then to the ``resolvedname``
+    SQLite table, which survives restarts and is shared by every worker
+    using the same database. Names that did not resolve are cached as
+    ``None`` with a shorter TTL. Async callers use ``aget``; under a
+    running event loop the SQLite write happens in a worker thread, since
+    it can wait on the database lock behind history writes.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        ttl: float = 7 * 24 * 3600,
+        negative_ttl: float = 3600,
+        persistent: bool = True,
+    ):
+        self.memory = LRUCache(maxsize)
+        self.stats = self.memory.stats
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.persistent = persistent
+        self._pending: set[asyncio.Future] = set()
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    def get(self, kind: str, name: str):
+        """
+        Return the cached ID, ``None`` for a cached negative result or
+        ``MISSING`` if the name has to be looked up upstream.
+        """
+        key = (kind, normalize_name(kind, name))
+        entity_id = self.memory.get(key)
+        if entity_id is not MISSING or not self.persistent:
+            return entity_id
+        return self._promote(key, get_resolved_name(*key))
+
+    async def aget(self, kind: str, name: str):
+        """
+        Like ``get``, reading SQLite without blocking the event loop.
+        """
+        key = (kind, normalize_name(kind, name))
+        entity_id = self.memory.get(key)
+        if entity_id is not MISSING or not self.persistent:
+            return entity_id
+        return self._promote(key, await aget_resolved_name(*key))
+
+    def _promote(self, key: tuple[str, str], row):
+        if row is None:
+            return MISSING
+        self.memory.set(key, row.entity_id, ttl=row.expires_at - time.time())
+        return row.entity_id
+
+    def put(self, kind: str, name: str, entity_id: Optional[str]) -> None:
+        key = (kind, normalize_name(kind, name))
+        ttl = self._ttl_for(entity_id)
+        self.memory.set(key, entity_id, ttl=ttl)
+        if self.persistent:
+            self._persist(*key, entity_id, ttl)
+
+    def _persist(self, *row) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            save_resolved_name(*row)
+            return
+        future = loop.run_in_executor(None, save_resolved_name, *row)
+        self._pending.add(future)
+        future.add_done_callback(self._persisted)
+
+    def _persisted(self, future: asyncio.Future) -> None:
+        self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(
+                "Failed to persist resolved name",
+                exc_info=future.exception(),
+            )
+
+    def _ttl_for(self, entity_id: Optional[str]) -> float:
+        return self.ttl if entity_id is not None else self.negative_ttl
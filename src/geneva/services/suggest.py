@@ -0,0 +1,216 @@
+import os
+from bisect import bisect_left
+from collections import Counter
+from typing import Iterable, Optional
+
+from geneva.services.resolution import fold_name, normalize_name
+
+HEADER = "geneva-suggest\t1"
+KINDS = ("gene", "disease")
+# Prefix matches looked at before ranking; keeps one-letter queries cheap.
+PREFIX_SCAN = 256
+MIN_FUZZY_SCORE = 0.3
+# Fuzzy matching reads at most this many trigram postings, rarest
+# trigrams first, and scores only the keys sharing the most of them.
+FUZZY_SCAN = 5_000
+FUZZY_CANDIDATES = 64
+
+
+def trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {"".join(gram) for gram in zip(padded, padded[1:], padded[2:])}
+
+
+def _clean(value: str) -> str:
+    return " ".join(value.split())
+
+
+def write_suggest_index(path: str, rows: Iterable[tuple]) -> int:
+    """
+    Write a suggestion index to ``path`` from ``(kind, name, rank,
+    entity_id, label, official)`` rows, where ``name`` is the folded
+    lookup key and ``official`` the entity's approved symbol or name.
+    Rows are sorted here so loading needs no sorting at all. Returns the
+    number of rows written.
+    """
+    ordered = sorted(
+        (kind, fold_name(name), int(rank), entity_id, label, official)
+        for kind, name, rank, entity_id, label, official in rows
+        if kind in KINDS and name
+    )
+    tmp_path = f"{path}.building"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        handle.write(HEADER + "\n")
+        for kind, name, rank, entity_id, label, official in ordered:
+            handle.write(
+                "\t".join(
+                    (
+                        kind,
+                        name,
+                        str(rank),
+                        entity_id,
+                        _clean(label),
+                        _clean(official or label),
+                    )
+                )
+                + "\n"
+            )
+    os.replace(tmp_path, path)
+    return len(ordered)
+
+
+class _KindIndex:
+    def __init__(self):
+        self.keys: list[str] = []
+        self.ranks: list[int] = []
+        self.ids: list[str] = []
+        self.labels: list[str] = []
+        self.officials: list[str] = []
+        self.grams: dict[str, list[int]] = {}
+
+    def build_grams(self) -> None:
+        grams: dict[str, list[int]] = {}
+        for position, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                grams.setdefault(gram, []).append(position)
+        self.grams = grams
+
+    def entry(self, position: int, match: str) -> dict:
+        return {
+            "id": self.ids[position],
+            "name": self.officials[position],
+            "matched": self.labels[position],
+            "match": match,
+        }
+
+
+class SuggestIndex:
+    """
+    In-memory name index for autocompletion and exact-name resolution,
+    loaded from the prebuilt file written by ``write_suggest_index``
+    (``python -m geneva.ingest`` writes one next to the local store).
+
+    The file is already sorted by (kind, name, rank), so loading is a
+    single pass and prefix queries are a bisect into the key list.
+    Fuzzy matches use a trigram index built while loading, which takes
+    seconds for a full release: load it off the event loop.
+    """
+
+    def __init__(self, rows: Iterable[tuple[str, str, int, str, str, str]]):
+        self._kinds = {kind: _KindIndex() for kind in KINDS}
+        for kind, name, rank, entity_id, label, official in rows:
+            index = self._kinds[kind]
+            index.keys.append(name)
+            index.ranks.append(rank)
+            index.ids.append(entity_id)
+            index.labels.append(label)
+            index.officials.append(official)
+        for index in self._kinds.values():
+            index.build_grams()
+
+    @classmethod
+    def load(cls, path: str) -> "SuggestIndex":
+        with open(path, encoding="utf-8") as handle:
+            if handle.readline().rstrip("\n") != HEADER:
+                raise ValueError(f"{path} is not a suggestion index")
+            lines = handle.read().splitlines()
+
+        def rows():
+            for line in lines:
+                kind, name, rank, entity_id, label, official = line.split("\t")
+                yield kind, name, int(rank), entity_id, label, official
+
+        return cls(rows())
+
+    def __len__(self) -> int:
+        return sum(len(index.keys) for index in self._kinds.values())
+
+    def _find(self, index: _KindIndex, key: str) -> Optional[int]:
+        position = bisect_left(index.keys, key)
+        if position < len(index.keys) and index.keys[position] == key:
+            return position
+        return None
+
+    def exact(self, kind: str, name: str) -> Optional[str]:
+        """
+        ID of the best-ranked entry named exactly ``name`` (after case
+        and whitespace folding, then the alias it maps to), or None.
+        """
+        index = self._kinds[kind]
+        for key in dict.fromkeys(
+            [fold_name(name), normalize_name(kind, name)]
+        ):
+            position = self._find(index, key)
+            if position is not None:
+                return index.ids[position]
+        return None
+
+    def suggest(self, kind: str, query: str, limit: int = 10) -> list[dict]:
+        """
+        Up to ``limit`` entities for ``query``: exact and prefix matches
+        first (official names before synonyms, shorter before longer),
+        topped up with trigram matches for misspellings.
+        """
+        index = self._kinds[kind]
+        key = fold_name(query)
+        if not key or limit <= 0:
+            return []
+
+        start = bisect_left(index.keys, key)
+        end = start
+        while (
+            end < len(index.keys)
+            and end - start < PREFIX_SCAN
+            and index.keys[end].startswith(key)
+        ):
+            end += 1
+        positions = sorted(
+            range(start, end),
+            key=lambda p: (
+                index.keys[p] != key,
+                index.ranks[p],
+                len(index.keys[p]),
+                index.keys[p],
+            ),
+        )
+
+        results: dict[str, dict] = {}
+        for position in positions:
+            if len(results) >= limit:
+                return list(results.values())
+            if index.ids[position] not in results:
+                match = "exact" if index.keys[position] == key else "prefix"
+                results[index.ids[position]] = index.entry(position, match)
+
+        for position in self._fuzzy(index, key):
+            if len(results) >= limit:
+                break
+            if index.ids[position] not in results:
+                results[index.ids[position]] = index.entry(position, "fuzzy")
+        return list(results.values())
+
+    def _fuzzy(self, index: _KindIndex, key: str) -> list[int]:
+        if len(key) < 3:
+            return []
+        query_grams = trigrams(key)
+        postings = sorted(
+            (index.grams.get(gram, []) for gram in query_grams), key=len
+        )
+        # Rare trigrams say the most about a match; the common ones that
+        # would blow the scan budget are skipped.
+        shared: Counter = Counter()
+        scanned = 0
+        for posting in postings:
+            if scanned and scanned + len(posting) > FUZZY_SCAN:
+                break
+            shared.update(posting[:FUZZY_SCAN])
+            scanned += len(posting)
+        scored = []
+        for position, _ in shared.most_common(FUZZY_CANDIDATES):
+            key_grams = trigrams(index.keys[position])
+            common = len(query_grams & key_grams)
+            # Jaccard similarity of the two trigram sets.
+            score = common / (len(query_grams) + len(key_grams) - common)
+            if score >= MIN_FUZZY_SCORE:
+                scored.append((-score, index.ranks[position], position))
+        return [position for _, _, position in sorted(scored)]
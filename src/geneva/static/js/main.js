@@ -1,4 +1,9 @@
 let currentUser = null;
+let sessionToken = null;
+
+function authHeaders(extra = {}) {
+  return sessionToken ? { ...extra, Authorization: `Bearer ${sessionToken}` } : extra;
+}
 
 // ---- helper: safe fetch ----
 async function safeFetch(url, options) {
@@ -29,9 +34,49 @@ async function login() {
   } else {
     msg.innerText = `✅ ${data.message}`;
     currentUser = username;
+    sessionToken = data.data.token;
   }
 }
 
+// ---- helper: read server-sent events from a POST response ----
+async function* readEvents(response) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      let data = "";
+      raw.split("\n").forEach(line => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      });
+      yield { event, data: JSON.parse(data) };
+    }
+  }
+}
+
+function renderSummary(llm) {
+  const summaryText = document.getElementById("summary-text");
+  const keyFindings = document.getElementById("key-findings");
+  const confidenceEl = document.getElementById("confidence");
+
+  summaryText.innerText = llm.summary_text || "";
+  keyFindings.innerHTML = "";
+  (llm.key_findings || []).forEach(f => {
+    const li = document.createElement("li");
+    li.innerText = f;
+    keyFindings.appendChild(li);
+  });
+  confidenceEl.innerText = llm.confidence != null ? `Confidence: ${llm.confidence}` : "";
+}
+
 // ---- CREATE QUERY ----
 async function createQuery() {
   if (!currentUser) {
@@ -46,78 +91,87 @@ async function createQuery() {
   const gene = document.getElementById("gene").value;
   const disease = document.getElementById("disease").value;
 
-  const data = await safeFetch("/query", {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ username: currentUser, gene, disease })
-  });
-
-  fetchBtn.disabled = false;
-  fetchBtn.innerText = "Fetch";
-
   const summaryText = document.getElementById("summary-text");
-  const keyFindings = document.getElementById("key-findings");
-  const confidenceEl = document.getElementById("confidence");
   const serviceJson = document.getElementById("service-json");
   const serviceDetails = document.getElementById("service-details");
   const resultEl = document.getElementById("association-result");
 
-  if (data.error) {
-    resultEl.style.display = "block";
-    resultEl.innerText = `❌ ${data.error}`;
-    summaryText.innerText = "";
-    keyFindings.innerHTML = "";
-    confidenceEl.innerText = "";
-    serviceJson.innerText = "";
-    serviceDetails.open = false;
-    return;
-  }
-
-  // Correct paths
-  const llm = data.data.llm_response;
-  const service = data.data.service_response;
-
-  // LLM summary
-  summaryText.innerText = llm.summary_text || "";
-  keyFindings.innerHTML = "";
-  (llm.key_findings || []).forEach(f => {
-    const li = document.createElement("li");
-    li.innerText = f;
-    keyFindings.appendChild(li);
-  });
-  confidenceEl.innerText = llm.confidence !== null ? `Confidence: ${llm.confidence}` : "";
-
-  // Service response
-  serviceJson.innerText = service ? JSON.stringify(service, null, 2) : "No service response";
+  renderSummary({});
+  serviceJson.innerText = "";
   serviceDetails.open = false;
-
-  // Hide raw result
   resultEl.style.display = "none";
+
+  const showError = message => {
+    resultEl.style.display = "block";
+    resultEl.innerText = `❌ ${message}`;
+  };
+
+  try {
+    const response = await fetch("/query/stream", {
+      method: "POST",
+      headers: authHeaders({ "Content-Type": "application/json" }),
+      body: JSON.stringify({ gene, disease })
+    });
+    if (!response.ok) {
+      const data = await response.json();
+      showError(data.message || response.statusText);
+      return;
+    }
+
+    for await (const { event, data } of readEvents(response)) {
+      if (event === "evidence") {
+        serviceJson.innerText = JSON.stringify(data, null, 2);
+        summaryText.innerText = "";
+      } else if (event === "delta") {
+        // Raw model output while streaming; replaced by the parsed summary.
+        summaryText.innerText += data.text;
+      } else if (event === "summary") {
+        renderSummary(data.llm_response);
+      } else if (event === "error") {
+        showError(data.message);
+      }
+    }
+  } catch (err) {
+    showError(err.message);
+  } finally {
+    fetchBtn.disabled = false;
+    fetchBtn.innerText = "Fetch";
+  }
 }
 
 // ---- LOAD USER QUERIES ----
-async function loadQueries() {
+let historyCursor = null;
+
+async function loadQueries(append = false) {
   if (!currentUser) {
     alert("Login first!");
     return;
   }
 
-  const data = await safeFetch(`/queries/${currentUser}`);
+  const params = new URLSearchParams();
+  if (append && historyCursor) params.set("cursor", historyCursor);
+  const data = await safeFetch(`/queries/${currentUser}?${params}`, {
+    headers: authHeaders()
+  });
   const historyDiv = document.getElementById("history");
-  historyDiv.innerHTML = "";
+  const moreBtn = document.getElementById("history-more");
+  if (!append) historyDiv.innerHTML = "";
 
   if (data.error) {
     historyDiv.innerHTML = `<p>❌ ${data.error}</p>`;
     return;
   }
 
-  if (!data.data || data.data.length === 0) {
+  historyCursor = data.meta ? data.meta.next_cursor : null;
+  moreBtn.style.display = historyCursor ? "inline-block" : "none";
+
+  if (!append && (!data.data || data.data.length === 0)) {
     historyDiv.innerHTML = "<p>No queries found.</p>";
     return;
   }
 
-  // Most recent first
-  data.data.slice().reverse().forEach(q => {
+  // Served most recent first
+  (data.data || []).forEach(q => {
     const card = document.createElement("div");
     card.className = "analysis-card";
     card.innerHTML = `
@@ -1,15 +1,54 @@
-from typing import Any, Dict
+import base64
+from datetime import datetime
+from typing import Any, Dict, Optional
 
-from fastapi.responses import JSONResponse
+import orjson
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 
-def success(message: str, data: Dict[str, Any] | None = None) -> JSONResponse:
+def success(
+    message: str,
+    data: Dict[str, Any] | None = None,
+    meta: Dict[str, Any] | None = None,
+) -> JSONResponse:
     payload = {"status": "success", "message": message}
     if data:
         payload["data"] = data
-    return JSONResponse(content=payload)
+    if meta:
+        payload["meta"] = meta
+    return ORJSONResponse(content=payload)
 
 
 def error(message: str, status_code: int = 400) -> JSONResponse:
     payload = {"status": "error", "message": message}
-    return JSONResponse(content=payload, status_code=status_code)
+    return ORJSONResponse(content=payload, status_code=status_code)
+
+
+def raw_json(text: Optional[str]) -> Optional[orjson.Fragment]:
+    """
+    Stored JSON text, spliced into a response as-is by orjson instead of
+    being parsed and encoded again.
+    """
+    return None if text is None else orjson.Fragment(text)
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Inverse of encode_cursor. Raises ValueError for malformed cursors.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
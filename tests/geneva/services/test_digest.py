@@ -0,0 +1,72 @@
+from geneva.services.digest import (
+    build_evidence_digest,
+    compact_json,
+    estimate_tokens,
+)
+
+
+def _row(score, cohort="C1", consequence="missense", mutated=1, tested=10):
+    return {
+        "disease": {"id": "EFO_1", "name": "Cancer"},
+        "target": {"id": "ENSG1", "approvedSymbol": "TP53"},
+        "diseaseFromSource": "cancer",
+        "mutatedSamples": [
+            {
+                "functionalConsequence": {"id": "SO_1", "label": consequence},
+                "numberMutatedSamples": mutated,
+                "numberSamplesTested": tested,
+            }
+        ],
+        "resourceScore": score,
+        "significantDriverMethods": ["method"],
+        "cohortId": cohort,
+        "cohortShortName": f"{cohort} short",
+        "cohortDescription": f"{cohort} description",
+    }
+
+
+def _payload(rows):
+    return {
+        "id": "EFO_1",
+        "name": "Cancer",
+        "evidences": {"count": len(rows), "rows": rows},
+    }
+
+
+def test_digest_hoists_target_and_dedupes_cohorts():
+    rows = [_row(0.5), _row(0.9), _row(0.1, cohort="C2")]
+    digest = build_evidence_digest(_payload(rows), token_budget=10_000)
+    assert digest["target"] == {"id": "ENSG1", "symbol": "TP53"}
+    assert digest["disease"] == {"id": "EFO_1", "name": "Cancer"}
+    assert set(digest["cohorts"]) == {"C1", "C2"}
+    assert [r["score"] for r in digest["rows"]] == [0.9, 0.5, 0.1]
+    assert "target" not in digest["rows"][0]
+    assert digest["rows_omitted"] == 0
+
+
+def test_digest_aggregates_mutated_samples():
+    rows = [
+        _row(0.5, consequence="missense", mutated=2, tested=10),
+        _row(0.4, consequence="missense", mutated=3, tested=20),
+        _row(0.3, consequence="stop gained", mutated=1, tested=5),
+    ]
+    digest = build_evidence_digest(_payload(rows), token_budget=10_000)
+    assert digest["mutations"] == [
+        {"consequence": "missense", "mutated": 5, "tested": 30},
+        {"consequence": "stop gained", "mutated": 1, "tested": 5},
+    ]
+
+
+def test_digest_respects_token_budget():
+    rows = [_row(i / 1000, cohort=f"C{i}") for i in range(500)]
+    budget = 400
+    digest = build_evidence_digest(_payload(rows), token_budget=budget)
+    assert estimate_tokens(compact_json(digest)) <= budget
+    assert digest["evidence_count"] == 500
+    assert digest["rows_omitted"] == 500 - len(digest["rows"])
+    assert digest["rows"][0]["score"] == 0.499
+
+
+def test_payload_without_evidences_is_unchanged():
+    data = {"gene": "TP53", "association_data": {"score": 0.95}}
+    assert build_evidence_digest(data, token_budget=10) is data
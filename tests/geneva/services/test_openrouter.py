@@ -1,8 +1,16 @@
+import asyncio
 import json
 
+import httpx
 import pytest
 
-from geneva.services.openrouter import OpenRouterService
+from geneva.cache import LRUCache, SingleFlight
+from geneva.metrics import LLM_TOKENS
+from geneva.services.openrouter import (
+    AsyncOpenRouterService,
+    OpenRouterService,
+)
+from geneva.services.openrouter_config import MODEL_WITH_FORMAT
 
 
 @pytest.fixture
@@ -91,3 +99,287 @@ class TestOpenRouterService:
             "EGFR mutation drives cancer progression"
         ]
         assert result["confidence"] == 0.9
+
+
+class TestAsyncOpenRouterService:
+    def test_summarize_uses_shared_client(self, api_key):
+        expected_output = {
+            "summary_text": "TP53 is strongly associated with Cancer.",
+            "key_findings": ["TP53 mutation linked to Cancer"],
+            "confidence": 0.95,
+        }
+        seen_auth = []
+
+        def handler(request):
+            seen_auth.append(request.headers["Authorization"])
+            content = json.dumps(expected_output)
+            return httpx.Response(
+                200, json={"choices": [{"message": {"content": content}}]}
+            )
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                service = AsyncOpenRouterService(api_key, client=client)
+                return await service.summarize_gene_disease(
+                    {"gene": "TP53", "disease": "Cancer"}
+                )
+
+        result = asyncio.run(run())
+        assert result.pop("prompt_tokens") > 0
+        assert result == expected_output
+        assert seen_auth == [f"Bearer {api_key}"]
+
+    def test_token_usage_is_counted(self, api_key):
+        def handler(request):
+            return httpx.Response(
+                200,
+                json={
+                    "choices": [{"message": {"content": "{}"}}],
+                    "usage": {"prompt_tokens": 120, "completion_tokens": 30},
+                },
+            )
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                service = AsyncOpenRouterService(api_key, client=client)
+                await service.summarize_gene_disease({"gene": "TP53"})
+                return service.model_name
+
+        before = LLM_TOKENS.value(MODEL_WITH_FORMAT.model_name, "prompt")
+        model = asyncio.run(run())
+        assert LLM_TOKENS.value(model, "prompt") == before + 120
+        assert LLM_TOKENS.value(model, "completion") >= 30
+
+
+class TestSummaryCache:
+    @staticmethod
+    def _run(service_kwargs, calls, *requests):
+        def handler(request):
+            calls.append(json.loads(request.content))
+            content = json.dumps({"summary_text": f"call {len(calls)}"})
+            return httpx.Response(
+                200, json={"choices": [{"message": {"content": content}}]}
+            )
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                results = []
+                for api_key, data, kwargs in requests:
+                    service = AsyncOpenRouterService(
+                        api_key, client=client, **service_kwargs
+                    )
+                    results.append(
+                        await service.summarize_gene_disease(data, **kwargs)
+                    )
+                return results
+
+        return asyncio.run(run())
+
+    def test_identical_evidence_is_shared_across_users(self):
+        cache = LRUCache(maxsize=10)
+        calls = []
+        data = {"id": "EFO_1", "evidences": {"count": 1, "rows": []}}
+        first, second = self._run(
+            {"summary_cache": cache},
+            calls,
+            ("key-a", data, {}),
+            ("key-b", dict(reversed(data.items())), {}),
+        )
+        assert len(calls) == 1
+        assert first == second
+        assert first["summary_text"] == "call 1"
+
+    def test_different_evidence_misses(self):
+        cache = LRUCache(maxsize=10)
+        calls = []
+        self._run(
+            {"summary_cache": cache},
+            calls,
+            ("key", {"id": "EFO_1"}, {}),
+            ("key", {"id": "EFO_2"}, {}),
+        )
+        assert len(calls) == 2
+
+    def test_bypass_refreshes_entry(self):
+        cache = LRUCache(maxsize=10)
+        calls = []
+        results = self._run(
+            {"summary_cache": cache},
+            calls,
+            ("key", {"id": "EFO_1"}, {}),
+            ("key", {"id": "EFO_1"}, {"use_cache": False}),
+            ("key", {"id": "EFO_1"}, {}),
+        )
+        assert len(calls) == 2
+        assert [r["summary_text"] for r in results] == [
+            "call 1",
+            "call 2",
+            "call 2",
+        ]
+
+    def test_errors_are_not_cached(self):
+        cache = LRUCache(maxsize=10)
+
+        def handler(request):
+            return httpx.Response(500)
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                service = AsyncOpenRouterService(
+                    "key", client=client, summary_cache=cache
+                )
+                return await service.summarize_gene_disease({"id": "EFO_1"})
+
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(run())
+        assert len(cache) == 0
+
+
+class TestSummaryCoalescing:
+    def test_concurrent_identical_requests_share_one_call(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(request.headers["Authorization"])
+            await asyncio.sleep(0.01)
+            content = json.dumps({"summary_text": "shared"})
+            return httpx.Response(
+                200, json={"choices": [{"message": {"content": content}}]}
+            )
+
+        async def run():
+            flight = SingleFlight()
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                services = [
+                    AsyncOpenRouterService(
+                        key, client=client, single_flight=flight
+                    )
+                    for key in ("key-a", "key-b", "key-c")
+                ]
+                return await asyncio.gather(
+                    *(
+                        service.summarize_gene_disease({"id": "EFO_1"})
+                        for service in services
+                    )
+                )
+
+        results = asyncio.run(run())
+        assert calls == ["Bearer key-a"]
+        assert [r["summary_text"] for r in results] == ["shared"] * 3
+        results[0]["summary_text"] = "changed"
+        assert results[1]["summary_text"] == "shared"
+
+    def test_leader_key_errors_are_retried_with_own_key(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(request.headers["Authorization"])
+            await asyncio.sleep(0.01)
+            if request.headers["Authorization"] == "Bearer bad-key":
+                return httpx.Response(401)
+            content = json.dumps({"summary_text": "shared"})
+            return httpx.Response(
+                200, json={"choices": [{"message": {"content": content}}]}
+            )
+
+        async def run():
+            flight = SingleFlight()
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                services = [
+                    AsyncOpenRouterService(
+                        key, client=client, single_flight=flight
+                    )
+                    for key in ("bad-key", "key-a", "key-a", "key-b")
+                ]
+                return await asyncio.gather(
+                    *(
+                        service.summarize_gene_disease({"id": "EFO_1"})
+                        for service in services
+                    ),
+                    return_exceptions=True,
+                )
+
+        failed, *results = asyncio.run(run())
+        assert calls[0] == "Bearer bad-key"
+        assert sorted(calls[1:]) == ["Bearer key-a", "Bearer key-b"]
+        assert isinstance(failed, httpx.HTTPStatusError)
+        assert [r["summary_text"] for r in results] == ["shared"] * 3
+
+
+class TestStreamSummary:
+    def test_stream_yields_deltas_then_parsed_summary(self):
+        chunks = ['{"summary_text": "TP53 ', 'drives cancer"}']
+        cache = LRUCache(maxsize=10)
+        seen_payloads = []
+
+        def handler(request):
+            seen_payloads.append(json.loads(request.content))
+            body = ": OPENROUTER PROCESSING\n\n"
+            for chunk in chunks:
+                event = {"choices": [{"delta": {"content": chunk}}]}
+                body += f"data: {json.dumps(event)}\n\n"
+            body += "data: [DONE]\n\n"
+            return httpx.Response(
+                200,
+                content=body.encode(),
+                headers={"content-type": "text/event-stream"},
+            )
+
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                service = AsyncOpenRouterService(
+                    "key", client=client, summary_cache=cache
+                )
+                first = [
+                    item
+                    async for item in service.stream_summary({"id": "EFO_1"})
+                ]
+                second = [
+                    item
+                    async for item in service.stream_summary({"id": "EFO_1"})
+                ]
+                return first, second
+
+        first, second = asyncio.run(run())
+        assert seen_payloads[0]["stream"] is True
+        assert len(seen_payloads) == 1
+        assert first[:2] == [("delta", chunks[0]), ("delta", chunks[1])]
+        kind, summary = first[2]
+        assert kind == "summary"
+        assert summary["summary_text"] == "TP53 drives cancer"
+        assert summary["key_findings"] == []
+        assert second == [("summary", summary)]
+
+
+class TestPromptDigest:
+    def test_budgeted_prompt_uses_compact_digest(self, api_key):
+        rows = [
+            {
+                "target": {"id": "ENSG1", "approvedSymbol": "TP53"},
+                "disease": {"id": "EFO_1", "name": "Cancer"},
+                "resourceScore": i / 100,
+                "cohortId": "C1",
+                "cohortDescription": "A long cohort description " * 5,
+            }
+            for i in range(200)
+        ]
+        data = {
+            "id": "EFO_1",
+            "name": "Cancer",
+            "evidences": {"count": 200, "rows": rows},
+        }
+        service = OpenRouterService(api_key, prompt_token_budget=500)
+
+        prompt = service._build_prompt(data)
+        full_prompt = OpenRouterService(api_key)._build_prompt(data)
+
+        assert len(prompt) < len(full_prompt) / 10
+        assert '"symbol":"TP53"' in prompt
+        assert prompt.count("A long cohort description") == 5
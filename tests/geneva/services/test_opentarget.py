@@ -1,7 +1,17 @@
+import asyncio
+import json
+
+import httpx
 import pytest
 
-from geneva.services.opentarget import OpenTargetService
-from geneva.services.opentarget_config import QUERIES
+from geneva.cache import StaleWhileRevalidateCache
+from geneva.services.opentarget import (
+    AsyncOpenTargetService,
+    OpenTargetService,
+)
+from geneva.services.opentarget_config import QUERIES, EvidencePaging
+from geneva.services.resolution import ResolutionCache
+from geneva.services.suggest import SuggestIndex
 
 MOCK_GENE_RESPONSE = {"data": {"search": {"hits": [{"id": "ENSG000001"}]}}}
 MOCK_DISEASE_RESPONSE = {"data": {"search": {"hits": [{"id": "EFO_0001"}]}}}
@@ -51,3 +61,329 @@ def test_fetch_association(monkeypatch, service):
     assert result["id"] == "EFO_0001"
     assert result["name"] == "Cancer"
     assert "evidences" in result
+
+
+def test_async_fetch_association_reuses_client():
+    requests_seen = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests_seen.append(body["query"])
+        if body["query"] == QUERIES.gene:
+            return httpx.Response(200, json=MOCK_GENE_RESPONSE)
+        if body["query"] == QUERIES.disease:
+            return httpx.Response(200, json=MOCK_DISEASE_RESPONSE)
+        return httpx.Response(200, json=MOCK_ASSOCIATION_RESPONSE)
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenTargetService(client)
+            return await service.fetch_association("TP53", "Cancer")
+
+    result = asyncio.run(run())
+    assert result["id"] == "EFO_0001"
+    assert requests_seen == [
+        QUERIES.gene,
+        QUERIES.disease,
+        QUERIES.target_disease,
+    ]
+
+
+def test_async_resolve_gene_id_not_found():
+    def handler(request):
+        return httpx.Response(200, json={"data": {"search": {"hits": []}}})
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            await AsyncOpenTargetService(client)._resolve_gene_id("XYZ")
+
+    with pytest.raises(ValueError, match="No gene found for XYZ"):
+        asyncio.run(run())
+
+
+def test_fetch_association_combined_mode(monkeypatch):
+    service = OpenTargetService(combined=True)
+    seen = []
+
+    def mock_run_query(query, variables):
+        seen.append(query)
+        if query == QUERIES.resolve:
+            assert variables == {"geneQuery": "TP53", "diseaseQuery": "Cancer"}
+            return {
+                "data": {
+                    "gene": MOCK_GENE_RESPONSE["data"]["search"],
+                    "disease": MOCK_DISEASE_RESPONSE["data"]["search"],
+                }
+            }
+        if query == QUERIES.target_disease:
+            assert variables == {
+                "geneId": "ENSG000001",
+                "diseaseId": "EFO_0001",
+            }
+            return MOCK_ASSOCIATION_RESPONSE
+        raise ValueError("Unexpected query")
+
+    monkeypatch.setattr(service, "_run_query", mock_run_query)
+
+    result = service.fetch_association("TP53", "Cancer")
+    assert result["id"] == "EFO_0001"
+    assert seen == [QUERIES.resolve, QUERIES.target_disease]
+
+
+def test_fetch_association_skips_lookup_for_known_ids(monkeypatch):
+    service = OpenTargetService(combined=True)
+    seen = []
+
+    def mock_run_query(query, variables):
+        seen.append(query)
+        return MOCK_ASSOCIATION_RESPONSE
+
+    monkeypatch.setattr(service, "_run_query", mock_run_query)
+
+    service.fetch_association("ENSG00000141510", "EFO_0000311")
+    assert seen == [QUERIES.target_disease]
+
+
+def test_resolution_cache_skips_search(monkeypatch):
+    cache = ResolutionCache(persistent=False)
+    service = OpenTargetService(resolution_cache=cache)
+    calls = []
+
+    def mock_run_query(query, variables):
+        calls.append(query)
+        return MOCK_GENE_RESPONSE
+
+    monkeypatch.setattr(service, "_run_query", mock_run_query)
+
+    assert service._resolve_gene_id("TP53") == "ENSG000001"
+    assert service._resolve_gene_id(" tp53 ") == "ENSG000001"
+    assert calls == [QUERIES.gene]
+
+
+def test_name_index_exact_match_skips_search(monkeypatch):
+    index = SuggestIndex(
+        [("gene", "tp53", 0, "ENSG00000141510", "TP53", "TP53")]
+    )
+    service = OpenTargetService(name_index=index)
+    calls = []
+
+    def mock_run_query(query, variables):
+        calls.append(query)
+        return MOCK_GENE_RESPONSE
+
+    monkeypatch.setattr(service, "_run_query", mock_run_query)
+
+    assert service._resolve_gene_id(" Tp53") == "ENSG00000141510"
+    assert calls == []
+    assert service._resolve_gene_id("TP5") == "ENSG000001"
+    assert calls == [QUERIES.gene]
+
+
+def test_resolution_cache_remembers_missing_names(monkeypatch):
+    cache = ResolutionCache(persistent=False)
+    service = OpenTargetService(combined=True, resolution_cache=cache)
+    calls = []
+
+    def mock_run_query(query, variables):
+        calls.append(query)
+        return {
+            "data": {
+                "gene": {"hits": []},
+                "disease": MOCK_DISEASE_RESPONSE["data"]["search"],
+            }
+        }
+
+    monkeypatch.setattr(service, "_run_query", mock_run_query)
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match="No gene found for NOPE"):
+            service.fetch_association("NOPE", "Cancer")
+    assert calls == [QUERIES.resolve]
+    assert cache.get("disease", "cancer") == "EFO_0001"
+
+
+def test_synonyms_are_searched_under_their_canonical_name():
+    ids = {"breast cancer": "MONDO_0007254", "breast carcinoma": "EFO_0000305"}
+    searched = []
+
+    def handler(request):
+        name = json.loads(request.content)["variables"]["queryString"]
+        searched.append(name)
+        hits = [{"id": ids[name]}] if name in ids else []
+        return httpx.Response(200, json={"data": {"search": {"hits": hits}}})
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        cache = ResolutionCache(persistent=False)
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenTargetService(client, resolution_cache=cache)
+            return [
+                await service.resolve_id("disease", name)
+                for name in ("Breast carcinoma", "breast cancer")
+            ]
+
+    assert asyncio.run(run()) == ["MONDO_0007254", "MONDO_0007254"]
+    assert searched == ["breast cancer"]
+
+
+def test_async_evidence_cache_keyed_by_resolved_ids():
+    calls = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        calls.append(body["variables"])
+        return httpx.Response(200, json=MOCK_ASSOCIATION_RESPONSE)
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        cache = StaleWhileRevalidateCache(maxsize=10, ttl=60, stale_ttl=60)
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenTargetService(client, evidence_cache=cache)
+            for _ in range(3):
+                await service.fetch_association(
+                    "ENSG00000141510", "EFO_0000311"
+                )
+        return cache
+
+    cache = asyncio.run(run())
+    assert len(calls) == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.hits == 2
+
+
+def test_concurrent_identical_queries_are_coalesced():
+    calls = []
+
+    async def handler(request):
+        body = json.loads(request.content)
+        calls.append(body["query"])
+        await asyncio.sleep(0.01)
+        if body["query"] == QUERIES.gene:
+            return httpx.Response(200, json=MOCK_GENE_RESPONSE)
+        if body["query"] == QUERIES.disease:
+            return httpx.Response(200, json=MOCK_DISEASE_RESPONSE)
+        return httpx.Response(200, json=MOCK_ASSOCIATION_RESPONSE)
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenTargetService(client, coalesce=True)
+            results = await asyncio.gather(
+                *(
+                    service.fetch_association(gene, "Cancer")
+                    for gene in ("TP53", "tp53 ", "TP53")
+                )
+            )
+        return service, results
+
+    service, results = asyncio.run(run())
+    assert sorted(calls) == sorted(
+        [QUERIES.gene, QUERIES.disease, QUERIES.target_disease]
+    )
+    assert all(result == results[0] for result in results)
+    assert service.resolution_flight.stats.coalesced == 4
+    assert service.evidence_flight.stats.coalesced == 2
+
+
+def _paged_handler(rows, calls):
+    def handler(request):
+        variables = json.loads(request.content)["variables"]
+        calls.append(variables)
+        start = int(variables["cursor"] or 0)
+        end = start + variables["size"]
+        return httpx.Response(
+            200,
+            json={
+                "data": {
+                    "disease": {
+                        "id": "EFO_0001",
+                        "name": "Cancer",
+                        "evidences": {
+                            "count": len(rows),
+                            "cursor": str(end) if end < len(rows) else None,
+                            "rows": rows[start:end],
+                        },
+                    }
+                }
+            },
+        )
+
+    return handler
+
+
+def _run_paged(rows, paging, calls):
+    async def run():
+        transport = httpx.MockTransport(_paged_handler(rows, calls))
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenTargetService(client, paging=paging)
+            return await service.fetch_association_by_ids(
+                "ENSG00000141510", "EFO_0001"
+            )
+
+    return asyncio.run(run())
+
+
+def test_paged_evidence_is_capped():
+    rows = [{"cohortId": str(i), "resourceScore": i} for i in range(25)]
+    calls = []
+    result = _run_paged(rows, EvidencePaging(page_size=10, max_rows=15), calls)
+    evidences = result["evidences"]
+    assert evidences["count"] == 25
+    assert [r["cohortId"] for r in evidences["rows"]] == [
+        str(i) for i in range(15)
+    ]
+    assert evidences["truncated"] is True
+    assert [(c["size"], c["cursor"]) for c in calls] == [(15, None)]
+
+
+def test_default_paging_keeps_round_trips_low():
+    rows = [{"cohortId": str(i), "resourceScore": i} for i in range(6_000)]
+    first_calls, top_calls = [], []
+    _run_paged(rows, EvidencePaging(), first_calls)
+    _run_paged(rows, EvidencePaging(mode="top"), top_calls)
+    assert len(first_calls) == 1
+    assert len(top_calls) == 5
+
+
+def test_paged_evidence_top_n_by_resource_score():
+    scores = [0.1, 0.9, 0.3, 0.8, 0.2, 0.7, 0.5]
+    rows = [
+        {"cohortId": str(i), "resourceScore": s} for i, s in enumerate(scores)
+    ]
+    calls = []
+    result = _run_paged(
+        rows, EvidencePaging(page_size=3, max_rows=3, mode="top"), calls
+    )
+    assert [r["resourceScore"] for r in result["evidences"]["rows"]] == [
+        0.9,
+        0.8,
+        0.7,
+    ]
+    assert result["evidences"]["count"] == 7
+    assert len(calls) == 3
+
+
+def test_iter_evidence_rows_walks_all_pages():
+    rows = [{"cohortId": str(i)} for i in range(7)]
+    calls = []
+
+    async def run():
+        transport = httpx.MockTransport(_paged_handler(rows, calls))
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenTargetService(client)
+            return [
+                row
+                async for row in service.iter_evidence_rows(
+                    "ENSG00000141510", "EFO_0001", page_size=3
+                )
+            ]
+
+    assert asyncio.run(run()) == rows
+    assert len(calls) == 3
+
+
+def test_evidence_paging_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        EvidencePaging(mode="random")
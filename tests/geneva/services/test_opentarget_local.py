@@ -0,0 +1,150 @@
+import asyncio
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from geneva.config import settings
+from geneva.ingest import main as ingest
+from geneva.main import build_target_service
+from geneva.services.opentarget_config import EvidencePaging
+from geneva.services.opentarget_local import (
+    AsyncLocalOpenTargetService,
+    LocalOpenTargetService,
+)
+
+DUMPS = Path(__file__).parents[1] / "fixtures" / "opentargets"
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    path = tmp_path_factory.mktemp("opentargets") / "store.db"
+    ingest(
+        [
+            "--targets",
+            str(DUMPS / "targets"),
+            "--diseases",
+            str(DUMPS / "diseases"),
+            "--evidence",
+            str(DUMPS / "evidence"),
+            "--output",
+            str(path),
+            "--suggest-output",
+            str(path.with_suffix(".tsv")),
+        ]
+    )
+    return str(path)
+
+
+@pytest.fixture
+def service(store):
+    service = LocalOpenTargetService(store)
+    yield service
+    service.close()
+
+
+class TestResolution:
+    @pytest.mark.parametrize(
+        "name, expected",
+        [
+            ("TP53", "ENSG00000141510"),
+            (" p53 ", "ENSG00000141510"),
+            ("her2", "ENSG00000141736"),
+            ("Tumor Protein P53", "ENSG00000141510"),
+            ("RNF53", "ENSG00000012048"),
+            ("ENSG00000999999", "ENSG00000999999"),
+        ],
+    )
+    def test_gene_symbols_and_synonyms(self, service, name, expected):
+        assert service.resolve_id("gene", name) == expected
+
+    def test_official_names_win_over_synonyms(self, service):
+        assert service.resolve_id("disease", "breast cancer") == (
+            "MONDO_0007254"
+        )
+        assert service.resolve_id("disease", "carcinoma of breast") == (
+            "EFO_0000305"
+        )
+
+    def test_unknown_name_raises(self, service):
+        with pytest.raises(ValueError, match="No gene found for NOPE"):
+            service.resolve_id("gene", "NOPE")
+
+
+class TestEvidence:
+    def test_same_shape_as_graphql(self, service):
+        result = service.fetch_association("TP53", "breast carcinoma")
+        assert result["id"] == "EFO_0000305"
+        assert result["name"] == "breast carcinoma"
+        assert result["evidences"]["count"] == 3
+        row = next(
+            row
+            for row in result["evidences"]["rows"]
+            if row["cohortId"] == "TCGA_BRCA"
+        )
+        assert row["disease"] == {
+            "id": "EFO_0000305",
+            "name": "breast carcinoma",
+        }
+        assert row["target"] == {
+            "id": "ENSG00000141510",
+            "approvedSymbol": "TP53",
+        }
+        assert row["mutatedSamples"] == [
+            {
+                "functionalConsequence": {"id": "SO_0001587", "label": None},
+                "numberSamplesTested": 1000,
+                "numberMutatedSamples": 320,
+            }
+        ]
+        assert row["significantDriverMethods"] == ["dndscv"]
+
+    def test_paging_keeps_top_rows(self, store):
+        service = LocalOpenTargetService(
+            store, paging=EvidencePaging(max_rows=2, mode="top")
+        )
+        evidences = service.fetch_association_by_ids(
+            "ENSG00000141510", "EFO_0000305"
+        )["evidences"]
+        assert evidences["count"] == 3
+        assert evidences["truncated"] is True
+        assert [row["resourceScore"] for row in evidences["rows"]] == [
+            0.5,
+            0.002,
+        ]
+
+    def test_unknown_disease_returns_none(self, service):
+        assert (
+            service.fetch_association_by_ids("ENSG00000141510", "EFO_1")
+            is None
+        )
+
+    def test_pair_without_evidence(self, service):
+        result = service.fetch_association("BRCA1", "cancer")
+        assert result["evidences"] == {"count": 0, "rows": []}
+
+    def test_async_facade(self, service):
+        facade = AsyncLocalOpenTargetService(service)
+        result = asyncio.run(facade.fetch_association("ERBB2", "EFO_0000305"))
+        assert result["evidences"]["count"] == 1
+        assert asyncio.run(facade.resolve_id("gene", "neu")) == (
+            "ENSG00000141736"
+        )
+
+
+def test_backend_is_selected_by_config(store, monkeypatch):
+    monkeypatch.setattr(
+        "geneva.main.settings",
+        replace(
+            settings, opentarget_backend="local", opentarget_local_path=store
+        ),
+    )
+    service = build_target_service(None, None, None)
+    assert isinstance(service, AsyncLocalOpenTargetService)
+    service.service.close()
+
+    monkeypatch.setattr(
+        "geneva.main.settings", replace(settings, opentarget_backend="rest")
+    )
+    with pytest.raises(ValueError, match="Unknown Open Targets backend"):
+        build_target_service(None, None, None)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from geneva.services.openrouter import AsyncOpenRouterService
+from geneva.services.openrouter_config import RateLimits
+from geneva.services.ratelimit import (
+    AdaptiveConcurrency,
+    KeyLimiter,
+    RateLimiterRegistry,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+def completion(text="{}"):
+    return httpx.Response(
+        200, json={"choices": [{"message": {"content": text}}]}
+    )
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("soon") is None
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(later, usegmt=True)) <= 30
+
+
+def test_token_bucket_queues_callers_over_the_rate():
+    async def run():
+        bucket = TokenBucket(rate=50, burst=2)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(6)))
+        return time.monotonic() - started
+
+    # Two tokens up front, the other four at 50/s.
+    assert 0.06 < asyncio.run(run()) < 0.5
+
+
+def test_adaptive_concurrency_is_aimd():
+    limit = AdaptiveConcurrency(
+        initial=4, minimum=1, maximum=5, latency_target=1.0
+    )
+    for _ in range(4):
+        limit.record_success(0.1)
+    assert limit.limit == pytest.approx(5, abs=0.1)
+    limit.record_overload()
+    assert limit.limit == pytest.approx(2.5, abs=0.1)
+    limit.record_success(2.0)
+    assert limit.limit == pytest.approx(1.25, abs=0.1)
+    limit.record_overload()
+    assert limit.limit == 1
+
+
+def test_concurrency_limit_holds_back_extra_requests():
+    peak = 0
+    in_flight = 0
+
+    async def handler(request):
+        nonlocal peak, in_flight
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return completion()
+
+    async def run():
+        limiter = KeyLimiter(RateLimits(rate=1000, burst=100, concurrency=2))
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenRouterService(
+                "key", client=client, rate_limiter=limiter
+            )
+            await asyncio.gather(
+                *(service.summarize_gene_disease({"i": i}) for i in range(6))
+            )
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_429_is_retried_after_retry_after():
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0.05"}),
+        completion(json.dumps({"summary_text": "ok"})),
+    ]
+    sent = []
+
+    def handler(request):
+        sent.append(time.monotonic())
+        return responses.pop(0)
+
+    async def run():
+        limiter = KeyLimiter(RateLimits(concurrency=4))
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenRouterService(
+                "key", client=client, rate_limiter=limiter
+            )
+            return limiter, await service.summarize_gene_disease({})
+
+    limiter, summary = asyncio.run(run())
+    assert summary["summary_text"] == "ok"
+    assert sent[1] - sent[0] >= 0.05
+    assert limiter.stats.throttled == 1
+    assert limiter.concurrency.limit == 2.5  # halved, then +1/2
+
+
+def test_429_raises_once_retries_run_out():
+    def handler(request):
+        return httpx.Response(429, headers={"Retry-After": "0"})
+
+    async def run():
+        limiter = KeyLimiter(RateLimits(max_retries=1))
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenRouterService(
+                "key", client=client, rate_limiter=limiter
+            )
+            await service.summarize_gene_disease({})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+
+def test_registry_keeps_one_limiter_per_key():
+    registry = RateLimiterRegistry(RateLimits(), maxsize=10)
+    assert registry.for_key("a") is registry.for_key("a")
+    assert registry.for_key("a") is not registry.for_key("b")
+    assert len(registry) == 2
@@ -0,0 +1,245 @@
+import asyncio
+
+import httpx
+import pytest
+
+from geneva.services.opentarget import AsyncOpenTargetService
+from geneva.services.opentarget_config import Resilience
+from geneva.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyHistogram,
+    ResilientCaller,
+)
+
+FAST = Resilience(backoff_base=0, hedge_quantile=None)
+
+
+def status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://example.org")
+    response = httpx.Response(status, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_latency_histogram_quantiles():
+    histogram = LatencyHistogram(window=100)
+    assert histogram.quantile(0.95) is None
+    for ms in range(1, 201):
+        histogram.observe(ms / 1000)
+    assert len(histogram) == 100
+    assert histogram.quantile(0.5) == 0.15
+    assert histogram.quantile(0.95) == 0.195
+
+
+class TestRetries:
+    def test_retryable_errors_are_retried(self):
+        outcomes = [status_error(503), httpx.ConnectError("reset"), "ok"]
+
+        async def fetch():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        caller = ResilientCaller(FAST)
+        assert asyncio.run(caller.call(fetch)) == "ok"
+        assert caller.stats.retries == 2
+
+    def test_client_errors_are_not_retried(self):
+        async def fetch():
+            raise status_error(400)
+
+        caller = ResilientCaller(FAST)
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(caller.call(fetch))
+        assert caller.stats.attempts == 1
+
+    def test_gives_up_after_configured_retries(self):
+        async def fetch():
+            raise status_error(502)
+
+        caller = ResilientCaller(FAST)
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(caller.call(fetch))
+        assert caller.stats.attempts == FAST.retries + 1
+
+
+class TestHedging:
+    def test_slow_attempt_is_hedged(self):
+        config = Resilience(
+            hedge_quantile=0.95, hedge_min_samples=5, hedge_budget=1.0
+        )
+        caller = ResilientCaller(config)
+        for _ in range(5):
+            caller.latency[None].observe(0.01)
+        delays = [1.0, 0.0]
+
+        async def fetch():
+            await asyncio.sleep(delays.pop(0))
+            return "answer"
+
+        async def run():
+            started = asyncio.get_running_loop().time()
+            result = await caller.call(fetch)
+            return result, asyncio.get_running_loop().time() - started
+
+        result, elapsed = asyncio.run(run())
+        assert result == "answer"
+        assert elapsed < 0.5
+        assert caller.stats.hedges == 1
+        assert caller.stats.hedge_wins == 1
+
+    def test_latencies_are_tracked_per_operation(self):
+        config = Resilience(hedge_min_samples=5, hedge_budget=1.0)
+        caller = ResilientCaller(config)
+        for _ in range(5):
+            caller.latency["search"].observe(0.001)
+            caller.latency["evidence"].observe(0.05)
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "answer"
+
+        assert asyncio.run(caller.call(fetch, "evidence")) == "answer"
+        assert caller.stats.hedges == 0
+
+    def test_hedges_are_capped_by_budget(self):
+        config = Resilience(
+            hedge_min_samples=5, hedge_budget=0.25, latency_window=1000
+        )
+        caller = ResilientCaller(config)
+        for _ in range(1000):
+            caller.latency[None].observe(0.001)
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "answer"
+
+        async def run():
+            for _ in range(20):
+                await caller.call(fetch)
+
+        asyncio.run(run())
+        assert caller.stats.hedges == 5
+
+    def test_no_hedging_before_enough_samples(self):
+        caller = ResilientCaller(Resilience(hedge_min_samples=5))
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        assert asyncio.run(caller.call(fetch)) == "answer"
+        assert caller.stats.hedges == 0
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold_and_half_opens(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(
+            "geneva.services.resilience.time.monotonic", lambda: now[0]
+        )
+        breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        assert breaker.record_failure()
+        assert not breaker.allow()
+
+        now[0] += 31
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_open_circuit_fails_fast(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            raise httpx.ConnectError("down")
+
+        caller = ResilientCaller(
+            Resilience(
+                retries=0,
+                hedge_quantile=None,
+                breaker_threshold=2,
+            )
+        )
+
+        async def run():
+            for _ in range(2):
+                with pytest.raises(httpx.ConnectError):
+                    await caller.call(fetch)
+            with pytest.raises(CircuitOpenError):
+                await caller.call(fetch)
+
+        asyncio.run(run())
+        assert len(calls) == 2
+        assert caller.stats.circuit_opens == 1
+        assert caller.stats.rejected == 1
+
+    def test_client_errors_do_not_open_circuit(self):
+        async def fetch():
+            raise status_error(400)
+
+        caller = ResilientCaller(
+            Resilience(retries=0, hedge_quantile=None, breaker_threshold=2)
+        )
+
+        async def run():
+            for _ in range(3):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await caller.call(fetch)
+
+        asyncio.run(run())
+        assert caller.breaker.state == "closed"
+        assert caller.stats.rejected == 0
+
+    def test_cancelled_trial_call_frees_half_open_slot(self):
+        caller = ResilientCaller(
+            Resilience(
+                retries=0,
+                hedge_quantile=None,
+                breaker_threshold=1,
+                breaker_reset=0,
+            )
+        )
+        caller.breaker.record_failure()
+        assert caller.breaker.state == "half_open"
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        async def ok():
+            return "ok"
+
+        async def run():
+            trial = asyncio.ensure_future(caller.call(hang))
+            await asyncio.sleep(0)
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+            return await caller.call(ok)
+
+        assert asyncio.run(run()) == "ok"
+        assert caller.breaker.state == "closed"
+
+
+def test_service_retries_failed_graphql_calls():
+    responses = [
+        httpx.Response(503),
+        httpx.Response(
+            200, json={"data": {"search": {"hits": [{"id": "ENSG1"}]}}}
+        ),
+    ]
+
+    def handler(request):
+        return responses.pop(0)
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            service = AsyncOpenTargetService(client, resilience=FAST)
+            return await service.resolve_id("gene", "TP53")
+
+    assert asyncio.run(run()) == "ENSG1"
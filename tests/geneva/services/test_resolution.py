@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from geneva.cache import MISSING
+from geneva.model import SQLModel, async_engine, engine
+from geneva.services.resolution import (
+    ResolutionCache,
+    normalize_name,
+    search_name,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_db():
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    yield
+
+
+def test_normalize_name():
+    assert normalize_name("gene", "  BRCA1 ") == "brca1"
+    assert normalize_name("disease", "Breast   Cancer") == "breast cancer"
+    assert normalize_name("gene", "HER2") == "erbb2"
+    assert normalize_name("disease", "Breast carcinoma") == "breast cancer"
+
+
+def test_search_name():
+    assert search_name("gene", " HER2 ") == "erbb2"
+    assert search_name("gene", " BRCA1 ") == "BRCA1"
+
+
+def test_memory_hit_is_normalized():
+    cache = ResolutionCache(persistent=False)
+    cache.put("gene", "BRCA1", "ENSG00000012048")
+    assert cache.get("gene", " brca1") == "ENSG00000012048"
+    assert cache.get("disease", "BRCA1") is MISSING
+
+
+def test_negative_result_is_cached():
+    cache = ResolutionCache(persistent=False)
+    cache.put("gene", "NOTAGENE", None)
+    assert cache.get("gene", "notagene") is None
+
+
+def test_persistent_entries_survive_new_instance():
+    ResolutionCache().put("disease", "Breast Cancer", "MONDO_0007254")
+    fresh = ResolutionCache()
+    assert fresh.get("disease", "breast cancer") == "MONDO_0007254"
+    assert fresh.memory.stats.misses == 1
+    assert fresh.get("disease", "breast cancer") == "MONDO_0007254"
+    assert fresh.memory.stats.hits == 1
+
+
+def test_expired_persistent_entries_are_ignored():
+    ResolutionCache(ttl=-1).put("gene", "TP53", "ENSG00000141510")
+    assert ResolutionCache().get("gene", "TP53") is MISSING
+
+
+def test_async_get_reads_persistent_entries():
+    ResolutionCache().put("gene", "TP53", "ENSG00000141510")
+
+    async def run():
+        try:
+            cache = ResolutionCache()
+            return await cache.aget("gene", " tp53"), cache.memory.get(
+                ("gene", "tp53")
+            )
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(run()) == ("ENSG00000141510", "ENSG00000141510")
@@ -0,0 +1,114 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from geneva.ingest import main as ingest
+from geneva.services.suggest import SuggestIndex, write_suggest_index
+
+DUMPS = Path(__file__).parents[1] / "fixtures" / "opentargets"
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    path = tmp_path_factory.mktemp("suggest")
+    ingest(
+        [
+            "--targets",
+            str(DUMPS / "targets"),
+            "--diseases",
+            str(DUMPS / "diseases"),
+            "--evidence",
+            str(DUMPS / "evidence"),
+            "--output",
+            str(path / "store.db"),
+            "--suggest-output",
+            str(path / "suggest.tsv"),
+        ]
+    )
+    return SuggestIndex.load(str(path / "suggest.tsv"))
+
+
+def test_prefix_matches_rank_official_names_first(index):
+    results = index.suggest("disease", "breast c")
+    assert [r["id"] for r in results] == ["MONDO_0007254", "EFO_0000305"]
+    assert results[0] == {
+        "id": "MONDO_0007254",
+        "name": "breast cancer",
+        "matched": "breast cancer",
+        "match": "prefix",
+    }
+    assert results[1]["name"] == "breast carcinoma"
+
+
+def test_synonyms_report_the_official_name(index):
+    assert index.suggest("gene", "her") == [
+        {
+            "id": "ENSG00000141736",
+            "name": "ERBB2",
+            "matched": "HER2",
+            "match": "prefix",
+        }
+    ]
+
+
+def test_misspellings_fall_back_to_trigrams(index):
+    results = index.suggest("disease", "brest carcinoma")
+    assert results[0]["id"] == "EFO_0000305"
+    assert results[0]["match"] == "fuzzy"
+
+
+def test_limit_and_empty_queries(index):
+    assert len(index.suggest("disease", "c", limit=1)) == 1
+    assert index.suggest("gene", "  ") == []
+    assert index.suggest("gene", "zzzz") == []
+
+
+def test_exact_lookup(index):
+    assert index.exact("gene", " p53 ") == "ENSG00000141510"
+    assert index.exact("disease", "Breast Cancer") == "MONDO_0007254"
+    assert index.exact("gene", "TP5") is None
+
+
+def test_prefix_lookups_are_fast(tmp_path):
+    path = tmp_path / "suggest.tsv"
+    write_suggest_index(
+        str(path),
+        (
+            ("gene", f"GENE{i}", 0, f"ENSG{i:011d}", f"GENE{i}", f"GENE{i}")
+            for i in range(100_000)
+        ),
+    )
+    index = SuggestIndex.load(str(path))
+    assert len(index) == 100_000
+
+    started = time.perf_counter()
+    for _ in range(100):
+        index.suggest("gene", "gene12")
+    assert (time.perf_counter() - started) / 100 < 0.001
+
+
+def test_fuzzy_lookups_skip_common_trigrams(tmp_path):
+    path = tmp_path / "suggest.tsv"
+    names = [f"carcinoma type {i}" for i in range(100_000)]
+    write_suggest_index(
+        str(path),
+        (
+            ("disease", name, 0, f"EFO_{i:07d}", name, name)
+            for i, name in enumerate([*names, "glioblastoma"])
+        ),
+    )
+    index = SuggestIndex.load(str(path))
+
+    started = time.perf_counter()
+    for _ in range(20):
+        results = index.suggest("disease", "glioblastma carcinoma")
+    assert (time.perf_counter() - started) / 20 < 0.005
+    assert results[0]["name"] == "glioblastoma"
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.tsv"
+    path.write_text("kind\tname\n")
+    with pytest.raises(ValueError, match="not a suggestion index"):
+        SuggestIndex.load(str(path))
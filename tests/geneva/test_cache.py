@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+from geneva.cache import (
+    MISSING,
+    LRUCache,
+    SingleFlight,
+    StaleWhileRevalidateCache,
+)
+
+
+class TestLRUCache:
+    def test_get_missing_returns_sentinel(self):
+        cache = LRUCache(maxsize=2)
+        assert cache.get("a") is MISSING
+        assert cache.stats.misses == 1
+
+    def test_none_is_a_cacheable_value(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", None)
+        assert cache.get("a") is None
+        assert cache.stats.hits == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats.evictions == 1
+
+    def test_entries_expire(self, monkeypatch):
+        cache = LRUCache(maxsize=2, ttl=10)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now)
+        cache.set("a", 1)
+        monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+        assert cache.get("a") is MISSING
+        assert len(cache) == 0
+
+
+class TestStaleWhileRevalidateCache:
+    def test_miss_then_fresh_hit(self):
+        cache = StaleWhileRevalidateCache(maxsize=2, ttl=60, stale_ttl=60)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return {"rows": len(calls)}
+
+        async def run():
+            first = await cache.get_or_fetch("k", fetch)
+            second = await cache.get_or_fetch("k", fetch)
+            return first, second
+
+        assert asyncio.run(run()) == ({"rows": 1}, {"rows": 1})
+        assert len(calls) == 1
+        assert cache.stats.misses == 1
+        assert cache.stats.hits == 1
+
+    def test_stale_hit_is_served_and_refreshed_once(self, monkeypatch):
+        cache = StaleWhileRevalidateCache(maxsize=2, ttl=10, stale_ttl=60)
+        values = iter(["old", "new"])
+        now = time.monotonic()
+
+        async def fetch():
+            return next(values)
+
+        async def run():
+            monkeypatch.setattr(time, "monotonic", lambda: now)
+            await cache.get_or_fetch("k", fetch)
+            monkeypatch.setattr(time, "monotonic", lambda: now + 20)
+            stale = await cache.get_or_fetch("k", fetch)
+            again = await cache.get_or_fetch("k", fetch)
+            await asyncio.sleep(0)
+            refreshed = await cache.get_or_fetch("k", fetch)
+            return stale, again, refreshed
+
+        assert asyncio.run(run()) == ("old", "old", "new")
+        assert cache.stats.stale_hits == 2
+        assert cache.stats.refreshes == 1
+        assert cache.stats.hits == 1
+
+    def test_failed_refresh_keeps_stale_value(self, monkeypatch):
+        cache = StaleWhileRevalidateCache(maxsize=2, ttl=10, stale_ttl=60)
+        now = time.monotonic()
+
+        async def fetch_ok():
+            return "old"
+
+        async def fetch_fail():
+            raise RuntimeError("upstream down")
+
+        async def run():
+            monkeypatch.setattr(time, "monotonic", lambda: now)
+            await cache.get_or_fetch("k", fetch_ok)
+            monkeypatch.setattr(time, "monotonic", lambda: now + 20)
+            await cache.get_or_fetch("k", fetch_fail)
+            await asyncio.sleep(0)
+            return await cache.get_or_fetch("k", fetch_fail)
+
+        assert asyncio.run(run()) == "old"
+        assert cache.stats.refresh_errors >= 1
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_fetch(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"value": 1}
+
+        async def run():
+            flight = SingleFlight()
+            results = await asyncio.gather(
+                *(flight.do("k", fetch) for _ in range(5))
+            )
+            later = await flight.do("k", fetch)
+            return flight, results, later
+
+        flight, results, later = asyncio.run(run())
+        assert len(calls) == 2
+        assert results == [{"value": 1}] * 5
+        assert later == {"value": 1}
+        assert flight.stats.as_dict() == {"calls": 2, "coalesced": 4}
+        assert len(flight) == 0
+
+    def test_errors_are_shared_and_not_kept(self):
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        async def run():
+            flight = SingleFlight()
+            return (
+                await asyncio.gather(
+                    flight.do("k", fail),
+                    flight.do("k", fail),
+                    return_exceptions=True,
+                ),
+                flight,
+            )
+
+        results, flight = asyncio.run(run())
+        assert [str(result) for result in results] == ["boom", "boom"]
+        assert flight.stats.calls == 1
+        assert len(flight) == 0
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            flight = SingleFlight()
+            first = asyncio.ensure_future(flight.do("k", slow))
+            second = asyncio.ensure_future(flight.do("k", slow))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == "done"
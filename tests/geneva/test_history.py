@@ -0,0 +1,171 @@
+import asyncio
+import json
+
+import pytest
+
+from geneva.history import HistoryWriter
+from geneva.model import (
+    QueryIdAllocator,
+    SQLModel,
+    asave_user_query,
+    async_engine,
+    create_user,
+    engine,
+    get_user_queries_page,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_db():
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    yield
+
+
+class TestQueryIdAllocator:
+    def test_workers_never_share_ids(self):
+        workers = [QueryIdAllocator(block_size=10) for _ in range(3)]
+        ids = [worker() for _ in range(25) for worker in workers]
+        assert len(set(ids)) == len(ids)
+        assert max(ids) <= 90
+
+    def test_async_ids_continue_after_existing_rows(self):
+        user = create_user("alice", "key")
+
+        async def run():
+            try:
+                saved = await asave_user_query(user.id, "TP53", "cancer", {})
+                allocator = QueryIdAllocator(block_size=5)
+                return saved.id, [await allocator.anext() for _ in range(7)]
+            finally:
+                await async_engine.dispose()
+
+        saved_id, ids = asyncio.run(run())
+        assert ids == sorted(ids)
+        assert len(set(ids)) == 7
+        assert min(ids) > saved_id
+
+
+class TestHistoryWriter:
+    def test_groups_queued_records_into_batches(self):
+        batches = []
+
+        async def save_batch(records):
+            batches.append([record["gene"] for record in records])
+
+        async def run():
+            writer = HistoryWriter(
+                maxsize=100, batch_size=3, save_batch=save_batch
+            )
+            writer.start()
+            ids = [
+                (await writer.submit(1, f"G{i}", "cancer", {}))[0]
+                for i in range(7)
+            ]
+            await writer.aclose()
+            return writer, ids
+
+        writer, ids = asyncio.run(run())
+        assert batches == [
+            ["G0", "G1", "G2"],
+            ["G3", "G4", "G5"],
+            ["G6"],
+        ]
+        assert ids == sorted(ids)
+        assert writer.stats.written == 7
+        assert writer.stats.batches == 3
+
+    def test_failed_batches_are_counted_and_writer_keeps_running(self):
+        async def save_batch(records):
+            if records[0]["gene"] == "bad":
+                raise RuntimeError("disk full")
+
+        async def run():
+            writer = HistoryWriter(
+                maxsize=10, batch_size=1, save_batch=save_batch
+            )
+            writer.start()
+            await writer.submit(1, "bad", "cancer", {})
+            await writer.submit(1, "good", "cancer", {})
+            await writer.aclose()
+            return writer
+
+        writer = asyncio.run(run())
+        assert writer.stats.failed == 1
+        assert writer.stats.written == 1
+
+    def test_failed_batch_is_retried_record_by_record(self):
+        batches = []
+
+        async def save_batch(records):
+            genes = [record["gene"] for record in records]
+            batches.append(genes)
+            if "bad" in genes:
+                raise RuntimeError("constraint failed")
+
+        async def run():
+            writer = HistoryWriter(
+                maxsize=10, batch_size=3, save_batch=save_batch
+            )
+            for gene in ("TP53", "bad", "BRCA1"):
+                await writer.submit(1, gene, "cancer", {})
+            writer.start()
+            await writer.aclose()
+            return writer
+
+        writer = asyncio.run(run())
+        assert batches == [
+            ["TP53", "bad", "BRCA1"],
+            ["TP53"],
+            ["bad"],
+            ["BRCA1"],
+        ]
+        assert writer.stats.written == 2
+        assert writer.stats.failed == 1
+
+    def test_direct_and_queued_ids_do_not_clash(self):
+        user = create_user("alice", "key")
+
+        async def run():
+            writer = HistoryWriter(maxsize=10, batch_size=10)
+            writer.start()
+            try:
+                first, _ = await writer.submit(user.id, "TP53", "cancer", {})
+                await writer.flush()
+                direct = await asave_user_query(user.id, "EGFR", "cancer", {})
+                second, _ = await writer.submit(user.id, "KRAS", "cancer", {})
+                await writer.aclose()
+            finally:
+                await async_engine.dispose()
+            return writer, [first, direct.id, second]
+
+        writer, ids = asyncio.run(run())
+        assert len(set(ids)) == 3
+        assert writer.stats.failed == 0
+        rows = get_user_queries_page(user.id, limit=10)
+        assert {row.id for row in rows} == set(ids)
+
+    def test_records_are_written_with_preassigned_ids(self):
+        user = create_user("alice", "key")
+
+        async def run():
+            writer = HistoryWriter(maxsize=10, batch_size=10)
+            writer.start()
+            try:
+                submitted = [
+                    await writer.submit(
+                        user.id, gene, "cancer", {"gene": gene}, {"s": gene}
+                    )
+                    for gene in ("TP53", "BRCA1")
+                ]
+                await writer.aclose()
+            finally:
+                await async_engine.dispose()
+            return submitted
+
+        submitted = asyncio.run(run())
+        rows = get_user_queries_page(user.id, limit=10)
+        assert [row.id for row in rows] == [
+            query_id for query_id, _ in reversed(submitted)
+        ]
+        assert json.loads(rows[0].llm_response) == {"s": "BRCA1"}
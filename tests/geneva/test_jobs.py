@@ -0,0 +1,242 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from geneva.jobs import JobQueue, JobQueueFull
+from geneva.model import (
+    QueryJob,
+    SQLModel,
+    acreate_job,
+    aget_job,
+    async_engine,
+    create_user,
+    engine,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_db():
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    create_user("alice", "key")
+    yield
+
+
+def run_async(coro):
+    async def run():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+
+class TestJobQueue:
+    def test_unfinished_jobs_are_resumed_on_start(self):
+        ran = []
+
+        async def run_job(job):
+            ran.append(job.id)
+            return None
+
+        async def scenario():
+            for job_id, status in [
+                ("a", "running"),
+                ("b", "queued"),
+                ("c", "done"),
+            ]:
+                await acreate_job(
+                    QueryJob(
+                        id=job_id,
+                        username="alice",
+                        gene="TP53",
+                        disease="cancer",
+                        status=status,
+                    )
+                )
+            jobs = JobQueue(run_job, workers=1, maxsize=10)
+            await jobs.start()
+            finished = await jobs.wait("b", timeout=5)
+            await jobs.aclose()
+            return finished, await aget_job("a")
+
+        finished, resumed = run_async(scenario())
+        assert sorted(ran) == ["a", "b"]
+        assert finished.status == "done"
+        assert resumed.status == "done"
+
+    def test_interrupted_jobs_resume_after_restart(self):
+        ran = []
+
+        async def hang(job):
+            await asyncio.Event().wait()
+
+        async def run_job(job):
+            ran.append(job.id)
+            return None
+
+        async def scenario():
+            first = JobQueue(hang, workers=1, maxsize=10, stale_after=900)
+            await first.start()
+            job = await first.submit("alice", "TP53", "cancer", True)
+            await asyncio.sleep(0.1)
+            await first.aclose()
+            interrupted = await aget_job(job.id)
+
+            second = JobQueue(run_job, workers=1, maxsize=10, stale_after=900)
+            await second.start()
+            finished = await second.wait(job.id, timeout=5)
+            await second.aclose()
+            return interrupted, finished
+
+        interrupted, finished = run_async(scenario())
+        assert interrupted.status == "queued"
+        assert finished.status == "done"
+        assert len(ran) == 1
+
+    def test_backlog_beyond_maxsize_does_not_block_start(self):
+        release = None
+
+        async def run_job(job):
+            await release.wait()
+            return None
+
+        async def scenario():
+            nonlocal release
+            release = asyncio.Event()
+            for i in range(5):
+                await acreate_job(
+                    QueryJob(
+                        id=str(i),
+                        username="alice",
+                        gene="TP53",
+                        disease="cancer",
+                    )
+                )
+            jobs = JobQueue(run_job, workers=1, maxsize=1)
+            await asyncio.wait_for(jobs.start(), timeout=1)
+            release.set()
+            finished = [await jobs.wait(str(i), timeout=5) for i in range(5)]
+            await jobs.aclose()
+            return finished
+
+        finished = run_async(scenario())
+        assert [job.status for job in finished] == ["done"] * 5
+
+    def test_jobs_running_elsewhere_are_left_alone(self):
+        ran = []
+
+        async def run_job(job):
+            ran.append(job.id)
+            return None
+
+        async def scenario():
+            await acreate_job(
+                QueryJob(
+                    id="a",
+                    username="alice",
+                    gene="TP53",
+                    disease="cancer",
+                    status="running",
+                    started_at=datetime.now(timezone.utc),
+                )
+            )
+            jobs = JobQueue(run_job, workers=1, maxsize=10, stale_after=60)
+            await jobs.start()
+            await asyncio.sleep(0.1)
+            await jobs.aclose()
+            return await aget_job("a")
+
+        job = run_async(scenario())
+        assert ran == []
+        assert job.status == "running"
+
+    def test_shared_job_runs_once(self):
+        ran = []
+
+        async def run_job(job):
+            ran.append(job.id)
+            return None
+
+        async def scenario():
+            await acreate_job(
+                QueryJob(
+                    id="a", username="alice", gene="TP53", disease="cancer"
+                )
+            )
+            first = JobQueue(run_job, workers=1, maxsize=10)
+            second = JobQueue(run_job, workers=1, maxsize=10)
+            await asyncio.gather(first.start(), second.start())
+            await asyncio.gather(
+                first.wait("a", timeout=5), second.wait("a", timeout=5)
+            )
+            await asyncio.gather(first.aclose(), second.aclose())
+
+        run_async(scenario())
+        assert ran == ["a"]
+
+    def test_submit_burst_is_refused_past_maxsize(self):
+        release = None
+
+        async def run_job(job):
+            await release.wait()
+            return None
+
+        async def submit(jobs, gene):
+            try:
+                return await jobs.submit("alice", gene, "cancer", True)
+            except JobQueueFull:
+                return None
+
+        async def scenario():
+            nonlocal release
+            release = asyncio.Event()
+            jobs = JobQueue(run_job, workers=1, maxsize=2)
+            submitted = await asyncio.gather(
+                *(submit(jobs, f"GENE{i}") for i in range(5))
+            )
+            accepted = [job for job in submitted if job is not None]
+            stored = [await aget_job(job.id) for job in accepted]
+            release.set()
+            await jobs.aclose()
+            return accepted, stored
+
+        accepted, stored = run_async(scenario())
+        assert len(accepted) == 2
+        assert all(job.status == "queued" for job in stored)
+        with Session(engine) as session:
+            assert len(session.exec(select(QueryJob)).all()) == 2
+
+    def test_utilization_counts_busy_workers(self):
+        release = None
+
+        async def run_job(job):
+            await release.wait()
+            return None
+
+        async def scenario():
+            nonlocal release
+            release = asyncio.Event()
+            jobs = JobQueue(run_job, workers=2, maxsize=10)
+            await jobs.start()
+            submitted = [
+                await jobs.submit("alice", gene, "cancer", True)
+                for gene in ("TP53", "BRCA1", "EGFR")
+            ]
+            await asyncio.sleep(0.1)
+            busy = jobs.as_dict()
+            release.set()
+            for job in submitted:
+                await jobs.wait(job.id, timeout=5)
+            await jobs.aclose()
+            return busy, jobs.as_dict()
+
+        busy, idle = run_async(scenario())
+        assert busy["running"] == 2
+        assert busy["queued"] == 1
+        assert busy["utilization"] == 1.0
+        assert idle["completed"] == 3
+        assert idle["utilization"] == 0
@@ -1,7 +1,14 @@
+import json
+import time
+from dataclasses import replace
+
 import pytest
 from fastapi.testclient import TestClient
 
+from geneva.auth import SessionStore
+from geneva.config import settings
 from geneva.main import app
+from geneva.services.suggest import SuggestIndex
 
 client = TestClient(app)
 
@@ -15,6 +22,57 @@ def reset_db():
     yield
 
 
+@pytest.fixture(autouse=True)
+def lifespan():
+    with client:
+        yield
+
+
+class FakeServices:
+    """
+    Canned Open Targets and OpenRouter answers for endpoint tests.
+    Replace ``association(gene, disease)`` or ``summary(data)`` to change
+    them (either may raise); ``delay`` makes summaries block the event
+    loop. ``api_keys`` records the key each summary was asked with.
+    """
+
+    def __init__(self):
+        self.association = lambda gene, disease: {
+            "summary": f"{gene}-{disease}-association"
+        }
+        self.summary = lambda data: {
+            "summary_text": f"LLM summary for {data['summary']}"
+        }
+        self.delay = 0.0
+        self.api_keys = []
+
+
+@pytest.fixture
+def fake_services(monkeypatch):
+    fake = FakeServices()
+
+    async def fake_fetch_association(self, gene, disease):
+        return fake.association(gene, disease)
+
+    async def fake_summarize_gene_disease(
+        self, data, additional_context=None, use_cache=True
+    ):
+        authorization = self.headers["Authorization"]
+        fake.api_keys.append(authorization.removeprefix("Bearer "))
+        time.sleep(fake.delay)
+        return fake.summary(data)
+
+    monkeypatch.setattr(
+        "geneva.main.AsyncOpenTargetService.fetch_association",
+        fake_fetch_association,
+    )
+    monkeypatch.setattr(
+        "geneva.main.AsyncOpenRouterService.summarize_gene_disease",
+        fake_summarize_gene_disease,
+    )
+    return fake
+
+
 def test_root():
     response = client.get("/")
     assert response.status_code == 200
@@ -23,6 +81,110 @@ def test_root():
     assert data["message"] == "GenEvA is running!"
 
 
+def test_cache_stats():
+    response = client.get("/cache/stats")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert set(data) == {
+        "resolution",
+        "evidence",
+        "summary",
+        "users",
+        "sessions",
+    }
+    assert data["evidence"]["size"] == 0
+    assert "stale_hits" in data["evidence"]
+
+
+def test_metrics(fake_services):
+    client.post("/login", json={"username": "alice", "api_key": "key123"})
+    client.post(
+        "/query",
+        json={"username": "alice", "gene": "BRCA1", "disease": "cancer"},
+    )
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'geneva_stage_seconds_count{stage="llm"}' in body
+    assert 'geneva_stage_seconds_count{stage="store"}' in body
+    assert (
+        'geneva_http_requests_total{route="/query",method="POST",'
+        'status="200"}' in body
+    )
+    assert 'geneva_cache_hits_total{cache="users"}' in body
+
+
+class TestServerTiming:
+    def test_query_responses_carry_stage_timings(self, fake_services):
+        client.post("/login", json={"username": "alice", "api_key": "key"})
+        response = client.post(
+            "/query",
+            json={"username": "alice", "gene": "BRCA1", "disease": "cancer"},
+        )
+        stages = [
+            entry.split(";")[0]
+            for entry in response.headers["server-timing"].split(", ")
+        ]
+        assert stages == ["auth", "llm", "store", "total"]
+
+        response = client.get("/queries/alice")
+        assert "history;dur=" in response.headers["server-timing"]
+        assert "server-timing" not in client.get("/").headers
+
+    def test_profiling_is_admin_gated(self, monkeypatch, fake_services):
+        fake_services.delay = 0.05
+        client.post("/login", json={"username": "alice", "api_key": "key"})
+        query = {"username": "alice", "gene": "BRCA1", "disease": "cancer"}
+
+        response = client.post(
+            "/query", json=query, headers={"X-Geneva-Profile": "secret"}
+        )
+        assert "x-geneva-profile-id" not in response.headers
+
+        monkeypatch.setattr(
+            "geneva.main.settings", replace(settings, profiling_token="secret")
+        )
+        response = client.post(
+            "/query", json=query, headers={"X-Geneva-Profile": "secret"}
+        )
+        profile_id = response.headers["x-geneva-profile-id"]
+
+        url = f"/profiles/{profile_id}"
+        assert client.get(url).status_code == 403
+        assert (
+            client.get(url, headers={"X-Geneva-Profile": "wrong"}).status_code
+            == 403
+        )
+        response = client.get(url, headers={"X-Geneva-Profile": "secret"})
+        assert response.status_code == 200
+        assert "fake_summarize_gene_disease" in response.text
+
+
+def test_suggest(monkeypatch):
+    response = client.get("/suggest", params={"type": "gene", "q": "tp"})
+    assert response.status_code == 503
+
+    monkeypatch.setattr(
+        app.state,
+        "suggest_index",
+        SuggestIndex(
+            [
+                ("gene", "p53", 1, "ENSG00000141510", "P53", "TP53"),
+                ("gene", "tp53", 0, "ENSG00000141510", "TP53", "TP53"),
+                ("gene", "tp63", 0, "ENSG00000073282", "TP63", "TP63"),
+            ]
+        ),
+    )
+    response = client.get("/suggest", params={"type": "gene", "q": "TP"})
+    assert response.status_code == 200
+    assert [s["name"] for s in response.json()["data"]] == ["TP53", "TP63"]
+
+    response = client.get("/suggest", params={"type": "drug", "q": "tp"})
+    assert response.status_code == 422
+
+
 class TestAuth:
     def test_register_new_user(self):
         response = client.post(
@@ -67,24 +229,94 @@ class TestAuth:
         assert response.json()["status"] == "error"
 
 
-class TestQueries:
-    def test_run_query_and_store_result(self, monkeypatch):
-        client.post("/login", json={"username": "alice", "api_key": "key123"})
+class TestSessions:
+    def login(self, username="alice", api_key="key123"):
+        response = client.post(
+            "/login", json={"username": username, "api_key": api_key}
+        )
+        return response.json()["data"]["token"]
+
+    def test_login_issues_distinct_tokens(self):
+        token = self.login()
+        response = client.post("/login", json={"username": "alice"})
+        assert response.json()["data"]["token"] not in (None, token)
+
+    def test_token_authenticates_requests(self):
+        token = self.login()
+        client.post("/login", json={"username": "bob", "api_key": "k"})
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = client.get("/user/alice", headers=headers)
+        assert response.status_code == 200
+        assert client.get("/user/bob", headers=headers).status_code == 403
+        response = client.get(
+            "/user/alice", headers={"Authorization": "Bearer nope"}
+        )
+        assert response.status_code == 401
+
+    def test_query_without_username_uses_session(self, fake_services):
+        token = self.login()
+        response = client.post(
+            "/query",
+            json={"gene": "TP53", "disease": "cancer"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200
+        assert response.json()["data"]["gene"] == "TP53"
+        assert fake_services.api_keys == ["key123"]
+
+    def test_logout_revokes_token(self):
+        token = self.login()
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.post("/logout", headers=headers).status_code == 200
+        assert client.get("/user/alice", headers=headers).status_code == 401
 
-        def fake_fetch_association(self, gene, disease):
-            return {"summary": f"{gene}-{disease}-association"}
+    def test_logout_on_another_worker_expires_cached_token(self, monkeypatch):
+        monkeypatch.setattr(app.state.sessions, "memory_ttl", 0.05)
+        token = self.login()
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/user/alice", headers=headers).status_code == 200
 
-        def fake_summarize_gene_disease(self, data, additional_context=None):
-            return {"summary_text": f"LLM summary for {data['summary']}"}
+        other_worker = SessionStore(
+            maxsize=10, ttl=settings.session_ttl, memory_ttl=0.05
+        )
+        client.portal.call(other_worker.revoke, token)
+        time.sleep(0.1)
+        assert client.get("/user/alice", headers=headers).status_code == 401
+
+    def test_sessions_survive_restart(self):
+        token = self.login()
+        with client:
+            response = client.get(
+                "/user/alice", headers={"Authorization": f"Bearer {token}"}
+            )
+        assert response.status_code == 200
 
+    def test_require_session(self, monkeypatch):
+        self.login()
         monkeypatch.setattr(
-            "geneva.main.OpenTargetService.fetch_association",
-            fake_fetch_association,
+            "geneva.main.settings", replace(settings, require_session=True)
         )
+        assert client.get("/user/alice").status_code == 401
+
+    def test_user_records_are_cached(self, monkeypatch):
+        self.login()
+        client.get("/user/alice")
+        calls = []
+
+        async def counting_get_user_by_name(username):
+            calls.append(username)
+
         monkeypatch.setattr(
-            "geneva.main.OpenRouterService.summarize_gene_disease",
-            fake_summarize_gene_disease,
+            "geneva.auth.aget_user_by_name", counting_get_user_by_name
         )
+        assert client.get("/user/alice").status_code == 200
+        assert calls == []
+
+
+class TestQueries:
+    def test_run_query_and_store_result(self, fake_services):
+        client.post("/login", json={"username": "alice", "api_key": "key123"})
 
         response = client.post(
             "/query",
@@ -104,6 +336,61 @@ class TestQueries:
             == "LLM summary for BRCA1-cancer-association"
         )
 
+    def test_write_behind_history(self, monkeypatch, fake_services):
+        client.post("/login", json={"username": "alice", "api_key": "key123"})
+        monkeypatch.setattr(
+            "geneva.main.settings",
+            replace(settings, history_write_behind=True),
+        )
+
+        with TestClient(app) as write_behind:
+            ids = [
+                write_behind.post(
+                    "/query",
+                    json={"username": "alice", "gene": gene, "disease": "x"},
+                ).json()["data"]["id"]
+                for gene in ("TP53", "BRCA1")
+            ]
+
+        # Leaving the client runs the lifespan shutdown, which flushes.
+        history = client.get("/queries/alice").json()["data"]
+        assert [q["id"] for q in history] == ids[::-1]
+        assert history[0]["llm_response"] == {
+            "summary_text": "LLM summary for BRCA1-x-association"
+        }
+
+    def test_llm_errors_are_not_stored_as_summaries(self, fake_services):
+        client.post("/login", json={"username": "alice", "api_key": "key123"})
+
+        def failing_summary(data):
+            raise RuntimeError("429 Too Many Requests")
+
+        fake_services.summary = failing_summary
+
+        response = client.post(
+            "/query",
+            json={"username": "alice", "gene": "TP53", "disease": "cancer"},
+        )
+        llm_response = response.json()["data"]["llm_response"]
+        assert llm_response["error"] == "429 Too Many Requests"
+        (stored,) = client.get("/queries/alice").json()["data"]
+        assert stored["llm_response"] is None
+        assert stored["service_response"] == {
+            "summary": "TP53-cancer-association"
+        }
+
+    def test_summaries_mentioning_error_are_stored(self, fake_services):
+        client.post("/login", json={"username": "alice", "api_key": "key123"})
+        summary = {"summary_text": "ok", "error": "none reported"}
+        fake_services.summary = lambda data: summary
+
+        client.post(
+            "/query",
+            json={"username": "alice", "gene": "TP53", "disease": "cancer"},
+        )
+        (stored,) = client.get("/queries/alice").json()["data"]
+        assert stored["llm_response"] == summary
+
     def test_run_query_for_nonexistent_user(self):
         response = client.post(
             "/query",
@@ -113,24 +400,9 @@ class TestQueries:
         body = response.json()
         assert body["status"] == "error"
 
-    def test_list_user_queries(self, monkeypatch):
+    def test_list_user_queries(self, fake_services):
         client.post("/login", json={"username": "bob", "api_key": "key123"})
 
-        def fake_fetch_association(self, gene, disease):
-            return {"summary": f"{gene}-{disease}-association"}
-
-        def fake_summarize_gene_disease(self, data, additional_context=None):
-            return {"summary_text": f"LLM summary for {data['summary']}"}
-
-        monkeypatch.setattr(
-            "geneva.main.OpenTargetService.fetch_association",
-            fake_fetch_association,
-        )
-        monkeypatch.setattr(
-            "geneva.main.OpenRouterService.summarize_gene_disease",
-            fake_summarize_gene_disease,
-        )
-
         client.post(
             "/query",
             json={"username": "bob", "gene": "BRCA1", "disease": "cancer"},
@@ -150,11 +422,322 @@ class TestQueries:
         genes = {q["gene"] for q in data}
         assert genes == {"BRCA1", "TP53"}
         for q in data:
-            assert "service_response" in q
-            assert "llm_response" in q
+            assert q["service_response"] == {
+                "summary": f"{q['gene']}-{q['disease']}-association"
+            }
+            assert q["llm_response"] == {
+                "summary_text": (
+                    f"LLM summary for {q['service_response']['summary']}"
+                )
+            }
+
+    def test_list_user_queries_paginates(self, fake_services):
+        client.post("/login", json={"username": "bob", "api_key": "key123"})
+        for gene in ["G1", "G2", "G3"]:
+            client.post(
+                "/query",
+                json={"username": "bob", "gene": gene, "disease": "cancer"},
+            )
+
+        first = client.get("/queries/bob?limit=2&fields=summary").json()
+        assert [q["gene"] for q in first["data"]] == ["G3", "G2"]
+        assert "service_response" not in first["data"][0]
+        cursor = first["meta"]["next_cursor"]
+
+        second = client.get(f"/queries/bob?limit=2&cursor={cursor}").json()
+        assert [q["gene"] for q in second["data"]] == ["G1"]
+        assert "service_response" in second["data"][0]
+        assert second["meta"]["next_cursor"] is None
+
+        record_id = second["data"][0]["id"]
+        record = client.get(f"/queries/bob/{record_id}")
+        assert record.status_code == 200
+        assert record.json()["data"]["gene"] == "G1"
+
+    def test_invalid_cursor(self):
+        client.post("/login", json={"username": "bob", "api_key": "key123"})
+        response = client.get("/queries/bob?cursor=not-a-cursor")
+        assert response.status_code == 400
+
+    def test_get_query_record_not_found(self):
+        client.post("/login", json={"username": "bob", "api_key": "key123"})
+        response = client.get("/queries/bob/999")
+        assert response.status_code == 404
 
     def test_list_queries_for_nonexistent_user(self):
         response = client.get("/queries/nope")
         assert response.status_code == 404
         body = response.json()
         assert body["status"] == "error"
+
+
+class TestExport:
+    @pytest.fixture(autouse=True)
+    def history(self, fake_services):
+        client.post("/login", json={"username": "bob", "api_key": "key123"})
+
+        def association(gene, disease):
+            rows = [
+                {
+                    "target": {"id": f"ENSG-{gene}", "approvedSymbol": gene},
+                    "resourceScore": score,
+                    "significantDriverMethods": ["MutSig"],
+                    "mutatedSamples": [
+                        {
+                            "functionalConsequence": {"id": "SO_1"},
+                            "numberMutatedSamples": 3,
+                        }
+                    ],
+                }
+                for score in (0.5, 0.25)
+            ]
+            return {
+                "id": "EFO_1",
+                "name": disease,
+                "evidences": {"count": 2, "rows": rows},
+            }
+
+        fake_services.association = association
+        fake_services.summary = lambda data: {
+            "summary_text": f"about {data['name']}"
+        }
+        for gene, disease in [
+            ("BRCA1", "cancer"),
+            ("TP53", "cancer"),
+            ("BRCA1", "leukemia"),
+        ]:
+            client.post(
+                "/query",
+                json={"username": "bob", "gene": gene, "disease": disease},
+            )
+
+    def test_ndjson_is_oldest_first(self):
+        response = client.get("/queries/bob/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = [json.loads(line) for line in response.iter_lines()]
+        assert [(r["gene"], r["disease"]) for r in records] == [
+            ("BRCA1", "cancer"),
+            ("TP53", "cancer"),
+            ("BRCA1", "leukemia"),
+        ]
+        assert records[0]["service_response"]["evidences"]["count"] == 2
+        assert records[0]["llm_response"] == {"summary_text": "about cancer"}
+
+    def test_filters(self):
+        records = client.get("/queries/bob/export?gene=brca1").text
+        assert [
+            json.loads(line)["disease"] for line in records.splitlines()
+        ] == [
+            "cancer",
+            "leukemia",
+        ]
+        response = client.get(
+            "/queries/bob/export",
+            params={"gene": "BRCA1", "disease": "Leukemia"},
+        )
+        assert len(response.text.splitlines()) == 1
+
+        first = json.loads(response.text)["created_at"]
+        later = client.get(
+            "/queries/bob/export", params={"since": first}
+        ).text.splitlines()
+        assert len(later) == 1
+        earlier = client.get(
+            "/queries/bob/export", params={"until": first}
+        ).text.splitlines()
+        assert len(earlier) == 2
+
+    def test_parquet_flattens_evidence(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+        import io
+
+        response = client.get("/queries/bob/export?format=parquet&gene=TP53")
+        assert response.status_code == 200
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.num_rows == 2
+        rows = table.to_pylist()
+        assert {row["gene"] for row in rows} == {"TP53"}
+        assert [row["resource_score"] for row in rows] == [0.5, 0.25]
+        assert rows[0]["target_symbol"] == "TP53"
+        assert rows[0]["summary_text"] == "about cancer"
+        assert rows[0]["mutated_samples"][0]["number_mutated_samples"] == 3
+
+    def test_parquet_without_pyarrow(self, monkeypatch):
+        monkeypatch.setattr("geneva.main.parquet_available", lambda: False)
+        response = client.get("/queries/bob/export?format=parquet")
+        assert response.status_code == 501
+
+    def test_requires_existing_user(self):
+        assert client.get("/queries/nope/export").status_code == 404
+
+
+class TestJobs:
+    def test_job_runs_in_background(self, fake_services):
+        client.post("/login", json={"username": "alice", "api_key": "key"})
+        response = client.post(
+            "/jobs/query",
+            json={"username": "alice", "gene": "TP53", "disease": "cancer"},
+        )
+        assert response.status_code == 200
+        job_id = response.json()["data"]["id"]
+
+        response = client.get(f"/jobs/{job_id}?username=alice&wait=5")
+        data = response.json()["data"]
+        assert data["status"] == "done"
+        assert data["result"]["gene"] == "TP53"
+        history = client.get("/queries/alice").json()["data"]
+        assert history[0]["id"] == data["result"]["id"]
+
+        stats = client.get("/jobs/stats").json()["data"]
+        assert stats["completed"] == 1
+        assert stats["workers"] == settings.job_workers
+
+    def test_failed_job_reports_error(self, fake_services):
+        def association(gene, disease):
+            raise RuntimeError("upstream down")
+
+        fake_services.association = association
+        client.post("/login", json={"username": "alice", "api_key": "key"})
+        job_id = client.post(
+            "/jobs/query",
+            json={"username": "alice", "gene": "TP53", "disease": "cancer"},
+        ).json()["data"]["id"]
+
+        data = client.get(f"/jobs/{job_id}?username=alice&wait=5").json()[
+            "data"
+        ]
+        assert data["status"] == "failed"
+        assert "upstream down" in data["error"]
+
+    def test_jobs_are_private(self, fake_services):
+        client.post("/login", json={"username": "alice", "api_key": "key"})
+        client.post("/login", json={"username": "bob", "api_key": "key"})
+        job_id = client.post(
+            "/jobs/query",
+            json={"username": "alice", "gene": "TP53", "disease": "cancer"},
+        ).json()["data"]["id"]
+        response = client.get(f"/jobs/{job_id}?username=bob")
+        assert response.status_code == 404
+
+
+class TestBatchQueries:
+    def test_batch_streams_ndjson_and_saves_history(
+        self, monkeypatch, fake_services
+    ):
+        client.post("/login", json={"username": "bob", "api_key": "key123"})
+
+        async def fake_resolve_id(self, kind, name):
+            return f"{kind}:{name.lower()}"
+
+        async def fake_fetch_by_ids(self, gene_id, disease_id):
+            return {"summary": f"{gene_id}-{disease_id}"}
+
+        monkeypatch.setattr(
+            "geneva.main.AsyncOpenTargetService.resolve_id", fake_resolve_id
+        )
+        monkeypatch.setattr(
+            "geneva.main.AsyncOpenTargetService.fetch_association_by_ids",
+            fake_fetch_by_ids,
+        )
+
+        response = client.post(
+            "/query/batch",
+            json={
+                "username": "bob",
+                "pairs": [
+                    {"gene": "BRCA1", "disease": "cancer"},
+                    {"gene": "brca1", "disease": "Cancer"},
+                    {"gene": "TP53", "disease": "leukemia"},
+                ],
+                "concurrency": 2,
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 2
+        assert all(line["status"] == "success" for line in lines)
+        assert all(line["id"] is not None for line in lines)
+
+        history = client.get("/queries/bob").json()["data"]
+        assert {q["gene"] for q in history} == {"BRCA1", "TP53"}
+
+    def test_batch_for_nonexistent_user(self):
+        response = client.post(
+            "/query/batch",
+            json={"username": "ghost", "pairs": []},
+        )
+        assert response.status_code == 404
+
+    def test_batch_rejects_excessive_concurrency(self):
+        response = client.post(
+            "/query/batch",
+            json={"username": "bob", "pairs": [], "concurrency": 10_000},
+        )
+        assert response.status_code == 422
+
+
+class TestStreamQuery:
+    def test_stream_sends_evidence_deltas_and_summary(
+        self, monkeypatch, fake_services
+    ):
+        client.post("/login", json={"username": "alice", "api_key": "key123"})
+
+        async def fake_stream_summary(
+            self, data, additional_context=None, use_cache=True
+        ):
+            yield "delta", "partial "
+            yield "delta", "text"
+            yield "summary", {"summary_text": "partial text"}
+
+        monkeypatch.setattr(
+            "geneva.main.AsyncOpenRouterService.stream_summary",
+            fake_stream_summary,
+        )
+
+        response = client.post(
+            "/query/stream",
+            json={"username": "alice", "gene": "BRCA1", "disease": "cancer"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            event_line, data_line = block.split("\n")
+            events.append(
+                (
+                    event_line.removeprefix("event: "),
+                    json.loads(data_line.removeprefix("data: ")),
+                )
+            )
+        assert [name for name, _ in events] == [
+            "evidence",
+            "delta",
+            "delta",
+            "summary",
+        ]
+        assert events[0][1] == {"summary": "BRCA1-cancer-association"}
+        assert events[3][1]["llm_response"] == {"summary_text": "partial text"}
+        assert events[3][1]["id"] is not None
+
+        history = client.get("/queries/alice").json()["data"]
+        assert len(history) == 1
+
+    def test_stream_reports_opentarget_errors(self, monkeypatch):
+        client.post("/login", json={"username": "alice", "api_key": "key123"})
+
+        async def failing_fetch(self, gene, disease):
+            raise ValueError("No gene found for XYZ")
+
+        monkeypatch.setattr(
+            "geneva.main.AsyncOpenTargetService.fetch_association",
+            failing_fetch,
+        )
+
+        response = client.post(
+            "/query/stream",
+            json={"username": "alice", "gene": "XYZ", "disease": "cancer"},
+        )
+        assert response.text.startswith("event: error\n")
+        assert "No gene found for XYZ" in response.text
@@ -0,0 +1,56 @@
+import pytest
+
+from geneva.cache import LRUCache
+from geneva.metrics import (
+    STAGE_SECONDS,
+    STAGES,
+    MetricsRegistry,
+    register_cache_metrics,
+)
+from geneva.metrics import registry as default_registry
+from geneva.metrics import stage
+
+
+def test_counter_and_histogram_exposition():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["route"])
+    latency = registry.histogram("latency_seconds", "Latency.", ["route"])
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    latency.observe(0.003, "/a")
+    latency.observe(0.2, "/a")
+    latency.observe(100, "/a")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/a\\"b"} 3' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.001"} 0' in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.005"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.25"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 100.203' in lines
+
+
+def test_stage_records_latency_and_outcome():
+    before = STAGE_SECONDS.count("test_stage")
+    with stage("test_stage"):
+        pass
+    with pytest.raises(ValueError):
+        with stage("test_stage"):
+            raise ValueError
+    assert STAGE_SECONDS.count("test_stage") == before + 2
+    assert STAGES.value("test_stage", "error") >= 1
+
+
+def test_cache_metrics_are_read_when_scraped():
+    cache = LRUCache(maxsize=2)
+    register_cache_metrics({"test": cache})
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    lines = default_registry.render().splitlines()
+    assert 'geneva_cache_hits_total{cache="test"} 1' in lines
+    assert 'geneva_cache_misses_total{cache="test"} 1' in lines
+    assert 'geneva_cache_entries{cache="test"} 1' in lines
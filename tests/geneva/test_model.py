@@ -1,14 +1,32 @@
+import asyncio
 import json
 from datetime import datetime
 
 import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import Session, select
 
+from geneva.db import async_database_url
 from geneva.model import (
+    Payload,
     SQLModel,
+    UserQuery,
+    acreate_user,
+    aget_user_by_name,
+    aget_user_queries_page,
+    aget_user_query,
+    asave_user_query,
+    astream_user_queries,
+    async_engine,
+    create_tables,
     create_user,
     engine,
+    get_resolved_name,
     get_user_by_name,
     get_user_queries,
+    get_user_queries_page,
+    get_user_query,
+    save_resolved_name,
     save_user_query,
     user_exists,
 )
@@ -92,3 +110,217 @@ class TestUserQueryModel:
         uq = queries[0]
         assert isinstance(uq.created_at, datetime)
         assert uq.created_at <= datetime.now()
+
+
+class TestUserQueryPagination:
+    def test_keyset_pages_are_newest_first_and_disjoint(self):
+        user = create_user("gina", "key004")
+        for i in range(5):
+            save_user_query(user.id, f"G{i}", "cancer", {"i": i})
+
+        first = get_user_queries_page(user.id, limit=2)
+        assert [q.gene for q in first] == ["G4", "G3"]
+        cursor = (first[-1].created_at, first[-1].id)
+        second = get_user_queries_page(user.id, limit=2, before=cursor)
+        assert [q.gene for q in second] == ["G2", "G1"]
+        cursor = (second[-1].created_at, second[-1].id)
+        third = get_user_queries_page(user.id, limit=2, before=cursor)
+        assert [q.gene for q in third] == ["G0"]
+
+    def test_summary_projection_skips_blobs(self):
+        user = create_user("hank", "key005")
+        save_user_query(user.id, "TP53", "cancer", {"big": "blob"})
+        (row,) = get_user_queries_page(user.id, limit=10, full=False)
+        assert row.gene == "TP53"
+        assert not hasattr(row, "service_response")
+
+    def test_get_user_query_is_scoped_to_user(self):
+        owner = create_user("ivy", "key006")
+        other = create_user("jack", "key007")
+        saved = save_user_query(owner.id, "TP53", "cancer", {"x": 1})
+        assert get_user_query(owner.id, saved.id).gene == "TP53"
+        assert get_user_query(other.id, saved.id) is None
+
+    def test_composite_index_exists(self):
+        indexes = inspect(engine).get_indexes("userquery")
+        names = {index["name"] for index in indexes}
+        assert "ix_userquery_user_id_created_at" in names
+
+
+class TestPayloadStorage:
+    def test_identical_responses_are_stored_once(self):
+        alice = create_user("alice", "key1")
+        bob = create_user("bob", "key2")
+        evidence = {"rows": [{"cohortDescription": "x" * 1000}] * 20}
+        save_user_query(alice.id, "TP53", "cancer", evidence)
+        save_user_query(bob.id, "TP53", "cancer", evidence)
+
+        with Session(engine) as session:
+            payloads = session.exec(select(Payload)).all()
+            rows = session.exec(select(UserQuery)).all()
+        assert len(payloads) == 1
+        assert payloads[0].size > 10 * len(payloads[0].data)
+        assert all(row.service_response is None for row in rows)
+        assert {row.service_payload for row in rows} == {payloads[0].hash}
+
+        loaded = get_user_queries(bob.id)[0]
+        assert json.loads(loaded.service_response) == evidence
+
+    def test_legacy_rows_are_migrated(self):
+        SQLModel.metadata.drop_all(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE TABLE user (id INTEGER PRIMARY KEY, "
+                    "username VARCHAR NOT NULL, api_key VARCHAR NOT NULL)"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE TABLE userquery (id INTEGER PRIMARY KEY, "
+                    "user_id INTEGER NOT NULL REFERENCES user (id), "
+                    "gene VARCHAR NOT NULL, disease VARCHAR NOT NULL, "
+                    "service_response VARCHAR NOT NULL, "
+                    "llm_response VARCHAR, created_at DATETIME NOT NULL)"
+                )
+            )
+            conn.execute(text("INSERT INTO user VALUES (1, 'legacy', 'key')"))
+            conn.execute(
+                text(
+                    "INSERT INTO userquery VALUES (7, 1, 'TP53', 'cancer', "
+                    '\'{"score": 1}\', \'{"summary_text": "s"}\', '
+                    "'2024-01-01 00:00:00.000000')"
+                )
+            )
+
+        create_tables()
+        create_tables()
+
+        job_fks = inspect(engine).get_foreign_keys("queryjob")
+        assert {fk["referred_table"] for fk in job_fks} == {
+            "user",
+            "userquery",
+        }
+        with engine.connect() as conn:
+            schema = conn.execute(text("SELECT sql FROM sqlite_master"))
+            sql = " ".join(row or "" for (row,) in schema)
+        assert "userquery_new" not in sql
+        assert "userquery_legacy" not in sql
+        (uq,) = get_user_queries(1)
+        assert uq.id == 7
+        assert json.loads(uq.service_response) == {"score": 1}
+        assert json.loads(uq.llm_response) == {"summary_text": "s"}
+        with Session(engine) as session:
+            stored = session.get(UserQuery, 7)
+            assert stored.service_response is None
+            assert stored.service_payload is not None
+            assert len(session.exec(select(Payload)).all()) == 2
+
+
+def run_async(coro):
+    async def run():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+
+class TestAsyncHelpers:
+    def test_async_database_url(self):
+        assert async_database_url("sqlite:///data/geneva.db") == (
+            "sqlite+aiosqlite:///data/geneva.db"
+        )
+        assert async_database_url("sqlite+aiosqlite:///x.db") == (
+            "sqlite+aiosqlite:///x.db"
+        )
+
+    def test_wal_mode_is_enabled(self):
+        with engine.connect() as conn:
+            mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+        assert mode == "wal"
+
+    def test_user_roundtrip(self):
+        user = run_async(acreate_user("alice", "key123"))
+        assert user.id is not None
+        assert run_async(aget_user_by_name("alice")).api_key == "key123"
+        assert run_async(aget_user_by_name("nobody")) is None
+        assert get_user_by_name("alice").id == user.id
+
+    def test_save_and_page_queries(self):
+        user = create_user("bob", "key")
+        saved = [
+            run_async(
+                asave_user_query(
+                    user.id, gene, "cancer", {"gene": gene}, {"s": gene}
+                )
+            )
+            for gene in ("TP53", "BRCA1", "EGFR")
+        ]
+        assert json.loads(saved[0].service_response) == {"gene": "TP53"}
+
+        page = run_async(aget_user_queries_page(user.id, limit=2))
+        assert [q.gene for q in page] == ["EGFR", "BRCA1"]
+        assert json.loads(page[0].llm_response) == {"s": "EGFR"}
+        assert page == get_user_queries_page(user.id, limit=2)
+
+        summary = run_async(
+            aget_user_queries_page(
+                user.id,
+                limit=2,
+                before=(page[-1].created_at, page[-1].id),
+                full=False,
+            )
+        )
+        assert [q.gene for q in summary] == ["TP53"]
+
+        query = run_async(aget_user_query(user.id, saved[1].id))
+        assert json.loads(query.service_response) == {"gene": "BRCA1"}
+        assert run_async(aget_user_query(user.id + 1, saved[1].id)) is None
+
+    def test_stream_queries(self):
+        user = create_user("bob", "key")
+        create_user("carol", "key")
+        for gene in ("TP53", "BRCA1", "tp53"):
+            save_user_query(user.id, gene, "cancer", {"gene": gene})
+        save_user_query(user.id + 1, "TP53", "cancer", {})
+
+        async def collect(**filters):
+            return [
+                q
+                async for q in astream_user_queries(
+                    user.id, batch_size=1, **filters
+                )
+            ]
+
+        streamed = run_async(collect())
+        assert [q.gene for q in streamed] == ["TP53", "BRCA1", "tp53"]
+        assert json.loads(streamed[1].service_response) == {"gene": "BRCA1"}
+        assert streamed[0].llm_response is None
+
+        matched = run_async(collect(gene="TP53"))
+        assert [q.id for q in matched] == [streamed[0].id, streamed[2].id]
+        since = streamed[1].created_at
+        assert len(run_async(collect(since=since))) == 2
+        assert len(run_async(collect(until=since))) == 1
+        assert run_async(collect(disease="leukemia")) == []
+
+
+class TestResolvedNameModel:
+    def test_save_and_get(self):
+        save_resolved_name("gene", "tp53", "ENSG00000141510", ttl=60)
+        row = get_resolved_name("gene", "tp53")
+        assert row.entity_id == "ENSG00000141510"
+        assert get_resolved_name("disease", "tp53") is None
+
+    def test_save_overwrites_existing_entry(self):
+        save_resolved_name("gene", "nope", None, ttl=60)
+        save_resolved_name("gene", "nope", "ENSG00000000001", ttl=60)
+        assert get_resolved_name("gene", "nope").entity_id == (
+            "ENSG00000000001"
+        )
+
+    def test_expired_entry_is_not_returned(self):
+        save_resolved_name("gene", "tp53", "ENSG00000141510", ttl=-1)
+        assert get_resolved_name("gene", "tp53") is None
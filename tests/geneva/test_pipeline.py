@@ -0,0 +1,94 @@
+import asyncio
+
+from geneva.pipeline import dedupe_pairs, run_batch
+
+
+class FakeTargetService:
+    def __init__(self, delay=0.0):
+        self.resolved = []
+        self.fetched = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = delay
+
+    async def _track(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+
+    async def resolve_id(self, kind, name):
+        self.resolved.append((kind, name))
+        await self._track()
+        if name == "NOPE":
+            raise ValueError(f"No {kind} found for {name}")
+        return f"{kind}:{name.lower()}"
+
+    async def fetch_association_by_ids(self, gene_id, disease_id):
+        self.fetched.append((gene_id, disease_id))
+        await self._track()
+        return {"gene_id": gene_id, "disease_id": disease_id}
+
+
+class FakeLLMService:
+    async def summarize_gene_disease(self, data, use_cache=True):
+        return {"summary_text": f"{data['gene_id']}/{data['disease_id']}"}
+
+
+def collect(target, pairs, concurrency=4):
+    async def run():
+        return [
+            result
+            async for result in run_batch(
+                target, FakeLLMService(), pairs, concurrency
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+def test_dedupe_pairs_normalizes_names():
+    pairs = [("BRCA1", "Breast Cancer"), ("brca1 ", "breast  cancer")]
+    assert dedupe_pairs(pairs) == [("BRCA1", "Breast Cancer")]
+
+
+def test_run_batch_resolves_each_name_once():
+    target = FakeTargetService()
+    results = collect(
+        target,
+        [
+            ("BRCA1", "cancer"),
+            ("brca1", "Cancer"),
+            ("BRCA1", "leukemia"),
+            ("TP53", "cancer"),
+        ],
+    )
+    assert len(results) == 3
+    assert sorted(target.resolved) == [
+        ("disease", "cancer"),
+        ("disease", "leukemia"),
+        ("gene", "BRCA1"),
+        ("gene", "TP53"),
+    ]
+    assert {r["llm_response"]["summary_text"] for r in results} == {
+        "gene:brca1/disease:cancer",
+        "gene:brca1/disease:leukemia",
+        "gene:tp53/disease:cancer",
+    }
+
+
+def test_run_batch_reports_errors_per_pair():
+    target = FakeTargetService()
+    results = collect(target, [("NOPE", "cancer"), ("TP53", "cancer")])
+    by_gene = {r["gene"]: r for r in results}
+    assert by_gene["NOPE"]["status"] == "error"
+    assert "No gene found for NOPE" in by_gene["NOPE"]["message"]
+    assert by_gene["TP53"]["status"] == "success"
+
+
+def test_run_batch_bounds_concurrency():
+    target = FakeTargetService(delay=0.01)
+    pairs = [(f"G{i}", f"D{i}") for i in range(10)]
+    results = collect(target, pairs, concurrency=3)
+    assert len(results) == 10
+    assert target.max_in_flight <= 3